@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import download_assets
+import optimize_assets
+from build_cache import BuildCache
+from fetcher import Fetcher, succeeded
+from html_pipeline import parse, read_html, write_html
+from instrument import add_arguments, configure as configure_instrument, instrument, span
+
+BATCH_DIR = "batch"
+PAGE_WORKERS = os.cpu_count()
+
+
+def read_url_list(source, fetcher):
+    """URLs from a text file (one per line), or from a sitemap / sitemap
+    index given as a local .xml file or a URL."""
+    if source.startswith(("http://", "https://")):
+        return sitemap_urls(fetcher.get_text(source), fetcher)
+    with open(source, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("<"):
+        return sitemap_urls(text, fetcher)
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+
+def sitemap_urls(xml_text, fetcher):
+    root = ET.fromstring(xml_text.encode("utf-8"))
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    if root.tag.endswith("sitemapindex"):
+        urls = []
+        for loc in locs:
+            urls.extend(sitemap_urls(fetcher.get_text(loc), fetcher))
+        return urls
+    return locs
+
+
+def page_slug(url):
+    parsed = urlparse(url)
+    host = re.sub(r'[^\w.-]', '_', parsed.netloc)
+    path = "/".join(re.sub(r'[^\w.-]', '_', part) for part in parsed.path.split("/") if part)
+    if parsed.query:
+        path += "_" + re.sub(r'[^\w.-]', '_', parsed.query)
+    return f"{host}/{path or 'index'}"
+
+
+def link_tree(src_dir, dest_dir):
+    # Hard links make every page's output tree complete without copying bytes
+    for root, _, files in os.walk(src_dir):
+        for name in files:
+            src = os.path.join(root, name)
+            dest = os.path.join(dest_dir, os.path.relpath(src, src_dir))
+            if os.path.exists(dest):
+                if os.path.samefile(src, dest):
+                    continue
+                os.remove(dest)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            try:
+                os.link(src, dest)
+            except OSError:
+                shutil.copy2(src, dest)
+
+
+def optimize_page(page_dir, out_dir, assets_dir, shared_dir, image_map, trace=None):
+    """Build one page in a worker process. Shared assets were optimized once
+    already; only the page-specific stages (font subsetting, CSS purging,
+    HTML, precompression) run here. ``trace`` is the parent's
+    (memory, cprofile_dir) when instrumentation is on; the worker's spans
+    come back in the result."""
+    start = time.perf_counter()
+    if trace:
+        instrument.enable(*trace)
+    with span("page", "page", page=page_dir):
+        optimize_assets.configure(page_dir, out_dir, assets_dir)
+        link_tree(shared_dir, out_dir)
+        cache = BuildCache(optimize_assets.CACHE_FILE)
+        with span("fonts"):
+            font_map = optimize_assets.optimize_fonts(cache)
+        with span("css"):
+            optimize_assets.minify_css(cache, font_map)
+        with span("html"):
+            optimize_assets.update_html(image_map, cache)
+        with span("precompress"):
+            optimize_assets.precompress_assets(cache)
+        cache.save()
+    instrument.write_profiles()
+    return {
+        "html_bytes": os.path.getsize(os.path.join(out_dir, "index.html")),
+        "cache_hits": cache.hits,
+        "cache_misses": cache.misses,
+        "build_ms": round((time.perf_counter() - start) * 1000),
+        "trace_events": instrument.drain(),
+    }
+
+
+def run_batch(urls, batch_dir=BATCH_DIR, workers=PAGE_WORKERS):
+    pages_dir = os.path.join(batch_dir, "pages")
+    assets_dir = os.path.join(batch_dir, "assets")
+    shared_dir = os.path.join(batch_dir, "shared")
+    out_dir = os.path.join(batch_dir, "out")
+    fetcher = Fetcher(os.path.join(batch_dir, ".fetch-cache.json"))
+    os.makedirs(batch_dir, exist_ok=True)
+
+    pages = {url: page_slug(url) for url in dict.fromkeys(urls)}
+    summary = {url: {"url": url, "slug": slug, "status": "failed"} for url, slug in pages.items()}
+
+    # 1. Fetch every page
+    print(f"Fetching {len(pages)} page(s)...")
+    page_paths = {url: os.path.join(pages_dir, slug, "source.html") for url, slug in pages.items()}
+    with span("fetch pages"):
+        results = fetcher.fetch_many(page_paths.items())
+    fetched = [url for url in pages if succeeded(results[url])]
+
+    # 2. Localize assets into one shared tree; the fetcher downloads each URL once
+    print("Downloading assets...")
+    download_assets.configure(assets_dir)
+    context = {"fetcher": fetcher}
+    for url in fetched:
+        context["base_url"] = url
+        with span("download assets", slug=pages[url]):
+            soup = download_assets.pipeline.run(parse(read_html(page_paths[url])), context)
+        write_html(os.path.join(pages_dir, pages[url], "index.html"), str(soup))
+        summary[url]["source_bytes"] = os.path.getsize(page_paths[url])
+    fetcher.save()
+    print(fetcher.summary())
+
+    # 3. Optimize page-independent assets once
+    print("Optimizing shared assets...")
+    optimize_assets.configure(assets_dir, shared_dir)
+    cache = BuildCache(os.path.join(batch_dir, ".build-cache.json"))
+    with span("images"):
+        image_map = optimize_assets.optimize_images(cache)
+    with span("svgs"):
+        optimize_assets.optimize_svgs(cache)
+    with span("js"):
+        optimize_assets.minify_js(cache)
+    with span("static"):
+        optimize_assets.copy_static(cache)
+    # Page trees link these siblings in, so each shared file is encoded once per batch
+    with span("precompress"):
+        optimize_assets.precompress_assets(cache)
+    cache.save()
+    print(cache.summary())
+
+    # 4. Page-specific stages across a worker pool
+    print(f"Optimizing pages with {workers} worker(s)...")
+    trace = (instrument.memory, instrument.cprofile_dir) if instrument.enabled else None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(optimize_page, os.path.join(pages_dir, pages[url]), os.path.join(out_dir, pages[url]),
+                        assets_dir, shared_dir, image_map, trace): url
+            for url in fetched
+        }
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                result = future.result()
+                instrument.merge(result.pop("trace_events"))
+                summary[url].update(result, status="ok")
+            except Exception as e:
+                summary[url]["error"] = str(e)
+                print(f"Failed to optimize {url}: {e}")
+
+    entries = list(summary.values())
+    with open(os.path.join(batch_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=1)
+    return entries
+
+
+def print_summary(entries):
+    print(f"{'page':<50} {'status':<7} {'source':>9} {'html':>9} {'ms':>7}")
+    for entry in entries:
+        print(f"{entry['slug'][:50]:<50} {entry['status']:<7} {entry.get('source_bytes', 0):>9} "
+              f"{entry.get('html_bytes', 0):>9} {entry.get('build_ms', 0):>7}")
+    ok = [e for e in entries if e["status"] == "ok"]
+    source = sum(e.get("source_bytes", 0) for e in ok)
+    html = sum(e.get("html_bytes", 0) for e in ok)
+    print(f"{len(ok)}/{len(entries)} page(s) built, HTML {source} -> {html} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimize many pages in one process.")
+    parser.add_argument("source", help="text file of URLs, sitemap.xml file, or sitemap URL")
+    parser.add_argument("--out", default=BATCH_DIR, help="batch working directory")
+    parser.add_argument("--workers", type=int, default=PAGE_WORKERS, help="page worker processes")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_instrument(args)
+
+    start = time.perf_counter()
+    entries = run_batch(read_url_list(args.source, Fetcher(os.devnull)), args.out, args.workers)
+    print_summary(entries)
+    print(f"Batch finished in {time.perf_counter() - start:.1f} s")
+    instrument.finish(args.trace)
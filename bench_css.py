@@ -0,0 +1,55 @@
+import argparse
+import gzip
+import os
+import time
+
+from css_optimizer import minify_text, optimize_css
+
+try:
+    from csscompressor import compress
+except ImportError:
+    compress = None
+
+CSS_FILE = os.path.join("css", "bootstrap.min.css")
+REPEAT = 10
+
+
+def best_time(minify, css, repeat):
+    best = None
+    for _ in range(repeat):
+        # Memoized values would make every run after the first look free
+        minify_text.cache_clear()
+        start = time.perf_counter()
+        output = minify(css)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def row(name, css, output, seconds):
+    gzipped = len(gzip.compress(output.encode("utf-8"), 9, mtime=0))
+    saved = 100 * (1 - len(output) / len(css)) if css else 0
+    return f"{name:<16} {len(output):>9} {gzipped:>9} {saved:>6.1f}% {seconds * 1000:>9.1f} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the CSS optimizer with csscompressor.")
+    parser.add_argument("paths", nargs="*", default=[CSS_FILE], help=f"stylesheets (default: {CSS_FILE})")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per minifier; the best is reported")
+    args = parser.parse_args()
+
+    minifiers = [("css_optimizer", optimize_css)]
+    if compress:
+        minifiers.append(("csscompressor", compress))
+    else:
+        print("csscompressor is not installed; benchmarking css_optimizer alone")
+
+    for path in args.paths:
+        with open(path, "r", encoding="utf-8") as f:
+            css = f.read()
+        print(f"{path}: {len(css)} bytes, {len(gzip.compress(css.encode('utf-8'), 9, mtime=0))} gzipped")
+        print(f"{'minifier':<16} {'bytes':>9} {'gzip':>9} {'saved':>7} {'time':>12}")
+        for name, minify in minifiers:
+            seconds, output = best_time(minify, css, args.repeat)
+            print(row(name, css, output, seconds))
+        print()
@@ -0,0 +1,64 @@
+import argparse
+import gzip
+import re
+import time
+import tracemalloc
+
+from html_minifier import chunks, minify_stream
+
+HTML_FILE = "index.html"
+REPEAT = 5
+# Copies of <body> content, to see how the minifier copes with large pages
+SCALE = 1
+
+
+def regex_minify(html, write):
+    # What update_html() used to do
+    html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+    write(re.sub(r'>\s+<', '><', html))
+
+
+def stream_minify(html, write):
+    minify_stream(chunks(html), write)
+
+
+def scaled(html, scale):
+    body = html.find("<body")
+    if scale <= 1 or body < 0:
+        return html
+    return html[:body] + html[body:] * scale
+
+
+def measure(minify, html, repeat):
+    best = None
+    for _ in range(repeat):
+        parts = []
+        start = time.perf_counter()
+        minify(html, parts.append)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # Peak memory on a separate run that discards its output, as a file writer would
+    tracemalloc.start()
+    minify(html, lambda text: None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, "".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the streaming HTML minifier with the old regex pass.")
+    parser.add_argument("paths", nargs="*", default=[HTML_FILE], help=f"pages (default: {HTML_FILE})")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per minifier; the best is reported")
+    parser.add_argument("--scale", type=int, default=SCALE, help="repeat the <body> content this many times")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        with open(path, "r", encoding="utf-8") as f:
+            html = scaled(f.read(), args.scale)
+        print(f"{path}: {len(html)} chars, {len(gzip.compress(html.encode('utf-8'), 9, mtime=0))} gzipped")
+        print(f"{'minifier':<10} {'chars':>10} {'gzip':>9} {'time':>12} {'peak KB':>9}")
+        for name, minify in [("regex", regex_minify), ("stream", stream_minify)]:
+            seconds, peak, output = measure(minify, html, args.repeat)
+            gzipped = len(gzip.compress(output.encode("utf-8"), 9, mtime=0))
+            print(f"{name:<10} {len(output):>10} {gzipped:>9} {seconds * 1000:>9.1f} ms {peak // 1024:>9}")
+        print()
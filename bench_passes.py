@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import optimize_assets
+from build_cache import BuildCache
+from html_minifier import minify_html
+from html_pipeline import parse, read_html
+from precompress import available_suffixes
+from report import BuildReport
+from simulate import DEFAULT_PROFILE, PROFILES, report_measure, simulate
+
+METRICS = ["fcp", "lcp", "load", "bytes", "requests"]
+
+
+def build_assets(cache):
+    """Run every stage the HTML passes read from; warm caches make this cheap."""
+    image_map = optimize_assets.optimize_images(cache)
+    optimize_assets.optimize_svgs(cache)
+    font_map = optimize_assets.optimize_fonts(cache)
+    optimize_assets.minify_css(cache, font_map)
+    optimize_assets.minify_js(cache)
+    optimize_assets.copy_static(cache)
+    return image_map, font_map
+
+
+def original_images(cache, image_map, font_map):
+    # No <picture> variants; copy_static already put the originals in the build
+    return {}
+
+
+def rebuild_css(cache, image_map, font_map):
+    optimize_assets.minify_css(cache, font_map)
+    return image_map
+
+
+def rebuild_fonts(cache, image_map, font_map):
+    # The stylesheets point at the fonts the stage emits
+    return rebuild_css(cache, image_map, optimize_assets.optimize_fonts(cache))
+
+
+def rebuild_js(cache, image_map, font_map):
+    optimize_assets.minify_js(cache)
+    return image_map
+
+
+# Asset stages, each switched off by overriding these optimize_assets settings
+# and re-running the stage into a scratch copy of the build. Script bundling
+# is the bundle_scripts pass, so it is toggled with the other passes.
+STAGES = {
+    "images": ({}, original_images),
+    "fonts": ({"SUBSET_FONTS": False}, rebuild_fonts),
+    "purge": ({"PURGE_STYLESHEETS": []}, rebuild_css),
+    "css": ({"optimize_css": lambda css, font_display=None: css}, rebuild_css),
+    "js": ({"minify_js_source": lambda content: content}, rebuild_js),
+}
+
+
+@contextmanager
+def stage_build(name, image_map, font_map):
+    """Yield (cache, image map) for a build with stage ``name`` switched off.
+    optimize_assets points at the scratch build until the block exits."""
+    settings, rebuild = STAGES[name]
+    saved = {key: getattr(optimize_assets, key) for key in settings}
+    dirs = (optimize_assets.OUTPUT_DIR, optimize_assets.BUILD_DIR, optimize_assets.ASSETS_DIR)
+    with tempfile.TemporaryDirectory() as scratch:
+        build_dir = os.path.join(scratch, "dist")
+        # Precompressed siblings would go stale once the stage rewrites their file
+        shutil.copytree(dirs[1], build_dir, ignore=shutil.ignore_patterns(*(f"*{s}" for s in available_suffixes())))
+        optimize_assets.configure(dirs[0], build_dir, dirs[2])
+        for key, value in settings.items():
+            setattr(optimize_assets, key, value)
+        try:
+            cache = BuildCache(os.path.join(scratch, ".build-cache.json"))
+            yield cache, rebuild(cache, image_map, font_map)
+        finally:
+            for key, value in saved.items():
+                setattr(optimize_assets, key, value)
+            optimize_assets.configure(*dirs)
+
+
+def render(pipeline, image_map, cache):
+    html_path = os.path.join(optimize_assets.OUTPUT_DIR, "index.html")
+    context = {"image_map": image_map, "cache": cache, "outputs": []}
+    soup = pipeline.run(parse(read_html(html_path)), context)
+    return minify_html(str(soup), optimize_assets.minify_inline_css, optimize_assets.minify_js_source)
+
+
+def variants(pipeline, only=None):
+    """(label, pipeline, stage) for the full build, each pass switched off,
+    no passes, and each asset stage switched off."""
+    yield "all passes", pipeline, None
+    for name in pipeline.names:
+        if not only or name in only:
+            yield f"- {name}", pipeline.without(name), None
+    yield "no passes", pipeline.without(*pipeline.names), None
+    for name in STAGES:
+        if not only or name in only:
+            yield f"- {name} stage", pipeline, name
+
+
+def measure_variant(pipeline, image_map, cache, profiles, measure):
+    html = render(pipeline, image_map, cache)
+    by_profile = {}
+    for name in profiles:
+        result = simulate(html, optimize_assets.BUILD_DIR, PROFILES[name], measure,
+                          fallback_root=optimize_assets.ASSETS_DIR)
+        by_profile[name] = {metric: result[metric] for metric in METRICS}
+    return by_profile
+
+
+def cell(metric, value, baseline):
+    if value is None:
+        return "-"
+    if baseline is None or value is baseline:
+        return f"{value / 1024:.1f}K" if metric == "bytes" else str(value)
+    delta = value - baseline[metric] if baseline[metric] is not None else 0
+    if metric == "bytes":
+        return f"{delta / 1024:+.1f}K"
+    return f"{delta:+d}"
+
+
+def table(results, profiles):
+    width = 10 * len(METRICS)
+    lines = [f"{'':<28}" + "".join(f"{name:^{width}}" for name in profiles),
+             f"{'':<28}" + "".join(f"{metric:>10}" for _ in profiles for metric in METRICS)]
+    baseline = results[0][1]
+    for label, by_profile in results:
+        row = f"{label:<28}"
+        for name in profiles:
+            base = None if label == results[0][0] else baseline[name]
+            for metric in METRICS:
+                row += f"{cell(metric, by_profile[name][metric], base):>10}"
+        lines.append(row)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure each HTML pass and asset stage by simulating the page with it switched off.")
+    parser.add_argument("passes", nargs="*",
+                        help=f"only toggle these passes or stages ({', '.join(STAGES)}) (default: all)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), action="append",
+                        help=f"throttling profile, repeatable (default: {DEFAULT_PROFILE} and cable)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+    profiles = args.profile or [DEFAULT_PROFILE, "cable"]
+
+    start = time.perf_counter()
+    cache = BuildCache(optimize_assets.CACHE_FILE)
+    image_map, font_map = build_assets(cache)
+    measure = report_measure(BuildReport(cache))
+
+    results = []
+    for label, pipeline, stage in variants(optimize_assets.pipeline, args.passes):
+        if stage is None:
+            results.append((label, measure_variant(pipeline, image_map, cache, profiles, measure)))
+            continue
+        with stage_build(stage, image_map, font_map) as (stage_cache, stage_images):
+            results.append((label, measure_variant(pipeline, stage_images, stage_cache, profiles, measure)))
+    cache.save()
+
+    print()
+    print("Absolute values for the full build, then the change when a pass or stage is switched off (ms, bytes)")
+    print(table(results, profiles))
+    print(f"Benchmarked {len(results)} variant(s) in {(time.perf_counter() - start):.1f} s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([{"variant": label, "profiles": by_profile} for label, by_profile in results], f, indent=1)
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+from html_pipeline import parse, read_html
+
+CONNECTIONS = 64
+DURATION = 10
+ACCEPT_ENCODING = "br, gzip, zstd"
+
+
+def page_paths(root):
+    """"/" plus every local asset the built page references."""
+    paths = ["/"]
+    soup = parse(read_html(os.path.join(root, "index.html")))
+    for tag in soup.find_all(["link", "script", "img"]):
+        url = tag.get("href") or tag.get("src") or tag.get("data-src")
+        if url and not url.startswith(("http:", "https:", "//", "data:", "#", "/")):
+            paths.append("/" + url)
+    return list(dict.fromkeys(paths))
+
+
+async def read_response(reader):
+    # Skip interim 1xx responses such as 103 Early Hints
+    while True:
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = int(head[9:12])
+        if status >= 200:
+            break
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def worker(host, port, paths, offset, deadline, latencies, errors, encoding):
+    reader, writer = await asyncio.open_connection(host, port)
+    requests = [
+        f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept-Encoding: {encoding}\r\n\r\n".encode("latin-1")
+        for path in paths
+    ]
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, paths, connections, duration, encoding):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        worker(host, port, paths, n, deadline, latencies, errors, encoding) for n in range(connections)
+    ])
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(host, port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on {host}:{port} did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the static server.")
+    parser.add_argument("paths", nargs="*", help="request paths (default: the page and its assets)")
+    parser.add_argument("--url", help="server to test; by default serve.py is started on a free port")
+    parser.add_argument("--root", default="dist", help="build tree to serve and read paths from")
+    parser.add_argument("--connections", type=int, default=CONNECTIONS)
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds")
+    parser.add_argument("--accept-encoding", default=ACCEPT_ENCODING)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py"),
+                                   args.root, "--port", str(port)], stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(host, port)
+        paths = args.paths or page_paths(args.root)
+        latencies, errors, elapsed = asyncio.run(
+            run(host, port, paths, args.connections, args.duration, args.accept_encoding))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {len(paths)} path(s), {args.connections} connection(s), {elapsed:.1f} s")
+    print(f"Requests/sec: {len(latencies) / elapsed:.0f}")
+    if latencies:
+        print("Latency: " + ", ".join(f"p{p} {percentile(latencies, p) * 1000:.2f} ms" for p in (50, 90, 99)) +
+              f", max {latencies[-1] * 1000:.2f} ms")
+    print(f"Non-200 responses: {len(errors)}")
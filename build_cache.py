@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+
+# Bump when the manifest layout changes so stale manifests are ignored
+CACHE_VERSION = 1
+
+
+class BuildCache:
+    """Persistent build manifest keyed by content hash.
+
+    Each stage entry records the key it was built with (input hashes plus
+    encoder settings) and the hashes of the outputs it wrote. A stage is
+    fresh when its key is unchanged and its outputs are still on disk
+    untouched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.files = {}
+        self.entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.files = data.get("files", {})
+                self.entries = data.get("entries", {})
+        except (OSError, ValueError):
+            pass
+
+    def file_hash(self, path):
+        # Size + mtime fast path so a no-op build only stats files
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.files.get(path)
+        if cached and cached[:2] == stamp:
+            return cached[2]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.files[path] = stamp + [digest]
+        return digest
+
+    def key(self, *parts):
+        blob = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def fresh(self, name, key):
+        entry = self.entries.get(name)
+        if entry and entry["key"] == key and self._outputs_intact(entry["outputs"]):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def data(self, name):
+        entry = self.entries.get(name)
+        return entry.get("data") if entry else None
+
+    def record(self, name, key, outputs, data=None):
+        self.entries[name] = {
+            "key": key,
+            "outputs": {path: self.file_hash(path) for path in outputs},
+            "data": data,
+        }
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": self.files, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        return f"Cache: {self.hits} hit(s), {self.misses} miss(es)"
+
+    def _outputs_intact(self, outputs):
+        for path, digest in outputs.items():
+            try:
+                if self.file_hash(path) != digest:
+                    return False
+            except OSError:
+                return False
+        return True
@@ -0,0 +1,121 @@
+import re
+
+import soupsieve
+
+from cssparse import AtRule, Rule, parse, selector_tokens, serialize
+
+# Number of <body> elements, in document order, treated as above the fold
+FOLD_ELEMENTS = 150
+
+# At-rules whose nested rules take part in extraction; everything else
+# (@font-face, @keyframes, @import, ...) is left to the full stylesheets
+CONDITIONAL_AT_RULES = {"media", "supports"}
+
+# Pseudo-elements and user-action pseudo-classes never match a static DOM, so
+# they are stripped before matching and the base selector decides
+DYNAMIC_PSEUDO_RE = re.compile(
+    r'::?(?:-[a-z]+-)[\w-]*(?:\([^)]*\))?'
+    r'|::[\w-]+(?:\([^)]*\))?'
+    r'|:(?:before|after|first-line|first-letter|selection|placeholder'
+    r'|hover|focus|focus-within|focus-visible|active|visited|target)\b',
+    re.I,
+)
+
+
+def fold_elements(soup, fold=FOLD_ELEMENTS):
+    elements = [el for el in (soup.find("html"), soup.body) if el is not None]
+    if soup.body is not None:
+        elements.extend(soup.body.find_all(True, limit=fold))
+    return elements
+
+
+class CriticalMatcher:
+    """Matches selectors against the elements above the fold.
+
+    Selectors are first checked against the classes, ids and tags present
+    above the fold, so most rules are rejected without running a full
+    selector match.
+    """
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.classes = set()
+        self.ids = set()
+        self.tags = set()
+        for el in elements:
+            self.tags.add(el.name)
+            self.classes.update(el.get("class", []))
+            if el.get("id"):
+                self.ids.add(el["id"])
+        self.memo = {}
+
+    def matches(self, selector):
+        if selector not in self.memo:
+            self.memo[selector] = self._matches(selector)
+        return self.memo[selector]
+
+    def _matches(self, selector):
+        base = DYNAMIC_PSEUDO_RE.sub("", selector).strip()
+        base = re.sub(r'\s*([>+~])\s*', r'\1', base)
+        base = re.sub(r'(^|[\s>+~])(?=[\s>+~]|$)', r'\1*', base) or "*"
+
+        classes, ids, tags = selector_tokens(base)
+        if not (classes <= self.classes and ids <= self.ids and tags <= self.tags):
+            return False
+        try:
+            compiled = soupsieve.compile(base)
+        except Exception:
+            # Syntax soupsieve can't evaluate: the token check is the best we have
+            return True
+        return any(compiled.match(el) for el in self.elements)
+
+
+def retarget_rules(css, tag, replacement, keep):
+    """Copies of the rules in ``css`` whose subject (last compound selector)
+    is a ``tag`` element, with that type selector swapped for
+    ``replacement``. Only selectors for which ``keep`` (given the selector
+    without dynamic pseudo-classes) is true are copied; the @media and
+    @supports blocks around them come along."""
+    subject = re.compile(rf'(^|[\s>+~]){tag}(?![\w-])(?=[^\s>+~]*$)', re.I)
+
+    def walk(nodes):
+        copies = []
+        for node in nodes:
+            if isinstance(node, Rule):
+                selectors = []
+                for selector in node.selectors:
+                    match = subject.search(selector)
+                    if match and keep(DYNAMIC_PSEUDO_RE.sub("", selector).strip()):
+                        selectors.append(selector[:match.end(1)] + replacement + selector[match.end():])
+                if selectors:
+                    copies.append(Rule(",".join(selectors), node.declarations))
+            elif isinstance(node, AtRule) and node.name in CONDITIONAL_AT_RULES and node.rules is not None:
+                rules = walk(node.rules)
+                if rules:
+                    copies.append(AtRule(node.name, node.prelude, rules=rules))
+        return copies
+
+    return serialize(walk(parse(css)))
+
+
+def extract_rules(nodes, matcher):
+    critical = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            selectors = [s for s in node.selectors if matcher.matches(s)]
+            if selectors:
+                critical.append(Rule(",".join(selectors), node.declarations))
+        elif isinstance(node, AtRule) and node.name in CONDITIONAL_AT_RULES and node.rules is not None:
+            if node.name == "media" and node.prelude.lower() == "print":
+                continue
+            rules = extract_rules(node.rules, matcher)
+            if rules:
+                critical.append(AtRule(node.name, node.prelude, rules=rules))
+    return critical
+
+
+def critical_css_for(css, matcher):
+    """The critical part of one stylesheet. Serialized sheets concatenate,
+    so callers may cache this per stylesheet."""
+    return serialize(extract_rules(parse(css), matcher))
+
@@ -0,0 +1,144 @@
+import os
+import re
+from urllib.parse import urldefrag, urljoin
+
+from fetcher import NOT_MODIFIED, succeeded
+
+# Comments are matched only so the references inside them are skipped
+REFERENCE_RE = re.compile(
+    r'''(/\*.*?\*/)'''
+    r'''|@import\s+(?:url\(\s*(['"]?)(.*?)\2\s*\)|(['"])(.*?)\4)'''
+    r'''|url\(\s*(['"]?)(.*?)\6\s*\)''',
+    re.S,
+)
+FONT_FACE_RE = re.compile(r'@font-face\s*\{[^}]*\}')
+FONT_EXTENSIONS = (".woff2", ".woff", ".ttf", ".otf", ".eot")
+
+
+class Stylesheet:
+    def __init__(self, text, url, local_dir, save, localized=False):
+        self.text = text
+        # Where the CSS came from; None for local files of unknown origin
+        self.url = url
+        self.local_dir = local_dir
+        self.save = save
+        # Rewritten by an earlier run, so relative references may point at local copies
+        self.localized = localized
+
+
+class CssCrawler:
+    """Localizes everything a set of stylesheets references, however deep.
+
+    Each stylesheet is parsed for ``@import`` and ``url()`` references,
+    which are resolved against the stylesheet's own URL. Every level of
+    the graph is fetched concurrently, each URL once, and the references
+    are rewritten to paths relative to the local copy. Imported
+    stylesheets are crawled in turn.
+    """
+
+    def __init__(self, fetcher, folders, claim, base_url):
+        self.fetcher = fetcher
+        # Local directory for each kind of reference: "css", "font", "image"
+        self.folders = folders
+        # claim(url, folder) -> a filename in folder that no other URL uses
+        self.claim = claim
+        # Root-relative references in local files of unknown origin resolve against this
+        self.base_url = base_url
+        # URL -> local path, or None when the fetch failed
+        self.local = {}
+        self.crawled = set()
+        self.pending = []
+
+    def add_file(self, path, url=None, localized=False):
+        path = os.path.normpath(path)
+        if path in self.crawled:
+            return
+        self.crawled.add(path)
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+        def save(css):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(css)
+        self.pending.append(Stylesheet(text, url, os.path.dirname(path), save, localized))
+
+    def add_text(self, text, url, local_dir, save, localized=False):
+        self.pending.append(Stylesheet(text, url, local_dir, save, localized))
+
+    def resolve(self, ref, sheet):
+        """The absolute URL (without fragment) ``ref`` points at, or None
+        for data URIs, fragments and references an earlier run localized.
+        References in freshly fetched CSS always resolve by URL: a file of
+        the same name saved for another stylesheet says nothing about them."""
+        ref = ref.strip()
+        if not ref or ref.startswith(("data:", "#", "about:")):
+            return None
+        relative = not re.match(r'^(?:[a-z]+:|/)', ref, re.I)
+        if relative:
+            path = re.match(r'[^?#]*', ref).group()
+            if sheet.localized and os.path.isfile(os.path.join(sheet.local_dir, path)):
+                return None
+            if sheet.url is None:
+                return None
+        url = urldefrag(urljoin(sheet.url or self.base_url, ref))[0].rstrip("?")
+        return url if url.startswith(("http:", "https:")) else None
+
+    def references(self, sheet):
+        """(match, url, kind) for every remote reference in ``sheet``."""
+        font_faces = [m.span() for m in FONT_FACE_RE.finditer(sheet.text)]
+        for match in REFERENCE_RE.finditer(sheet.text):
+            if match.group(1):
+                continue
+            imported = match.group(3) or match.group(5)
+            url = self.resolve(imported or match.group(7) or "", sheet)
+            if not url:
+                continue
+            if imported:
+                kind = "css"
+            elif (any(start <= match.start() < end for start, end in font_faces)
+                  or url.lower().endswith(FONT_EXTENSIONS)):
+                kind = "font"
+            else:
+                kind = "image"
+            yield match, url, kind
+
+    def run(self):
+        """Crawl every added stylesheet and everything it reaches."""
+        while self.pending:
+            sheets, self.pending = self.pending, []
+            jobs = {}
+            for sheet in sheets:
+                for _, url, kind in self.references(sheet):
+                    if url not in self.local and url not in jobs:
+                        folder = self.folders[kind]
+                        jobs[url] = (os.path.join(folder, self.claim(url, folder)), kind)
+
+            results = self.fetcher.fetch_many((url, path) for url, (path, _) in jobs.items())
+            for url, (path, kind) in jobs.items():
+                self.local[url] = path if succeeded(results[url]) else None
+                if self.local[url] and kind == "css":
+                    self.add_file(path, url, localized=results[url] == NOT_MODIFIED)
+
+            for sheet in sheets:
+                css = self.rewrite(sheet)
+                if css != sheet.text:
+                    sheet.save(css)
+
+    def rewrite(self, sheet):
+        replacements = {match.start(): self.local.get(url) for match, url, _ in self.references(sheet)}
+
+        def replace(match):
+            path = replacements.get(match.start())
+            if not path:
+                return match.group()
+            ref = match.group(3) or match.group(5) or match.group(7)
+            # Keep query and fragment: "?#iefix" and "#fontawesome" still mean something locally
+            suffix = ref.strip()[len(re.match(r'[^?#]*', ref.strip()).group()):]
+            local = os.path.relpath(path, sheet.local_dir).replace(os.sep, "/") + suffix
+            if match.group(4):
+                return f'@import {match.group(4)}{local}{match.group(4)}'
+            quote = match.group(2) if match.group(3) else match.group(6)
+            prefix = "@import " if match.group(3) else ""
+            return f'{prefix}url({quote}{local}{quote})'
+
+        return REFERENCE_RE.sub(replace, sheet.text)
@@ -0,0 +1,201 @@
+import re
+from functools import lru_cache
+
+from cssparse import AtRule, Comment, Rule, parse, serialize, tokenize
+
+FONT_DISPLAY = "swap"
+
+# At-rules holding rules whose adjacent copies can be merged
+GROUPING_AT_RULES = {"media", "supports"}
+# Values left exactly as written: numbers there aren't CSS numbers
+VERBATIM_PROPERTIES = {"unicode-range", "font-feature-settings", "font-variation-settings"}
+BOX_PROPERTIES = {"margin", "padding"}
+
+LENGTH_UNITS = "px|em|rem|ex|ch|vw|vh|vmin|vmax|cm|mm|in|pt|pc|q"
+NUMBER_RE = re.compile(r'(?<![\w.#-])(-?)(\d*\.?\d+)(%|[a-z]+)?', re.I)
+HEX_COLOR_RE = re.compile(r'#([0-9a-f])\1([0-9a-f])\2([0-9a-f])\3\b', re.I)
+SELECTOR_COMBINATOR_RE = re.compile(r'\s*([,>+~])\s*')
+VALUE_SEPARATOR_RE = re.compile(r'\s*([,/])\s*')
+IMPORTANT_RE = re.compile(r'\s*!\s*important', re.I)
+# Pseudo-classes and elements every browser we target parses; a selector list
+# is dropped whole if any selector in it is unknown, so only these are merged
+SAFE_PSEUDO = {
+    "hover", "focus", "active", "visited", "link", "first-child", "last-child", "only-child",
+    "first-of-type", "last-of-type", "nth-child", "nth-of-type", "nth-last-child", "not", "empty",
+    "checked", "disabled", "enabled", "root", "target", "before", "after", "first-letter", "first-line",
+}
+PSEUDO_RE = re.compile(r'::?([\w-]+)')
+
+
+def minify_number(match):
+    sign, number, unit = match.groups()
+    if "." in number:
+        number = number.rstrip("0").rstrip(".") or "0"
+        if number.startswith("0."):
+            number = number[1:]
+    if number.strip("0.") == "":
+        number, sign = "0", ""
+        if unit and re.fullmatch(LENGTH_UNITS, unit, re.I):
+            unit = None
+    return f"{sign}{number}{unit or ''}"
+
+
+def tidy(text, separators_re):
+    text = separators_re.sub(r'\1', text)
+    return re.sub(r'\(\s+', '(', re.sub(r'\s+\)', ')', text))
+
+
+# Stylesheets repeat the same values and selectors over and over
+@lru_cache(maxsize=None)
+def minify_text(text, separators_re, values=True):
+    """Apply the whitespace, number and color rules outside of strings and url()s."""
+    if not any(c in text for c in "\"'()/"):
+        # Nothing to protect and no function arguments: one run of plain text
+        if values:
+            text = HEX_COLOR_RE.sub(r'#\1\2\3', NUMBER_RE.sub(minify_number, text))
+        return tidy(text, separators_re)
+
+    out = []
+    run = []
+    depth = 0
+
+    def flush():
+        out.append(tidy("".join(run), separators_re))
+        run.clear()
+
+    for kind, value in tokenize(text):
+        if kind in ("string", "url"):
+            flush()
+            out.append(value)
+            continue
+        if kind == "other" and values:
+            # Units inside calc() and friends are required, even on zero
+            if depth == 0:
+                value = NUMBER_RE.sub(minify_number, value)
+            value = HEX_COLOR_RE.sub(r'#\1\2\3', value)
+        elif kind == "lparen":
+            depth += 1
+        elif kind == "rparen":
+            depth -= 1
+        if kind != "comment":
+            run.append(value)
+    flush()
+    return "".join(out)
+
+
+def minify_value(name, value):
+    # Custom properties are substituted into other values as written, so
+    # "--gap:0px" must stay a length for calc(100% - var(--gap)) to parse
+    if name is None or name.startswith("--") or name.lower() in VERBATIM_PROPERTIES:
+        return value
+    value = minify_text(IMPORTANT_RE.sub("!important", value), VALUE_SEPARATOR_RE)
+    if name.lower() in BOX_PROPERTIES and set(value.replace("!important", "").split()) == {"0"}:
+        value = "0" + ("!important" if value.endswith("!important") else "")
+    return value
+
+
+def minify_declarations(declarations):
+    """Minify values and drop exact repeats, keeping the last copy (the one that wins)."""
+    declarations = [(name, minify_value(name, value)) for name, value in declarations]
+    last = {declaration: i for i, declaration in enumerate(declarations)}
+    return [d for i, d in enumerate(declarations) if last[d] == i]
+
+
+def mergeable(prelude):
+    return all(name.lower() in SAFE_PSEUDO for name in PSEUDO_RE.findall(prelude))
+
+
+def merge_rules(nodes):
+    """Merge adjacent rules with the same selector, or the same declarations.
+
+    Only neighbours are merged: moving a rule past another one could
+    change which of two equally specific rules wins.
+    """
+    merged = []
+    for node in nodes:
+        previous = merged[-1] if merged else None
+        if isinstance(node, Rule) and isinstance(previous, Rule):
+            if node.prelude == previous.prelude:
+                previous.declarations = minify_declarations(previous.declarations + node.declarations)
+                continue
+            if (node.declarations == previous.declarations
+                    and mergeable(node.prelude) and mergeable(previous.prelude)):
+                selectors = list(dict.fromkeys(previous.selectors + node.selectors))
+                previous.prelude = ",".join(selectors)
+                continue
+        if (isinstance(node, AtRule) and isinstance(previous, AtRule) and node.name in GROUPING_AT_RULES
+                and node.name == previous.name and node.prelude == previous.prelude):
+            previous.rules = merge_rules(previous.rules + node.rules)
+            continue
+        merged.append(node)
+    return merged
+
+
+def font_face_key(node, skip=()):
+    return tuple(sorted((name.lower(), value) for name, value in node.declarations if name and name.lower() not in skip))
+
+
+def collapse_font_faces(nodes):
+    """Drop repeated @font-face blocks and merge the ones that differ only
+    in font-weight but share a file into a single weight range."""
+    faces = [node for node in nodes if isinstance(node, AtRule) and node.name == "font-face" and node.declarations]
+    # Identical blocks: the last one is kept, as it is the one the cascade would use
+    last = {font_face_key(node): node for node in faces}
+    dropped = {id(node) for node in faces if last[font_face_key(node)] is not node}
+
+    groups = {}
+    for node in faces:
+        if id(node) not in dropped:
+            groups.setdefault(font_face_key(node, {"font-weight"}), []).append(node)
+    for group in groups.values():
+        weights = []
+        for node in group:
+            weight = dict((name.lower(), value) for name, value in node.declarations if name).get("font-weight", "400")
+            weights.extend(int(w) if w.isdigit() else None for w in weight.replace("normal", "400").replace("bold", "700").split())
+        if len(group) < 2 or None in weights:
+            continue
+        # One file for every weight is a variable font (or one the browser
+        # would never synthesize anyway), so a range says the same thing
+        keep = group[-1]
+        keep.declarations = [(name, value) for name, value in keep.declarations if not name or name.lower() != "font-weight"]
+        keep.declarations.append(("font-weight", f"{min(weights)} {max(weights)}"))
+        dropped.update(id(node) for node in group[:-1])
+
+    return [node for node in nodes if id(node) not in dropped]
+
+
+def optimize_nodes(nodes, font_display):
+    out = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            node.prelude = minify_text(node.prelude, SELECTOR_COMBINATOR_RE, values=False)
+            node.declarations = minify_declarations(node.declarations)
+            if not node.declarations:
+                continue
+        elif isinstance(node, AtRule):
+            if node.prelude:
+                node.prelude = minify_text(node.prelude, VALUE_SEPARATOR_RE)
+                if node.name in GROUPING_AT_RULES:
+                    node.prelude = re.sub(r'\s*:\s*', ':', node.prelude)
+            if node.rules is not None:
+                node.rules = optimize_nodes(node.rules, font_display)
+                if not node.rules:
+                    continue
+            elif node.declarations is not None:
+                if node.name == "font-face" and font_display:
+                    # Only added where missing, so running twice changes nothing
+                    if not any(name and name.lower() == "font-display" for name, _ in node.declarations):
+                        node.declarations.insert(0, ("font-display", font_display))
+                node.declarations = minify_declarations(node.declarations)
+        out.append(node)
+    return merge_rules(collapse_font_faces(out))
+
+
+def optimize_css(css, font_display=FONT_DISPLAY):
+    """Minify ``css``: whitespace, comments (except ``/*!`` licences),
+    numbers, colors, repeated declarations, adjacent duplicate rules and
+    repeated ``@font-face`` blocks. Every ``@font-face`` without a
+    ``font-display`` gets ``font_display``."""
+    nodes = parse(css)
+    licences = [node for node in nodes if isinstance(node, Comment)]
+    return serialize(licences + optimize_nodes([node for node in nodes if not isinstance(node, Comment)], font_display))
@@ -0,0 +1,234 @@
+import re
+
+# Single-pass tokenizer: every character of the input lands in exactly one token
+TOKEN_RE = re.compile(r'''
+    (?P<comment>/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+  | (?P<url>url\(\s*[^\s'")][^)]*\))
+  | (?P<ws>\s+)
+  | (?P<open>\{)
+  | (?P<close>\})
+  | (?P<semi>;)
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<other>(?:[^\s"'{};/()u\\]|\\.|u(?!rl\()|/(?!\*))+|[u/\\])
+''', re.S | re.X | re.I)
+
+# At-rules whose block holds declarations rather than nested rules
+DECLARATION_AT_RULES = {"font-face", "page", "viewport", "-ms-viewport", "counter-style", "property"}
+
+
+class Rule:
+    def __init__(self, prelude, declarations):
+        self.prelude = prelude
+        self.declarations = declarations
+
+    @property
+    def selectors(self):
+        return split_top_level(self.prelude, ",")
+
+
+class AtRule:
+    def __init__(self, name, prelude, rules=None, declarations=None):
+        self.name = name
+        self.prelude = prelude
+        self.rules = rules
+        self.declarations = declarations
+
+
+class Comment:
+    def __init__(self, text):
+        self.text = text
+
+
+def tokenize(css):
+    return [(m.lastgroup, m.group()) for m in TOKEN_RE.finditer(css)]
+
+
+def parse(css):
+    """Parse a stylesheet into a list of Rule, AtRule and Comment nodes.
+
+    Only ``/*! ... */`` comments at the top level survive, so license
+    headers can be preserved; every other comment is dropped.
+    """
+    nodes, _ = _parse_rules(tokenize(css), 0, top_level=True)
+    return nodes
+
+
+def _join(tokens):
+    # Runs of whitespace become one space; strings and url()s keep their own
+    parts = []
+    for kind, value in tokens:
+        if kind == "ws":
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        elif kind != "comment":
+            parts.append(value)
+    if parts and parts[-1] == " ":
+        parts.pop()
+    return "".join(parts)
+
+
+def _skip_block(tokens, i):
+    # tokens[i] is just past an opening brace; return the index past its match
+    depth = 1
+    while i < len(tokens) and depth:
+        kind = tokens[i][0]
+        if kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+        i += 1
+    return i
+
+
+def _parse_rules(tokens, i, top_level=False):
+    nodes = []
+    prelude = []
+    while i < len(tokens):
+        kind, value = tokens[i]
+        if kind == "comment":
+            if top_level and value.startswith("/*!") and not prelude:
+                nodes.append(Comment(value))
+            i += 1
+        elif kind == "close":
+            return nodes, i + 1
+        elif kind == "semi":
+            # A statement at-rule (@import, @charset, ...) or a stray semicolon
+            text = _join(prelude)
+            if text.startswith("@"):
+                name, _, rest = text[1:].partition(" ")
+                nodes.append(AtRule(name.lower(), rest.strip()))
+            prelude = []
+            i += 1
+        elif kind == "open":
+            text = _join(prelude)
+            prelude = []
+            if text.startswith("@"):
+                name, _, rest = text[1:].partition(" ")
+                name = name.lower()
+                if name in DECLARATION_AT_RULES:
+                    declarations, i = _parse_declarations(tokens, i + 1)
+                    nodes.append(AtRule(name, rest.strip(), declarations=declarations))
+                else:
+                    rules, i = _parse_rules(tokens, i + 1)
+                    nodes.append(AtRule(name, rest.strip(), rules=rules))
+            else:
+                declarations, i = _parse_declarations(tokens, i + 1)
+                nodes.append(Rule(text, declarations))
+        else:
+            prelude.append(tokens[i])
+            i += 1
+    return nodes, i
+
+
+def _parse_declarations(tokens, i):
+    declarations = []
+    current = []
+
+    def flush():
+        text = _join(current)
+        name, colon, value = text.partition(":")
+        if colon and name.strip():
+            declarations.append((name.strip(), value.strip()))
+        current.clear()
+
+    while i < len(tokens):
+        kind, value = tokens[i]
+        if kind == "close":
+            flush()
+            return declarations, i + 1
+        if kind == "semi":
+            flush()
+            i += 1
+        elif kind == "open":
+            # Nested blocks (CSS nesting) are kept verbatim as a nameless entry
+            start = i
+            i = _skip_block(tokens, i + 1)
+            raw = _join(current) + "".join(v for _, v in tokens[start:i])
+            declarations.append((None, raw))
+            current.clear()
+        else:
+            current.append(tokens[i])
+            i += 1
+    flush()
+    return declarations, i
+
+
+def split_top_level(text, separator):
+    """Split on ``separator`` outside of parentheses, brackets and strings."""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    escaped = False
+    for index, char in enumerate(text):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:index].strip())
+            start = index + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def serialize_declarations(declarations):
+    return ";".join(value if name is None else f"{name}:{value}" for name, value in declarations)
+
+
+def serialize(nodes):
+    out = []
+    for node in nodes:
+        if isinstance(node, Comment):
+            out.append(node.text)
+        elif isinstance(node, Rule):
+            out.append(f"{node.prelude}{{{serialize_declarations(node.declarations)}}}")
+        else:
+            head = f"@{node.name} {node.prelude}" if node.prelude else f"@{node.name}"
+            if node.rules is not None:
+                out.append(f"{head}{{{serialize(node.rules)}}}")
+            elif node.declarations is not None:
+                out.append(f"{head}{{{serialize_declarations(node.declarations)}}}")
+            else:
+                out.append(f"{head};")
+    return "".join(out)
+
+
+# --- Selector helpers ---
+
+SELECTOR_NOISE_RE = re.compile(r'\[[^\]]*\]|\((?:[^()]|\([^()]*\))*\)|"[^"]*"|\'[^\']*\'')
+SELECTOR_TOKEN_RE = re.compile(r'([.#])((?:[\w-]|\\.)+)|(?:^|(?<=[\s>+~]))([a-zA-Z][\w-]*)')
+
+
+def unescape_identifier(name):
+    return re.sub(r'\\(.)', r'\1', name)
+
+
+def selector_tokens(selector):
+    """Return the (classes, ids, tags) a selector requires to be present.
+
+    Arguments of functional pseudo-classes such as ``:not(.x)`` and
+    attribute selectors are ignored, so the result is a necessary (never
+    over-strict) condition for the selector to match anything.
+    """
+    classes, ids, tags = set(), set(), set()
+    for match in SELECTOR_TOKEN_RE.finditer(SELECTOR_NOISE_RE.sub("", selector)):
+        prefix, name, tag = match.groups()
+        if tag:
+            tags.add(tag.lower())
+        elif prefix == ".":
+            classes.add(unescape_identifier(name))
+        else:
+            ids.add(unescape_identifier(name))
+    return classes, ids, tags
@@ -1,9 +1,14 @@
+import argparse
+import hashlib
 import os
-import requests
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
 import re
 
+from css_crawler import CssCrawler
+from fetcher import NOT_MODIFIED, Fetcher, succeeded
+from html_pipeline import Pipeline, parse, read_html, write_html
+from instrument import add_arguments, configure as configure_instrument, instrument
+
 # Base URL for resolving relative links
 BASE_URL = "https://cz.gamcore.com/advertise"
 
@@ -14,121 +19,158 @@ JS_DIR = os.path.join(OUTPUT_DIR, "js")
 IMG_DIR = os.path.join(OUTPUT_DIR, "images")
 FONTS_DIR = os.path.join(OUTPUT_DIR, "fonts")
 
-for d in [CSS_DIR, JS_DIR, IMG_DIR, FONTS_DIR]:
-    os.makedirs(d, exist_ok=True)
+def configure(output_dir):
+    """Download assets into ``output_dir`` (batch builds share one tree
+    across pages) and create its asset folders."""
+    global OUTPUT_DIR, CSS_DIR, JS_DIR, IMG_DIR, FONTS_DIR
+    OUTPUT_DIR = output_dir
+    CSS_DIR = os.path.join(OUTPUT_DIR, "css")
+    JS_DIR = os.path.join(OUTPUT_DIR, "js")
+    IMG_DIR = os.path.join(OUTPUT_DIR, "images")
+    FONTS_DIR = os.path.join(OUTPUT_DIR, "fonts")
+    for d in [CSS_DIR, JS_DIR, IMG_DIR, FONTS_DIR]:
+        os.makedirs(d, exist_ok=True)
 
-def download_file(url, dest_folder, filename=None):
+def absolute_url(url, base_url=None):
     if url.startswith("//"):
-        url = "https:" + url
-    elif not url.startswith("http"):
-        url = urljoin(BASE_URL, url)
-    
+        return "https:" + url
+    if not url.startswith("http"):
+        return urljoin(base_url or BASE_URL, url)
+    return url
+
+def local_filename(url, filename=None):
     if not filename:
         filename = os.path.basename(urlparse(url).path)
         if not filename:
             filename = "resource"
-            
+
     # Clean filename
-    filename = re.sub(r'[?].*', '', filename)
-    
-    filepath = os.path.join(dest_folder, filename)
-    
-    try:
-        print(f"Downloading {url} to {filepath}")
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-        response.raise_for_status()
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-        return filename
-    except Exception as e:
-        print(f"Failed to download {url}: {e}")
-        return None
-
-def process_html():
-    try:
-        with open(os.path.join(OUTPUT_DIR, "index.html"), "r", encoding="utf-8") as f:
-            soup = BeautifulSoup(f, "html.parser")
-    except UnicodeDecodeError:
-        with open(os.path.join(OUTPUT_DIR, "index.html"), "r", encoding="latin-1") as f:
-            soup = BeautifulSoup(f, "html.parser")
-
-    # Process CSS
+    return re.sub(r'[?].*', '', filename)
+
+def claim_filename(url, dest_folder, claimed):
+    # Two different URLs with the same basename must not overwrite each other
+    filename = local_filename(url)
+    owner = claimed.setdefault((dest_folder, filename), url)
+    if owner != url:
+        stem, ext = os.path.splitext(filename)
+        filename = f"{stem}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{ext}"
+    return filename
+
+def is_local(url, local_root):
+    # Already rewritten by an earlier run over the same page. Pages fetched
+    # fresh have no local_root: their relative references are the site's,
+    # and are localized by URL even if another page saved a file of that name
+    if not local_root or re.match(r'^(?:[a-z]+:|/)', url, re.I):
+        return False
+    return os.path.isfile(os.path.join(local_root, url.split("?")[0]))
+
+pipeline = Pipeline()
+
+@pipeline.register(10)
+def localize_assets(soup, context):
+    fetcher = context["fetcher"]
+    base_url = context.get("base_url", BASE_URL)
+    # Set when the page is localized in place, so its local references are ours
+    local_root = context.get("local_root")
+    claimed = context.setdefault("claimed", {})
+    # Shared across the pages of a batch, so each stylesheet is crawled once
+    crawler = context.get("crawler")
+    if crawler is None:
+        folders = {"css": CSS_DIR, "font": FONTS_DIR, "image": IMG_DIR}
+        crawler = context["crawler"] = CssCrawler(
+            fetcher, folders, lambda url, folder: claim_filename(url, folder, claimed), base_url)
+    crawler.base_url = base_url
+
+    # Collect every asset first, fetch them concurrently, then rewrite the
+    # references whose download succeeded
+    pending = []
+
+    def queue(url, dest_folder, rewrite):
+        if is_local(url, local_root):
+            return
+        url = absolute_url(url, base_url)
+        filename = claim_filename(url, dest_folder, claimed)
+        pending.append((url, os.path.join(dest_folder, filename), lambda: rewrite(filename)))
+        return url, os.path.join(dest_folder, filename)
+
+    def set_attr(tag, attr, prefix, strip_sri=False):
+        def rewrite(filename):
+            tag[attr] = f"{prefix}/{filename}"
+            # Remove integrity and crossorigin attributes as we are modifying the file
+            if strip_sri:
+                if tag.has_attr("integrity"): del tag["integrity"]
+                if tag.has_attr("crossorigin"): del tag["crossorigin"]
+        return rewrite
+
+    # Process CSS; the stylesheets are crawled for their own references below
+    stylesheets = []
     for link in soup.find_all("link", rel="stylesheet"):
         href = link.get("href")
-        if href:
-            filename = download_file(href, CSS_DIR)
-            if filename:
-                link["href"] = f"css/{filename}"
-                # Remove integrity and crossorigin attributes as we are modifying the file
-                if link.has_attr("integrity"): del link["integrity"]
-                if link.has_attr("crossorigin"): del link["crossorigin"]
-
-    # Process Inline CSS Imports
-    style_tags = soup.find_all("style")
-    for style in style_tags:
+        if href and is_local(href, local_root):
+            path = os.path.join(local_root, href.split("?")[0])
+            crawler.add_file(path, fetcher.source_url(path), localized=True)
+        elif href:
+            stylesheets.append(queue(href, CSS_DIR, set_attr(link, "href", "css", strip_sri=True)))
+
+    # Process Inline CSS: every @import and url(), resolved against the page
+    for style in soup.find_all("style"):
         if style.string:
-            import_match = re.search(r'@import url\("([^"]+)"\);', style.string)
-            if import_match:
-                url = import_match.group(1)
-                filename = download_file(url, CSS_DIR)
-                if filename:
-                    style.string = style.string.replace(import_match.group(0), f'@import url("css/{filename}");')
+            def save(css, style=style):
+                style.string = css
+            crawler.add_text(style.string, base_url, local_root or OUTPUT_DIR, save, localized=bool(local_root))
 
     # Process JS
     for script in soup.find_all("script", src=True):
         src = script.get("src")
         if src:
-            filename = download_file(src, JS_DIR)
-            if filename:
-                script["src"] = f"js/{filename}"
-                if script.has_attr("integrity"): del script["integrity"]
-                if script.has_attr("crossorigin"): del script["crossorigin"]
+            queue(src, JS_DIR, set_attr(script, "src", "js", strip_sri=True))
 
     # Process Images
     for img in soup.find_all("img"):
         src = img.get("src")
         if src:
-            filename = download_file(src, IMG_DIR)
-            if filename:
-                img["src"] = f"images/{filename}"
-                # Add lazy loading
-                img["loading"] = "lazy"
-                # Add width and height if missing (placeholder, ideally should be real dims)
-                if not img.has_attr("width"): img["width"] = "100"
-                if not img.has_attr("height"): img["height"] = "100"
+            # Dimensions and lazy loading are set at build time from the real files
+            queue(src, IMG_DIR, set_attr(img, "src", "images"))
 
     # Process Favicon
     link_icon = soup.find("link", rel="shortcut icon")
-    if link_icon:
-        href = link_icon.get("href")
-        if href:
-            filename = download_file(href, IMG_DIR)
-            if filename:
-                link_icon["href"] = f"images/{filename}"
+    if link_icon and link_icon.get("href"):
+        queue(link_icon["href"], IMG_DIR, set_attr(link_icon, "href", "images"))
 
     # Process og:image
     meta_image = soup.find("meta", property="og:image")
-    if meta_image:
-        content = meta_image.get("content")
-        if content:
-            filename = download_file(content, IMG_DIR)
-            if filename:
-                meta_image["content"] = f"images/{filename}"
-    
+    if meta_image and meta_image.get("content"):
+        queue(meta_image["content"], IMG_DIR, set_attr(meta_image, "content", "images"))
+
     link_image_src = soup.find("link", rel="image_src")
-    if link_image_src:
-        href = link_image_src.get("href")
-        if href:
-            filename = download_file(href, IMG_DIR)
-            if filename:
-                link_image_src["href"] = f"images/{filename}"
+    if link_image_src and link_image_src.get("href"):
+        queue(link_image_src["href"], IMG_DIR, set_attr(link_image_src, "href", "images"))
+
+    results = fetcher.fetch_many((url, path) for url, path, _ in pending)
+    for url, _, rewrite in pending:
+        if succeeded(results[url]):
+            rewrite()
 
+    for url, path in stylesheets:
+        if succeeded(results[url]):
+            # A 304 means the file on disk is the copy an earlier run already rewrote
+            crawler.add_file(path, url, localized=results[url] == NOT_MODIFIED)
+    crawler.run()
 
-    with open(os.path.join(OUTPUT_DIR, "index.html"), "w", encoding="utf-8") as f:
-        f.write(str(soup))
+def process_html(fetcher):
+    html_path = os.path.join(OUTPUT_DIR, "index.html")
+    soup = pipeline.run(parse(read_html(html_path)), {"fetcher": fetcher, "local_root": OUTPUT_DIR})
+    write_html(html_path, str(soup))
 
 if __name__ == "__main__":
-    # Download Bootstrap Grid (for inlining to fix CLS)
-    download_file("https://stackpath.bootstrapcdn.com/bootstrap/4.1.3/css/bootstrap-grid.min.css", CSS_DIR, "bootstrap-grid.min.css")
+    parser = argparse.ArgumentParser(description="Download the page's assets and point index.html at the local copies.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_instrument(args)
 
-    process_html()
+    configure(OUTPUT_DIR)
+    fetcher = Fetcher(os.path.join(OUTPUT_DIR, ".fetch-cache.json"))
+    process_html(fetcher)
+    fetcher.save()
+    print(fetcher.summary())
+    instrument.finish(args.trace)
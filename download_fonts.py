@@ -1,71 +1,62 @@
 import os
-import requests
-import re
-from urllib.parse import urljoin
+
+from css_crawler import CssCrawler
+from fetcher import NOT_MODIFIED, Fetcher, succeeded
 
 OUTPUT_DIR = "."
 WEBFONTS_DIR = os.path.join(OUTPUT_DIR, "webfonts")
 CSS_DIR = os.path.join(OUTPUT_DIR, "css")
 FONTS_DIR = os.path.join(OUTPUT_DIR, "fonts")
+IMG_DIR = os.path.join(OUTPUT_DIR, "images")
+
+FONT_AWESOME_URL = "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.6.3/css/all.min.css"
+GOOGLE_FONTS_URL = "https://fonts.googleapis.com/css?family=Roboto:100,100i,300,300i,400,400i,500,500i,700,700i,900,900i"
+
+def configure(output_dir):
+    """Download into ``output_dir`` and create its asset folders."""
+    global OUTPUT_DIR, WEBFONTS_DIR, CSS_DIR, FONTS_DIR, IMG_DIR
+    OUTPUT_DIR = output_dir
+    WEBFONTS_DIR = os.path.join(OUTPUT_DIR, "webfonts")
+    CSS_DIR = os.path.join(OUTPUT_DIR, "css")
+    FONTS_DIR = os.path.join(OUTPUT_DIR, "fonts")
+    IMG_DIR = os.path.join(OUTPUT_DIR, "images")
+    for d in [WEBFONTS_DIR, CSS_DIR, FONTS_DIR, IMG_DIR]:
+        os.makedirs(d, exist_ok=True)
+
+def download_stylesheet(fetcher, url, filename, fonts_dir, font_name=None):
+    # Fetch the stylesheet, then every font and image it references, wherever they live
+    path = os.path.join(CSS_DIR, filename)
+    state = fetcher.fetch(url, path)
+    if not succeeded(state):
+        return
+
+    claimed = {}
+    def claim(font_url, folder):
+        name = font_name(font_url, claimed) if font_name and folder == fonts_dir else None
+        return name or os.path.basename(font_url.split("?")[0]) or "resource"
 
-os.makedirs(WEBFONTS_DIR, exist_ok=True)
-os.makedirs(FONTS_DIR, exist_ok=True)
+    folders = {"css": CSS_DIR, "font": fonts_dir, "image": IMG_DIR}
+    crawler = CssCrawler(fetcher, folders, claim, url)
+    # Unchanged since the last run, so its references already point at local copies
+    crawler.add_file(path, url, localized=state == NOT_MODIFIED)
+    crawler.run()
 
-def download_file(url, dest_path):
-    try:
-        print(f"Downloading {url} to {dest_path}")
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-        response.raise_for_status()
-        with open(dest_path, 'wb') as f:
-            f.write(response.content)
-        return True
-    except Exception as e:
-        print(f"Failed to download {url}: {e}")
-        return False
+def download_font_awesome(fetcher):
+    download_stylesheet(fetcher, FONT_AWESOME_URL, "all.min.css", WEBFONTS_DIR)
 
-def download_font_awesome():
-    base_url = "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.6.3/webfonts/"
-    fonts = [
-        "fa-brands-400.woff2",
-        "fa-regular-400.woff2",
-        "fa-solid-900.woff2",
-        "fa-brands-400.woff",
-        "fa-regular-400.woff",
-        "fa-solid-900.woff",
-        "fa-brands-400.ttf",
-        "fa-regular-400.ttf",
-        "fa-solid-900.ttf"
-    ]
-    
-    for font in fonts:
-        download_file(base_url + font, os.path.join(WEBFONTS_DIR, font))
+def roboto_name(url, claimed):
+    # The same file is often listed under several weights; the crawler claims each URL once
+    ext = os.path.splitext(url.split("?")[0])[1] or ".woff2"
+    return claimed.setdefault(url, f"roboto-{len(claimed)}{ext}")
 
-def download_google_fonts():
-    # Google Fonts URL
-    css_url = "https://fonts.googleapis.com/css?family=Roboto:100,100i,300,300i,400,400i,500,500i,700,700i,900,900i"
-    
-    # Download CSS content
-    response = requests.get(css_url, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
-    css_content = response.text
-    
-    # Find all font URLs
-    # src: url(https://fonts.gstatic.com/s/roboto/v30/KFOlCnqEu92Fr1MmEU9fBBc4.woff2) format('woff2');
-    matches = re.findall(r'url\((https://fonts\.gstatic\.com/[^)]+)\)', css_content)
-    
-    local_css_content = css_content
-    
-    for i, url in enumerate(matches):
-        filename = f"roboto-{i}.woff2"
-        filepath = os.path.join(FONTS_DIR, filename)
-        
-        if download_file(url, filepath):
-            # Replace URL in CSS
-            local_css_content = local_css_content.replace(url, f"../fonts/{filename}")
-            
-    # Save the new CSS file
-    with open(os.path.join(CSS_DIR, "roboto.css"), "w", encoding="utf-8") as f:
-        f.write(local_css_content)
+def download_google_fonts(fetcher):
+    # The fetcher's desktop Chrome User-Agent gets woff2 URLs
+    download_stylesheet(fetcher, GOOGLE_FONTS_URL, "roboto.css", FONTS_DIR, roboto_name)
 
 if __name__ == "__main__":
-    download_font_awesome()
-    download_google_fonts()
+    configure(OUTPUT_DIR)
+    fetcher = Fetcher(os.path.join(OUTPUT_DIR, ".fetch-cache.json"))
+    download_font_awesome(fetcher)
+    download_google_fonts(fetcher)
+    fetcher.save()
+    print(fetcher.summary())
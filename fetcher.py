@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrument import span
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 3
+# (connect, read) timeouts in seconds
+TIMEOUT = (5, 30)
+CHUNK_SIZE = 64 * 1024
+
+VALIDATORS_FILE = ".fetch-cache.json"
+
+# Result states returned by Fetcher.fetch
+DOWNLOADED = "downloaded"
+NOT_MODIFIED = "not-modified"
+FAILED = "failed"
+
+
+class Fetcher:
+    """Pooled, retrying HTTP fetcher shared by the download scripts.
+
+    One keep-alive Session serves every request, bodies are streamed to disk
+    in chunks, and ETag/Last-Modified validators are persisted so unchanged
+    assets come back as 304 Not Modified on the next run.
+    """
+
+    def __init__(self, validators_path=VALIDATORS_FILE, max_concurrency=MAX_CONCURRENCY):
+        self.validators_path = validators_path
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.stats = {DOWNLOADED: 0, NOT_MODIFIED: 0, FAILED: 0}
+        # Outcome of every (url, path) fetched by this instance; repeats are free
+        self.results = {}
+
+        retry = Retry(
+            total=MAX_RETRIES,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+        )
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        try:
+            with open(validators_path, "r", encoding="utf-8") as f:
+                self.validators = json.load(f)
+        except (OSError, ValueError):
+            self.validators = {}
+
+    def fetch(self, url, dest_path):
+        if (url, dest_path) in self.results:
+            return self.results[(url, dest_path)]
+        with span("fetch", "download", url=url):
+            state = self._fetch(url, dest_path)
+        with self.lock:
+            self.results[(url, dest_path)] = state
+        return state
+
+    def _fetch(self, url, dest_path):
+        headers = {}
+        cached = self.validators.get(url)
+        if cached and cached.get("path") == dest_path and os.path.exists(dest_path):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                if response.status_code == 304:
+                    print(f"Not modified {url}")
+                    return self._count(NOT_MODIFIED)
+                response.raise_for_status()
+
+                print(f"Downloading {url} to {dest_path}")
+                os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+                # Write to a sibling and swap it in, so a failed transfer never truncates a good file
+                tmp_path = f"{dest_path}.{threading.get_ident()}.part"
+                try:
+                    with open(tmp_path, "wb") as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                    os.replace(tmp_path, dest_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+                with self.lock:
+                    self.validators[url] = {
+                        "path": dest_path,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
+                return self._count(DOWNLOADED)
+        except Exception as e:
+            print(f"Failed to download {url}: {e}")
+            return self._count(FAILED)
+
+    def fetch_many(self, jobs):
+        """Fetch an iterable of (url, dest_path) concurrently; {url: state}.
+        Each URL is downloaded once and copied to any further destinations."""
+        destinations = {}
+        for url, dest_path in jobs:
+            paths = destinations.setdefault(url, [])
+            if dest_path not in paths:
+                paths.append(dest_path)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            states = pool.map(lambda url: self.fetch(url, destinations[url][0]), destinations)
+            results = dict(zip(destinations, states))
+        for url, paths in destinations.items():
+            for dest_path in paths[1:]:
+                if succeeded(results[url]) and not self._copy(paths[0], dest_path):
+                    results[url] = FAILED
+        return results
+
+    def _copy(self, src_path, dest_path):
+        try:
+            os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+            shutil.copyfile(src_path, dest_path)
+            return True
+        except OSError as e:
+            print(f"Failed to copy {src_path} to {dest_path}: {e}")
+            return False
+
+    def source_url(self, dest_path):
+        """The URL an earlier run downloaded ``dest_path`` from, if known."""
+        for url, cached in self.validators.items():
+            if cached.get("path") == dest_path:
+                return url
+        return None
+
+    def get_text(self, url):
+        response = self.session.get(url, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.text
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.validators_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.validators, f, indent=1)
+            os.replace(tmp_path, self.validators_path)
+
+    def summary(self):
+        return (f"Fetched {self.stats[DOWNLOADED]}, not modified {self.stats[NOT_MODIFIED]}, "
+                f"failed {self.stats[FAILED]}")
+
+    def _count(self, state):
+        with self.lock:
+            self.stats[state] += 1
+        return state
+
+
+def succeeded(state):
+    return state in (DOWNLOADED, NOT_MODIFIED)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+
+HASH_LENGTH = 10
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{%d}\.[^./]+$' % HASH_LENGTH)
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def is_hashed(path):
+    return bool(HASHED_NAME_RE.search(path))
+
+
+class Fingerprinter:
+    """Gives built assets content-hashed names so they can be cached forever.
+
+    Stylesheets are rewritten to point at the hashed names of the fonts and
+    images they reference before their own hash is taken, so a changed
+    font changes the hash of every stylesheet that uses it.
+    """
+
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+        self.names = {}
+        self.outputs = []
+
+    def asset(self, rel):
+        """Return the hashed build-relative path for ``rel``, or None when
+        it isn't a local built file."""
+        if rel in self.names:
+            return self.names[rel]
+        path = os.path.join(self.build_dir, rel)
+        # Hashed names keep the extension last, so extensionless files keep their name
+        if is_hashed(rel) or not posixpath.splitext(rel)[1] or not os.path.isfile(path):
+            return None
+
+        data = None
+        if rel.endswith(".css"):
+            with open(path, "r", encoding="utf-8") as f:
+                data = self.rewrite_css(f.read(), posixpath.dirname(rel)).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+        else:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+
+        stem, ext = posixpath.splitext(rel)
+        hashed = f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+        hashed_path = os.path.join(self.build_dir, hashed)
+        if not os.path.exists(hashed_path):
+            if data is not None:
+                with open(hashed_path, "wb") as f:
+                    f.write(data)
+            else:
+                # Same bytes under a second name; a hard link costs no space
+                try:
+                    os.link(path, hashed_path)
+                except OSError:
+                    shutil.copyfile(path, hashed_path)
+        self.names[rel] = hashed
+        self.outputs.append(hashed_path)
+        return hashed
+
+    def url(self, url, base_dir=""):
+        """Rewrite one reference found in a file living in ``base_dir``."""
+        if not url or re.match(r'^(?:[a-z][a-z0-9+.-]*:|//|#|/)', url, re.I):
+            return url
+        match = re.match(r'([^?#]*)(.*)', url, re.S)
+        path, suffix = match.group(1), match.group(2)
+        rel = posixpath.normpath(posixpath.join(base_dir, path))
+        hashed = self.asset(rel)
+        if not hashed:
+            return url
+        return posixpath.relpath(hashed, base_dir or ".") + suffix
+
+    def srcset(self, value, base_dir=""):
+        candidates = []
+        for candidate in value.split(","):
+            parts = candidate.strip().split(None, 1)
+            if parts:
+                parts[0] = self.url(parts[0], base_dir)
+                candidates.append(" ".join(parts))
+        return ", ".join(candidates)
+
+    def rewrite_css(self, css, base_dir=""):
+        def replace(match):
+            quote, url = match.group(1), match.group(2)
+            return f"url({quote}{self.url(url, base_dir)}{quote})"
+        return CSS_URL_RE.sub(replace, css)
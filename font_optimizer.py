@@ -0,0 +1,197 @@
+import os
+import posixpath
+import re
+import string
+
+from bs4 import BeautifulSoup
+
+from cssparse import AtRule, Rule, parse, serialize, split_top_level
+
+try:
+    from fontTools.subset import Options, Subsetter
+    from fontTools.ttLib import TTFont
+    import fontTools
+    FONTTOOLS_VERSION = fontTools.version
+except ImportError:
+    FONTTOOLS_VERSION = None
+
+# Formats fontTools can read and write back
+SUBSETTABLE_EXTENSIONS = ('.woff2', '.woff', '.ttf', '.otf')
+# Formats that are redundant once a .woff2 of the same font exists
+LEGACY_FONT_EXTENSIONS = ('.eot', '.ttf', '.woff', '.svg', '.otf')
+
+# Always kept so text injected at runtime still renders in the web font
+BASE_TEXT = string.printable
+
+URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+ICON_SELECTOR_RE = re.compile(r'^\.([\w-]+)::?before$')
+CSS_ESCAPE_RE = re.compile(r'\\([0-9a-fA-F]{1,6})\s?')
+
+
+def text_codepoints(html):
+    soup = BeautifulSoup(html, "html.parser")
+    text = soup.get_text()
+    for el in soup.find_all(True):
+        for attr in ("alt", "title", "placeholder", "value", "aria-label"):
+            if el.get(attr):
+                text += el[attr]
+    return {ord(char) for char in text + BASE_TEXT}
+
+
+def icon_codepoints(css, used_classes):
+    """Codepoints behind the ``.icon:before{content:"\\f0c9"}`` rules whose
+    class is actually used on the page."""
+    codepoints = set()
+
+    def walk(nodes):
+        for node in nodes:
+            if isinstance(node, AtRule) and node.rules is not None:
+                walk(node.rules)
+            elif isinstance(node, Rule):
+                content = dict(node.declarations).get("content")
+                if not content:
+                    continue
+                for selector in node.selectors:
+                    match = ICON_SELECTOR_RE.match(selector)
+                    if match and match.group(1) in used_classes:
+                        value = CSS_ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 16)), content.strip("\"'"))
+                        codepoints.update(ord(char) for char in value)
+
+    walk(parse(css))
+    return codepoints
+
+
+def parse_unicode_range(value):
+    codepoints = set()
+    for part in value.split(","):
+        part = part.strip().upper().replace("U+", "")
+        if not part:
+            continue
+        if "?" in part:
+            start, end = int(part.replace("?", "0"), 16), int(part.replace("?", "F"), 16)
+        elif "-" in part:
+            start, end = (int(bound, 16) for bound in part.split("-", 1))
+        else:
+            start = end = int(part, 16)
+        codepoints.update(range(start, end + 1))
+    return codepoints
+
+
+def font_unicode_ranges(css, css_dir="css"):
+    """Map each local font referenced by an @font-face to the codepoints its
+    unicode-range lets the browser use it for (None means unrestricted)."""
+    ranges = {}
+
+    def walk(nodes):
+        for node in nodes:
+            if isinstance(node, AtRule) and node.rules is not None:
+                walk(node.rules)
+            elif isinstance(node, AtRule) and node.name == "font-face":
+                declarations = dict(node.declarations)
+                allowed = parse_unicode_range(declarations["unicode-range"]) if "unicode-range" in declarations else None
+                for name, value in node.declarations:
+                    if name != "src":
+                        continue
+                    for match in URL_RE.finditer(value):
+                        path = local_font_path(match.group(2), css_dir)
+                        if not path:
+                            continue
+                        if allowed is None or ranges.get(path, set()) is None:
+                            ranges[path] = None
+                        else:
+                            ranges[path] = ranges.get(path, set()) | allowed
+
+    walk(parse(css))
+    return ranges
+
+
+def local_font_path(url, css_dir):
+    if re.match(r'^(?:[a-z]+:|//)', url, re.I):
+        return None
+    return posixpath.normpath(posixpath.join(css_dir, re.split(r'[?#]', url)[0]))
+
+
+def subset_font(src_path, out_path, codepoints):
+    """Subset one font to ``codepoints`` and write it to ``out_path``.
+
+    Runs in a worker process. Returns False, writing nothing, when the
+    font has no glyph for any of the codepoints.
+    """
+    font = TTFont(src_path)
+    wanted = set(codepoints) & set(font.getBestCmap() or {})
+    if not wanted:
+        return False
+
+    options = Options()
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    subsetter = Subsetter(options)
+    subsetter.populate(unicodes=wanted)
+    subsetter.subset(font)
+
+    if out_path.endswith(".woff2"):
+        font.flavor = "woff2"
+    elif out_path.endswith(".woff"):
+        font.flavor = "woff"
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    font.save(out_path)
+    return True
+
+
+def has_woff2_sibling(path):
+    return os.path.exists(os.path.splitext(path)[0] + ".woff2")
+
+
+def is_woff2_source(source):
+    match = URL_RE.search(source)
+    return bool(match) and ("woff2" in source[match.end():] or re.split(r'[?#]', match.group(2))[0].endswith(".woff2"))
+
+
+def rewrite_font_urls(css, font_map, css_dir="css"):
+    """Point @font-face sources at the files in ``font_map``.
+
+    ``font_map`` maps source-root relative font paths to their built path,
+    or to None when the file was dropped. Sources pointing at dropped files
+    and legacy formats next to a woff2 source are removed, and so is any
+    @font-face left without a source.
+    """
+
+    def rewrite_source(source):
+        match = URL_RE.search(source)
+        if not match:
+            return source
+        path = local_font_path(match.group(2), css_dir)
+        if path not in font_map:
+            return source
+        if font_map[path] is None:
+            return None
+        return source.replace(match.group(0), f"url({posixpath.relpath(font_map[path], css_dir)})")
+
+    def walk(nodes):
+        result = []
+        for node in nodes:
+            if isinstance(node, AtRule) and node.rules is not None:
+                result.append(AtRule(node.name, node.prelude, rules=walk(node.rules)))
+            elif isinstance(node, AtRule) and node.name == "font-face":
+                # woff2 is enough wherever it is offered, so legacy sources go
+                has_woff2 = any(name == "src" and is_woff2_source(source)
+                                for name, value in node.declarations for source in split_top_level(value, ","))
+                declarations = []
+                for name, value in node.declarations:
+                    if name == "src":
+                        sources = split_top_level(value, ",")
+                        if has_woff2:
+                            sources = [s for s in sources if is_woff2_source(s) or not URL_RE.search(s)]
+                        sources = [s for s in map(rewrite_source, sources) if s]
+                        if not sources:
+                            continue
+                        value = ",".join(sources)
+                    declarations.append((name, value))
+                if any(name == "src" for name, _ in declarations):
+                    result.append(AtRule(node.name, node.prelude, declarations=declarations))
+            else:
+                result.append(node)
+        return result
+
+    return serialize(walk(parse(css)))
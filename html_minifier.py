@@ -0,0 +1,334 @@
+import json
+import re
+from html.parser import HTMLParser
+
+# Input is parsed, and output written, this many characters at a time
+CHUNK_SIZE = 64 * 1024
+
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+                 "track", "wbr"}
+# Whitespace next to these never renders: it sits at the start or end of a line box
+BLOCK_ELEMENTS = {
+    "address", "article", "aside", "blockquote", "body", "br", "caption", "center", "col", "colgroup", "dd",
+    "details", "dialog", "dir", "div", "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "frameset",
+    "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr", "html", "legend", "li", "main", "menu",
+    "nav", "ol", "optgroup", "option", "p", "pre", "search", "section", "summary", "table", "tbody", "td",
+    "tfoot", "th", "thead", "title", "tr", "ul",
+}
+# Never rendered, so they don't end an inline run of text either
+TRANSPARENT_ELEMENTS = {"base", "link", "meta", "script", "style", "template"}
+# Whitespace inside these is content
+PREFORMATTED_ELEMENTS = {"pre", "textarea", "listing"}
+FOREIGN_ELEMENTS = {"svg", "math"}
+# SVG elements whose text is rendered; whitespace elsewhere in SVG is not
+FOREIGN_TEXT_ELEMENTS = {"text", "tspan", "textpath", "foreignobject"}
+
+BOOLEAN_ATTRIBUTES = {
+    "allowfullscreen", "async", "autofocus", "autoplay", "checked", "controls", "default", "defer", "disabled",
+    "formnovalidate", "inert", "ismap", "itemscope", "loop", "multiple", "muted", "nomodule", "novalidate", "open",
+    "playsinline", "readonly", "required", "reversed", "selected",
+}
+# (element, attribute) -> values that only restate the default
+DEFAULT_ATTRIBUTES = {
+    ("script", "type"): {"text/javascript", "application/javascript"},
+    ("style", "type"): {"text/css"},
+    ("link", "type"): {"text/css"},
+    ("form", "method"): {"get"},
+    ("input", "type"): {"text"},
+}
+SPACE_SEPARATED_ATTRIBUTES = {"class", "rel"}
+
+# Closing tags the parser implies (HTML spec, "optional tags"): the element's
+# end tag may go when the next token is one of these start tags, or, where
+# CLOSED_BY_PARENT holds, the end tag of the parent
+CLOSED_BY_START = {
+    "li": {"li"},
+    "dt": {"dt", "dd"},
+    "dd": {"dt", "dd"},
+    "p": {"address", "article", "aside", "blockquote", "details", "dialog", "div", "dl", "fieldset", "figcaption",
+          "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup", "hr", "main", "menu",
+          "nav", "ol", "p", "pre", "search", "section", "table", "ul"},
+    "rt": {"rt", "rp"},
+    "rp": {"rt", "rp"},
+    "optgroup": {"optgroup"},
+    "option": {"option", "optgroup"},
+    "thead": {"tbody", "tfoot"},
+    "tbody": {"tbody", "tfoot"},
+    "tfoot": set(),
+    "tr": {"tr"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "head": {"body"},
+    "body": set(),
+    "html": set(),
+}
+CLOSED_BY_PARENT = {"li", "dd", "p", "rt", "rp", "optgroup", "option", "tbody", "tfoot", "tr", "td", "th", "body"}
+# A </p> must stay when its parent is one of these or an autonomous custom
+# element (a name with a "-"), as the spec's omission rule says
+P_KEEP_PARENTS = {"a", "audio", "del", "ins", "map", "noscript", "video"}
+
+JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+JSON_TYPES = {"application/json", "application/ld+json", "importmap", "speculationrules"}
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r\f]+')
+AMBIGUOUS_AMPERSAND_RE = re.compile(r'&(?=[#A-Za-z0-9])')
+UNQUOTED_VALUE_RE = re.compile(r'[^\s"\'=<>`]*[^\s"\'=<>`/]')
+CONDITIONAL_COMMENT_RE = re.compile(r'^\[if\b|\[endif\]$')
+
+
+def keeps_p_end(parent):
+    return parent in P_KEEP_PARENTS or "-" in parent
+
+
+def escape_text(text):
+    return AMBIGUOUS_AMPERSAND_RE.sub("&amp;", text).replace("<", "&lt;")
+
+
+def quote(value):
+    value = AMBIGUOUS_AMPERSAND_RE.sub("&amp;", value)
+    if UNQUOTED_VALUE_RE.fullmatch(value):
+        return value
+    if '"' in value and "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+def minify_attributes(tag, attrs):
+    parts = []
+    for name, value in attrs:
+        if value is not None:
+            if name in SPACE_SEPARATED_ATTRIBUTES:
+                value = " ".join(value.split())
+            if value.strip().lower() in DEFAULT_ATTRIBUTES.get((tag, name), ()):
+                continue
+        # A bare attribute is the same as an empty one, and any value of a boolean one means "on"
+        if value is None or value == "" or (name in BOOLEAN_ATTRIBUTES and value.lower() in ("", name)):
+            parts.append(name)
+        else:
+            parts.append(f"{name}={quote(value)}")
+    return "".join(" " + part for part in parts)
+
+
+class HtmlMinifier(HTMLParser):
+    """Streaming HTML minifier: ``feed()`` it text in pieces and minified
+    markup goes to ``write`` as it is produced.
+
+    Whitespace is collapsed, and dropped next to block-level elements,
+    except inside <pre>, <textarea> and rendered SVG text. Comments are
+    removed except conditional ones. Boolean attributes lose their value,
+    default ones are dropped, values are quoted only when they need it and
+    optional end tags are omitted. Inline <style> and <script> bodies go
+    through ``css`` and ``js`` when given (callables taking and returning
+    source); a minifier that fails leaves the body as written.
+    """
+
+    def __init__(self, write, css=None, js=None):
+        super().__init__(convert_charrefs=True)
+        self.write = write
+        self.css = css
+        self.js = js
+        self.out = []
+        self.out_size = 0
+        self.text = []
+        # True when the last thing written ends a line box, so leading whitespace is dropped
+        self.boundary = True
+        self.in_head = False
+        self.preformatted = 0
+        self.foreign = 0
+        self.foreign_text = 0
+        self.pending_end = None
+        self.raw = None
+        self.raw_data = []
+
+    def emit(self, markup):
+        self.out.append(markup)
+        self.out_size += len(markup)
+        if self.out_size >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.out:
+            self.write("".join(self.out))
+            self.out.clear()
+            self.out_size = 0
+
+    def flush_text(self, next_boundary):
+        if not self.text:
+            return
+        text = "".join(self.text)
+        self.text.clear()
+        if not self.preformatted:
+            text = WHITESPACE_RE.sub(" ", text)
+            if text == " " and (self.in_head or (self.foreign and not self.foreign_text)):
+                return
+            if self.boundary:
+                text = text.lstrip(" ")
+            if next_boundary:
+                text = text.rstrip(" ")
+        if text:
+            self.close_pending()
+            self.emit(escape_text(text))
+            self.boundary = False
+
+    def close_pending(self):
+        if self.pending_end:
+            self.emit(f"</{self.pending_end}>")
+            self.pending_end = None
+
+    def resolve_pending(self, tag=None, start=False):
+        """Drop the held end tag if the next token (``tag``; None at the
+        end of input) implies it, else write it."""
+        pending = self.pending_end
+        if not pending:
+            return
+        if tag is None:
+            implied = True
+        elif start:
+            implied = tag in CLOSED_BY_START[pending]
+        else:
+            implied = pending in CLOSED_BY_PARENT and not (pending == "p" and keeps_p_end(tag))
+            implied = implied or (pending == "body" and tag == "html")
+        if implied:
+            self.pending_end = None
+        else:
+            self.close_pending()
+
+    def handle_starttag(self, tag, attrs):
+        self.start_tag(tag, attrs, self_closing=False)
+
+    def handle_startendtag(self, tag, attrs):
+        # Only foreign content has self-closing elements; in HTML the slash means nothing
+        self.start_tag(tag, attrs, self_closing=bool(self.foreign) or tag in FOREIGN_ELEMENTS)
+
+    def start_tag(self, tag, attrs, self_closing):
+        if self.raw:
+            return
+        block = tag in BLOCK_ELEMENTS and not self.foreign
+        self.flush_text(block)
+        self.resolve_pending(tag, start=True)
+        self.emit(f"<{tag}{minify_attributes(tag, attrs)}{'/' if self_closing else ''}>")
+        if tag not in TRANSPARENT_ELEMENTS:
+            self.boundary = block
+        if self_closing or tag in VOID_ELEMENTS:
+            return
+        if tag == "head":
+            self.in_head = True
+        elif tag in PREFORMATTED_ELEMENTS:
+            self.preformatted += 1
+        elif tag in FOREIGN_ELEMENTS:
+            self.foreign += 1
+        elif self.foreign and tag in FOREIGN_TEXT_ELEMENTS:
+            self.foreign_text += 1
+        if tag in ("script", "style"):
+            self.raw = (tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        if self.raw:
+            if tag != self.raw[0]:
+                return
+            self.end_raw()
+        block = tag in BLOCK_ELEMENTS and not self.foreign
+        self.flush_text(block)
+        self.resolve_pending(tag)
+        if tag == "head":
+            self.in_head = False
+        elif tag in PREFORMATTED_ELEMENTS:
+            self.preformatted = max(self.preformatted - 1, 0)
+        elif tag in FOREIGN_ELEMENTS:
+            self.foreign = max(self.foreign - 1, 0)
+        elif self.foreign_text and tag in FOREIGN_TEXT_ELEMENTS:
+            self.foreign_text -= 1
+        if tag in CLOSED_BY_START and not self.preformatted and not self.foreign:
+            self.pending_end = tag
+        elif tag not in VOID_ELEMENTS:
+            self.emit(f"</{tag}>")
+        if tag not in TRANSPARENT_ELEMENTS:
+            self.boundary = block
+
+    def end_raw(self):
+        tag, attrs = self.raw
+        body = "".join(self.raw_data)
+        self.raw = None
+        self.raw_data.clear()
+        self.emit(self.minify_raw(tag, attrs, body))
+
+    def minify_raw(self, tag, attrs, body):
+        if not body.strip():
+            return ""
+        script_type = (attrs.get("type") or "").strip().lower()
+        try:
+            if tag == "style" and self.css:
+                minified = self.css(body)
+            elif tag == "script" and script_type in JSON_TYPES:
+                minified = json.dumps(json.loads(body), separators=(",", ":"), ensure_ascii=False)
+                minified = minified.replace("</", "<\\/")
+            elif tag == "script" and script_type in JS_TYPES and self.js:
+                minified = self.js(body).strip()
+            else:
+                return body
+        except Exception as e:
+            print(f"Failed to minify inline <{tag}>: {e}")
+            return body
+        # The body must not end its own element early
+        if f"</{tag}" in minified.lower():
+            return body
+        return minified
+
+    def handle_data(self, data):
+        if self.raw:
+            self.raw_data.append(data)
+        else:
+            self.text.append(data)
+
+    def handle_comment(self, data):
+        if self.raw:
+            self.raw_data.append(f"<!--{data}-->")
+        elif CONDITIONAL_COMMENT_RE.search(data):
+            self.flush_text(False)
+            self.close_pending()
+            self.emit(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self.flush_text(True)
+        self.close_pending()
+        self.emit("<!doctype html>" if decl.lower() == "doctype html" else f"<!{decl}>")
+        self.boundary = True
+
+    def handle_pi(self, data):
+        self.flush_text(False)
+        self.close_pending()
+        self.emit(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        # CDATA sections in SVG/MathML and downlevel-revealed conditional comments
+        self.flush_text(False)
+        self.close_pending()
+        self.emit(f"<![{data}]>")
+
+    def close(self):
+        super().close()
+        if self.raw:
+            self.end_raw()
+        self.flush_text(True)
+        self.resolve_pending()
+        self.flush()
+
+
+def chunks(text, size=CHUNK_SIZE):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def minify_stream(pieces, write, css=None, js=None):
+    """Minify HTML arriving as an iterable of strings, writing the result
+    through ``write`` as it goes."""
+    minifier = HtmlMinifier(write, css, js)
+    for piece in pieces:
+        minifier.feed(piece)
+    minifier.close()
+
+
+def minify_html(html, css=None, js=None):
+    parts = []
+    minify_stream(chunks(html), parts.append, css, js)
+    return "".join(parts)
@@ -0,0 +1,73 @@
+from bs4 import BeautifulSoup
+
+from instrument import span
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+
+class Pipeline:
+    """Ordered transform passes over a single parse of a document.
+
+    A pass is a function ``fn(soup, context)`` that edits the tree in place.
+    Passes must be idempotent: running a pipeline over its own output
+    leaves the document unchanged, so nothing needs an "already done"
+    check or a repair script afterwards.
+    """
+
+    def __init__(self):
+        self.passes = []
+
+    def add(self, fn, order, name=None):
+        self.passes.append((order, name or fn.__name__, fn))
+        self.passes.sort(key=lambda entry: entry[0])
+
+    def register(self, order, name=None):
+        def decorator(fn):
+            self.add(fn, order, name)
+            return fn
+        return decorator
+
+    def extend(self, other):
+        combined = Pipeline()
+        for order, name, fn in self.passes + other.passes:
+            combined.add(fn, order, name)
+        return combined
+
+    def without(self, *names):
+        filtered = Pipeline()
+        for order, name, fn in self.passes:
+            if name not in names:
+                filtered.add(fn, order, name)
+        return filtered
+
+    @property
+    def names(self):
+        return [name for _, name, _ in self.passes]
+
+    def run(self, soup, context):
+        for _, name, fn in self.passes:
+            with span(name, "html"):
+                fn(soup, context)
+        return soup
+
+
+def read_html(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(path, "r", encoding="latin-1") as f:
+            return f.read()
+
+
+def parse(html):
+    return BeautifulSoup(html, PARSER)
+
+
+def write_html(path, html):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
@@ -0,0 +1,55 @@
+import os
+from PIL import Image
+
+try:
+    # Registers the AVIF codec on Pillow builds that don't ship it natively
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+Image.init()
+AVIF_SUPPORTED = "AVIF" in Image.SAVE
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def available_formats(formats):
+    if AVIF_SUPPORTED:
+        return dict(formats)
+    return {ext: options for ext, options in formats.items() if ext != "avif"}
+
+
+def variant_widths(original_width, widths):
+    # Never upscale; the original width always gets a variant of its own
+    result = sorted(w for w in widths if w < original_width)
+    result.append(original_width)
+    return result
+
+
+def encode_image(filepath, out_dir, widths, formats):
+    """Encode one source image into every format at every responsive width.
+
+    Runs inside a worker process, so it only takes and returns plain data.
+    The full-width WebP keeps the bare ``{name}.webp`` name so existing
+    references (og:image, image_src) keep pointing at a single file.
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    variants = []
+    with Image.open(filepath) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        original_width, original_height = img.size
+
+        for width in variant_widths(original_width, widths):
+            height = max(1, round(original_height * width / original_width))
+            resized = img if width == original_width else img.resize((width, height), Image.LANCZOS)
+            for ext, options in formats.items():
+                if width == original_width and ext == "webp":
+                    filename = f"{name}.{ext}"
+                else:
+                    filename = f"{name}-{width}w.{ext}"
+                resized.save(os.path.join(out_dir, filename), **options)
+                variants.append({"file": filename, "format": ext, "width": width, "height": height})
+
+    return {"width": original_width, "height": original_height, "variants": variants}
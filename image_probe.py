@@ -0,0 +1,121 @@
+import base64
+import io
+import re
+import struct
+
+from PIL import Image, ImageFilter, ImageOps
+
+# Bytes read looking for the root <svg> tag, which follows at most a prolog and comments
+SVG_HEAD_BYTES = 64 * 1024
+# JPEG start-of-frame markers (every SOFn except DHT, JPG and DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# EXIF orientations that rotate the image by 90 degrees
+EXIF_TRANSPOSED = {5, 6, 7, 8}
+
+LQIP_WIDTH = 16
+LQIP_QUALITY = 40
+
+
+def probe_size(path):
+    """(width, height) read from the file header alone, without decoding
+    pixels; None for unknown formats."""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return webp_size(head)
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return jpeg_size(f)
+        f.seek(0)
+        return svg_size(f.read(SVG_HEAD_BYTES))
+
+
+def webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", head[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def jpeg_size(f):
+    # Walk segment headers, seeking past bodies, until a start-of-frame
+    orientation = 1
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker[1] in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            # Browsers lay images out in their EXIF orientation
+            return (height, width) if orientation in EXIF_TRANSPOSED else (width, height)
+        body = f.read(length - 2)
+        if marker[1] == 0xE1 and body.startswith(b"Exif\x00\x00"):
+            orientation = exif_orientation(body[6:])
+
+
+def exif_orientation(tiff):
+    try:
+        endian = "<" if tiff[:2] == b"II" else ">"
+        offset = struct.unpack(endian + "I", tiff[4:8])[0]
+        count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+        for i in range(count):
+            entry = tiff[offset + 2 + i * 12:offset + 14 + i * 12]
+            tag, _, _, value = struct.unpack(endian + "HHIH", entry[:10])
+            if tag == 0x0112:
+                return value
+    except struct.error:
+        pass
+    return 1
+
+
+def svg_size(data):
+    match = re.search(rb'<svg\b[^>]*>', data)
+    if not match:
+        return None
+    tag = match.group().decode("utf-8", "replace")
+    attrs = dict(re.findall(r'([\w:-]+)\s*=\s*["\']([^"\']*)["\']', tag))
+    width, height = svg_length(attrs.get("width")), svg_length(attrs.get("height"))
+    view_box = [float(n) for n in re.split(r'[\s,]+', attrs.get("viewBox", "").strip()) if n]
+    if len(view_box) == 4 and view_box[2] > 0 and view_box[3] > 0:
+        # A missing or relative dimension follows the viewBox aspect ratio
+        if width is None and height is None:
+            width, height = view_box[2], view_box[3]
+        elif width is None:
+            width = height * view_box[2] / view_box[3]
+        elif height is None:
+            height = width * view_box[3] / view_box[2]
+    if width is None or height is None:
+        return None
+    return round(width), round(height)
+
+
+def svg_length(value):
+    match = re.fullmatch(r'\s*([\d.]+)\s*(px)?\s*', value or "")
+    return float(match.group(1)) if match else None
+
+
+def lqip_data_uri(path, width=LQIP_WIDTH, quality=LQIP_QUALITY):
+    """A tiny blurred WebP of the image as a data URI, or None for images
+    with transparency (the placeholder would show through them)."""
+    with Image.open(path) as img:
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            return None
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((width, width * 4))
+        img = img.filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        img.save(buffer, "WEBP", quality=quality)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
@@ -0,0 +1,188 @@
+import cProfile
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SUMMARY_ROWS = 25
+
+
+def children_usage():
+    """(CPU seconds, peak RSS in KB) of finished child processes, such as a
+    closed worker pool; (0, 0) where the platform can't say."""
+    if resource is None:
+        return 0.0, 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+
+class Instrumentation:
+    """Wall time, CPU time and memory of named spans, off unless enabled.
+
+    Spans nest and may be opened from any thread. CPU time is the
+    thread's own plus that of worker processes that finished inside the
+    span; peak memory comes from tracemalloc (Python allocations, all
+    threads) and, for worker pools, the largest worker's peak RSS.
+    Top-level spans on the main thread can also be profiled with
+    cProfile, one .prof file per span name. Events export to the Chrome
+    trace format (chrome://tracing, Perfetto, speedscope).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.cprofile_dir = None
+        self.events = []
+        self.profilers = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+
+    def enable(self, memory=False, cprofile_dir=None):
+        self.enabled = True
+        self.memory = memory
+        self.cprofile_dir = cprofile_dir
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def span(self, name, category="stage", **args):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name, category, args):
+        stack = self.local.__dict__.setdefault("stack", [])
+        frame = {"peak": 0}
+        main = threading.current_thread() is threading.main_thread()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The enclosing span keeps the peak reached so far; this one measures from here
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            start_memory = current
+        profiler = None
+        if self.cprofile_dir and main and not stack:
+            profiler = self.profilers.setdefault(name, cProfile.Profile())
+            profiler.enable()
+        stack.append(frame)
+        children_cpu, children_rss = children_usage() if main else (0.0, 0)
+        start_cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - start_cpu
+            stack.pop()
+            if profiler:
+                profiler.disable()
+            event_args = dict(args)
+            if main:
+                cpu_after, rss_after = children_usage()
+                cpu += cpu_after - children_cpu
+                if rss_after > children_rss:
+                    event_args["workers_peak_rss_kb"] = rss_after
+            event_args["cpu_ms"] = round(cpu * 1000, 2)
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame["peak"])
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+                event_args["peak_kb"] = round(peak / 1024)
+                event_args["allocated_kb"] = round((current - start_memory) / 1024)
+            with self.lock:
+                self.events.append({
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": round((start - self.origin) * 1e6),
+                    "dur": round(wall * 1e6),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": event_args,
+                })
+
+    def drain(self):
+        """Hand the recorded events over (from a worker process to the parent)."""
+        with self.lock:
+            events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        with self.lock:
+            self.events.extend(events)
+
+    def write_trace(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+
+    def write_profiles(self):
+        if not self.cprofile_dir:
+            return []
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        # Worker processes profile the same stage names; keep their files apart
+        suffix = "" if multiprocessing.parent_process() is None else f"-{os.getpid()}"
+        paths = []
+        for name, profiler in self.profilers.items():
+            path = os.path.join(self.cprofile_dir, re.sub(r'[^\w.-]', '_', name) + suffix + ".prof")
+            profiler.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def summary(self, rows=SUMMARY_ROWS):
+        totals = {}
+        for event in self.events:
+            entry = totals.setdefault((event["cat"], event["name"]), {"count": 0, "wall": 0, "cpu": 0, "peak": None})
+            entry["count"] += 1
+            entry["wall"] += event["dur"] / 1000
+            entry["cpu"] += event["args"]["cpu_ms"]
+            if "peak_kb" in event["args"]:
+                entry["peak"] = max(entry["peak"] or 0, event["args"]["peak_kb"])
+        lines = [f"{'span':<44} {'count':>6} {'wall ms':>10} {'cpu ms':>10} {'peak KB':>9}"]
+        ranked = sorted(totals.items(), key=lambda item: item[1]["wall"], reverse=True)
+        for (category, name), entry in ranked[:rows]:
+            peak = "-" if entry["peak"] is None else str(entry["peak"])
+            lines.append(f"{(category + ':' + name)[:44]:<44} {entry['count']:>6} {entry['wall']:>10.1f} "
+                         f"{entry['cpu']:>10.1f} {peak:>9}")
+        if len(ranked) > rows:
+            lines.append(f"... {len(ranked) - rows} more span(s) in the trace")
+        return "\n".join(lines)
+
+    def finish(self, trace_path=None):
+        """Write the trace and profiles, and print the summary."""
+        if not self.enabled:
+            return
+        if trace_path:
+            self.write_trace(trace_path)
+            print(f"Trace written to {trace_path} ({len(self.events)} spans)")
+        for path in self.write_profiles():
+            print(f"Profile written to {path}")
+        print(self.summary())
+
+
+def add_arguments(parser):
+    parser.add_argument("--trace", metavar="PATH", help="record per-stage timings and write a Chrome trace file")
+    parser.add_argument("--trace-memory", action="store_true", help="also track peak memory with tracemalloc (slower)")
+    parser.add_argument("--cprofile", metavar="DIR", help="also cProfile each top-level stage into DIR")
+
+
+def configure(args):
+    if args.trace or args.trace_memory or args.cprofile:
+        instrument.enable(args.trace_memory, args.cprofile)
+
+
+instrument = Instrumentation()
+span = instrument.span
@@ -1,113 +1,649 @@
+import argparse
 import os
 import glob
+import shutil
+import subprocess
+import sys
+import time
+from fnmatch import fnmatch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import PIL
 from PIL import Image
-from csscompressor import compress
+import jsmin as jsmin_module
 from jsmin import jsmin
-from bs4 import BeautifulSoup
 import re
+import soupsieve
+import xml.etree.ElementTree as ET
+
+from build_cache import BuildCache
+from html_pipeline import Pipeline, parse, read_html
+from fingerprint import Fingerprinter, is_hashed
+from image_probe import lqip_data_uri, probe_size
+from svg_optimizer import inline_class_styles, local_name, optimize_svg, prefix_ids
+from report import BuildReport, load_budgets
+from instrument import add_arguments, configure as configure_instrument, instrument, span
+from precompress import ENCODINGS, available_suffixes, compress_file, encoder_versions, is_compressible, sibling_matches
+from css_optimizer import optimize_css
+from cssparse import split_top_level
+from html_minifier import chunks, minify_stream
+from script_loader import CLASSIC_TYPES, SCHEDULED_POLICIES, hold, loader_runtime, script_policy
+from critical_css import FOLD_ELEMENTS, CriticalMatcher, critical_css_for, fold_elements, retarget_rules
+from image_encoder import MIME_TYPES, available_formats, encode_image
+from purge_css import UsedIndex, purge_css
+from font_optimizer import (FONTTOOLS_VERSION, LEGACY_FONT_EXTENSIONS, SUBSETTABLE_EXTENSIONS, font_unicode_ranges,
+                            has_woff2_sibling, icon_codepoints, rewrite_font_urls, subset_font, text_codepoints)
 
 OUTPUT_DIR = "."
-CSS_DIR = os.path.join(OUTPUT_DIR, "css")
-JS_DIR = os.path.join(OUTPUT_DIR, "js")
-IMG_DIR = os.path.join(OUTPUT_DIR, "images")
-
-# Critical CSS extracted from site.css to prevent CLS while keeping HTML size low
-CRITICAL_CSS = """
-body{background:#141414;font-family:'Roboto',sans-serif;font-size:14px;color:#fff}
-#wrapper{width:100%;float:left;overflow:hidden}
-.mycontainer{padding:0 15px;margin:0 auto;max-width:1140px;width:100%;position:relative}
-#headerCntr{padding:20px 20px 0 20px;width:100%;float:left;background:#2a2a2a}
-.logoArea{margin:5px 0 0 0;float:left}
-.logoArea a{display:block}
-.logoArea a img{width:195px}
-.headerRight{float:right}
-.menuArea{padding:20px 0 0 0;width:100%;float:left}
-.menuArea ul{list-style:none}
-.menuArea li{margin-right:35px;float:left}
-.menuArea li a{padding-bottom:14px;display:block;font-size:16px;color:#fff;font-weight:500;text-decoration:none;border-bottom:2px solid transparent}
-#middleCntr{width:100%;float:left}
-.middleBox{padding:50px 0;width:100%;float:left}
-.list_sideBar{width:100%;float:left}
-.midcontent{padding:0;width:100%;float:left}
-.d-none{display:none!important}
-.d-block{display:block!important}
-@media(min-width:768px){.d-md-block{display:block!important}.d-md-none{display:none!important}}
-@media(min-width:992px){.d-lg-block{display:block!important}}
-@media(min-width:1200px){.d-xl-block{display:block!important}}
-"""
-
-def optimize_images():
+# Root of css/, js/, images/, ...; batch builds share one across many pages
+ASSETS_DIR = OUTPUT_DIR
+CSS_DIR = os.path.join(ASSETS_DIR, "css")
+JS_DIR = os.path.join(ASSETS_DIR, "js")
+IMG_DIR = os.path.join(ASSETS_DIR, "images")
+FONTS_DIR = os.path.join(ASSETS_DIR, "fonts")
+WEBFONTS_DIR = os.path.join(ASSETS_DIR, "webfonts")
+
+# Built outputs live apart from the sources so re-runs never minify minified files
+BUILD_DIR = os.path.join(OUTPUT_DIR, "dist")
+BUILD_CSS_DIR = os.path.join(BUILD_DIR, "css")
+BUILD_JS_DIR = os.path.join(BUILD_DIR, "js")
+BUILD_IMG_DIR = os.path.join(BUILD_DIR, "images")
+
+CACHE_FILE = os.path.join(OUTPUT_DIR, ".build-cache.json")
+REPORT_FILE = os.path.join(OUTPUT_DIR, "build-report.json")
+# Transfer-size limits in bytes; the build fails when the page exceeds one
+BUDGETS_FILE = os.path.join(OUTPUT_DIR, "budgets.json")
+
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+
+# Encoder settings per output format; AVIF is dropped when Pillow can't write it
+IMAGE_FORMATS = {
+    "avif": {"format": "AVIF", "quality": AVIF_QUALITY},
+    "webp": {"format": "WEBP", "quality": WEBP_QUALITY, "method": 6},
+}
+RESPONSIVE_WIDTHS = [480, 960, 1440]
+# Default `sizes` for responsive images that don't declare their own
+IMAGE_SIZES = "100vw"
+IMAGE_WORKERS = os.cpu_count()
+PRECOMPRESS_WORKERS = os.cpu_count()
+
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Blurred thumbnail shown behind lazy-loaded raster images until they arrive
+LQIP_PLACEHOLDERS = True
+LQIP_EXTENSIONS = RASTER_EXTENSIONS + ('.webp', '.gif')
+# width/height that older download_assets runs stamped on every <img>, replaced
+# by the file's real size. Off by default, since a page may really mean it;
+# set it to ("100", "100") for pages saved by those runs
+PLACEHOLDER_SIZE = None
+
+# Decimal places kept in SVG coordinates
+SVG_PRECISION = 3
+# SVG <img>s at most this large once optimized are inlined into the page; the
+# ones used more than once become <symbol>s in a single inline sprite
+SVG_INLINE_MAX_BYTES = 2048
+
+# Cascade order of index.html's stylesheets, which earlier runs wrote out of
+# order. A page's own sheets are used in this order, then any others it links
+# in document order; critical CSS follows the same order so it never
+# disagrees with the full sheets once they load
+STYLESHEETS = ["bootstrap.min.css", "bootstrap-formhelpers.min.css", "all.min.css", "roboto.css", "site.css"]
+CSS_IMPORT_RE = re.compile(r'@import\s+url\(\s*[\'"]?([^\'")]+?)[\'"]?\s*\)\s*;?')
+
+# Stylesheets purged of rules that match nothing in index.html or js/
+PURGE_STYLESHEETS = ["bootstrap.min.css", "bootstrap-formhelpers.min.css", "all.min.css", "site.css"]
+# Names only added at runtime that the purge must keep (exact or shell-style patterns)
+PURGE_SAFELIST = ["show", "showing", "active", "open", "in", "fade", "collapse", "collapsing", "modal-*", "tooltip*", "popover*", "dropdown-*", "cc-*"]
+
+# Fonts whose glyph set comes from the icon classes used on the page, and the
+# stylesheets that map those classes to codepoints
+ICON_FONTS = ["fa-*"]
+ICON_STYLESHEETS = ["all.min.css"]
+# Subset fonts to the glyphs the page uses; needs fontTools (and brotli for woff2)
+SUBSET_FONTS = FONTTOOLS_VERSION is not None
+# Given to every @font-face that doesn't set its own
+FONT_DISPLAY = "swap"
+
+def configure(output_dir, build_dir=None, assets_dir=None):
+    """Point every stage at another page (``output_dir``/index.html), asset
+    tree and build directory. Used by batch builds, one page at a time."""
+    global OUTPUT_DIR, ASSETS_DIR, CSS_DIR, JS_DIR, IMG_DIR, FONTS_DIR, WEBFONTS_DIR
+    global BUILD_DIR, BUILD_CSS_DIR, BUILD_JS_DIR, BUILD_IMG_DIR, CACHE_FILE, REPORT_FILE, USED_INDEX
+    OUTPUT_DIR = output_dir
+    ASSETS_DIR = assets_dir or output_dir
+    CSS_DIR = os.path.join(ASSETS_DIR, "css")
+    JS_DIR = os.path.join(ASSETS_DIR, "js")
+    IMG_DIR = os.path.join(ASSETS_DIR, "images")
+    FONTS_DIR = os.path.join(ASSETS_DIR, "fonts")
+    WEBFONTS_DIR = os.path.join(ASSETS_DIR, "webfonts")
+    BUILD_DIR = build_dir or os.path.join(output_dir, "dist")
+    BUILD_CSS_DIR = os.path.join(BUILD_DIR, "css")
+    BUILD_JS_DIR = os.path.join(BUILD_DIR, "js")
+    BUILD_IMG_DIR = os.path.join(BUILD_DIR, "images")
+    CACHE_FILE = os.path.join(output_dir, ".build-cache.json")
+    REPORT_FILE = os.path.join(output_dir, "build-report.json")
+    USED_INDEX = None
+
+# terser (npm) adds dead-code removal and name mangling; jsmin is the fallback
+TERSER = shutil.which("terser")
+# Loading policy per script src (shell-style patterns, first match wins); a
+# data-load attribute on the tag overrides it. See script_loader.POLICIES
+SCRIPT_POLICIES = {
+    "js/cookieconsent.min.js": "idle",
+    # Analytics beacon
+    "js/script.js": "idle",
+    # Ad network runtime; its ads open on a click anyway
+    "js/z9mb25c.js": "interaction",
+}
+DEFAULT_SCRIPT_POLICY = "defer"
+
+# Hash of the build scripts, so changing a stage's code invalidates its cache entries
+CODE_HASH = None
+
+def code_hash(cache):
+    global CODE_HASH
+    if CODE_HASH is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        CODE_HASH = cache.key([cache.file_hash(p) for p in sorted(glob.glob(os.path.join(script_dir, "*.py")))])
+    return CODE_HASH
+
+def optimize_images(cache):
     print("Optimizing images...")
+    os.makedirs(BUILD_IMG_DIR, exist_ok=True)
+    formats = available_formats(IMAGE_FORMATS)
     image_map = {}
+    pending = {}
     for filepath in glob.glob(os.path.join(IMG_DIR, "*")):
-        if filepath.lower().endswith(('.png', '.jpg', '.jpeg')):
+        if filepath.lower().endswith(RASTER_EXTENSIONS):
+            filename = os.path.basename(filepath)
+            key = cache.key(cache.file_hash(filepath), RESPONSIVE_WIDTHS, formats, PIL.__version__, code_hash(cache))
+            if cache.fresh(filepath, key):
+                image_map[filename] = cache.data(filepath)
+            else:
+                pending[filepath] = key
+
+    if not pending:
+        return image_map
+
+    # Encoding is CPU bound, so spread the sources across every core
+    with span("encode", "image", files=len(pending)), ProcessPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+        futures = {
+            pool.submit(encode_image, filepath, BUILD_IMG_DIR, RESPONSIVE_WIDTHS, formats): filepath
+            for filepath in pending
+        }
+        for future in as_completed(futures):
+            filepath = futures[future]
             filename = os.path.basename(filepath)
-            name, ext = os.path.splitext(filename)
-            webp_filename = f"{name}.webp"
-            webp_filepath = os.path.join(IMG_DIR, webp_filename)
-            
             try:
-                with Image.open(filepath) as img:
-                    img.save(webp_filepath, "WEBP", quality=80, optimize=True)
-                
-                image_map[filename] = webp_filename
-                print(f"Converted {filename} to {webp_filename}")
+                info = future.result()
             except Exception as e:
                 print(f"Failed to convert {filename}: {e}")
+                continue
+
+            info["src"] = f"{os.path.splitext(filename)[0]}.webp"
+            outputs = [os.path.join(BUILD_IMG_DIR, v["file"]) for v in info["variants"]]
+            cache.record(filepath, pending[filepath], outputs, data=info)
+            image_map[filename] = info
+            print(f"Converted {filename} to {len(outputs)} variant(s)")
     return image_map
 
-def minify_css():
-    print("Minifying CSS...")
-    for filepath in glob.glob(os.path.join(CSS_DIR, "*.css")):
+def optimize_svgs(cache):
+    print("Optimizing SVGs...")
+    os.makedirs(BUILD_IMG_DIR, exist_ok=True)
+    for filepath in glob.glob(os.path.join(IMG_DIR, "*.svg")):
+        filename = os.path.basename(filepath)
+        out_path = os.path.join(BUILD_IMG_DIR, filename)
+        key = cache.key(cache.file_hash(filepath), SVG_PRECISION, code_hash(cache))
+        if cache.fresh(out_path, key):
+            continue
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            # Add font-display: swap
-            content = re.sub(r'@font-face\s*{', r'@font-face { font-display: swap; ', content)
-            
-            minified = compress(content)
-            
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(minified)
-            print(f"Minified {os.path.basename(filepath)}")
+            with open(filepath, "rb") as f:
+                original = f.read()
+            optimized = optimize_svg(original, SVG_PRECISION).encode("utf-8")
+            with open(out_path, "wb") as f:
+                f.write(optimized if len(optimized) < len(original) else original)
+            print(f"Optimized {filename}: {len(original)} -> {min(len(optimized), len(original))} bytes")
         except Exception as e:
-            print(f"Failed to minify {filepath}: {e}")
+            # Serve it untouched rather than not at all
+            print(f"Failed to optimize {filename}: {e}")
+            shutil.copyfile(filepath, out_path)
+        cache.record(out_path, key, [out_path])
+
+def content_sources():
+    # Everything that can reference a selector: the page and its scripts
+    return [os.path.join(OUTPUT_DIR, "index.html")] + sorted(glob.glob(os.path.join(JS_DIR, "*.js")))
+
+# Built lazily and shared by the purge and font stages; only needed on a cache miss
+USED_INDEX = None
+
+def used_index():
+    global USED_INDEX
+    if USED_INDEX is None:
+        USED_INDEX = UsedIndex(PURGE_SAFELIST)
+        for path in content_sources():
+            if path.endswith(".html"):
+                USED_INDEX.add_html(read_html(path))
+                continue
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                USED_INDEX.add_js(f.read())
+    return USED_INDEX
+
+def source_path(path):
+    # Asset-root relative, forward-slashed; the form CSS url()s resolve to
+    return os.path.relpath(path, ASSETS_DIR).replace(os.sep, "/")
+
+def build_rel(path):
+    # BUILD_DIR relative, forward-slashed; the form fingerprinted names take
+    return os.path.relpath(path, BUILD_DIR).replace(os.sep, "/")
+
+def font_codepoints():
+    # Decoded as the pipeline decodes it, so the subset covers the text the page shows
+    text = text_codepoints(read_html(os.path.join(OUTPUT_DIR, "index.html")))
+    icons = set()
+    ranges = {}
+    for css_path in glob.glob(os.path.join(CSS_DIR, "*.css")):
+        with open(css_path, "r", encoding="utf-8") as f:
+            css = f.read()
+        if os.path.basename(css_path) in ICON_STYLESHEETS:
+            icons |= icon_codepoints(css, used_index().classes)
+        if "@font-face" in css:
+            for path, allowed in font_unicode_ranges(css, source_path(CSS_DIR)).items():
+                ranges[path] = None if allowed is None or ranges.get(path, set()) is None else ranges.get(path, set()) | allowed
+    return text, icons, ranges
+
+def optimize_fonts(cache):
+    print("Optimizing fonts...")
+    font_paths = sorted(
+        (p for d in [FONTS_DIR, WEBFONTS_DIR] for p in glob.glob(os.path.join(d, "*")) if os.path.isfile(p)),
+        key=lambda p: [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', p)],
+    )
+    content_hashes = [cache.file_hash(p) for p in content_sources()]
+    css_hashes = [cache.file_hash(p) for p in sorted(glob.glob(os.path.join(CSS_DIR, "*.css")))]
+
+    font_map = {}
+    canonical = {}
+    pending = {}
+    for filepath in font_paths:
+        rel = source_path(filepath)
+        # woff2 is enough for every browser we target, so legacy formats go
+        if filepath.lower().endswith(LEGACY_FONT_EXTENSIONS) and has_woff2_sibling(filepath):
+            font_map[rel] = None
+            continue
+
+        # Byte-identical files collapse onto the first one
+        digest = cache.file_hash(filepath)
+        if digest in canonical:
+            font_map[rel] = canonical[digest]
+            continue
+        canonical[digest] = rel
+        font_map[rel] = rel
+
+        out_path = os.path.join(BUILD_DIR, rel)
+        if SUBSET_FONTS and filepath.lower().endswith(SUBSETTABLE_EXTENSIONS):
+            key = cache.key(digest, content_hashes, css_hashes, PURGE_SAFELIST, FONTTOOLS_VERSION, code_hash(cache))
+            if cache.fresh(filepath, key):
+                if not cache.data(filepath):
+                    font_map[rel] = None
+            else:
+                pending[filepath] = key
+        else:
+            key = cache.key(digest, "copy")
+            if not cache.fresh(out_path, key):
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                shutil.copyfile(filepath, out_path)
+                cache.record(out_path, key, [out_path])
+
+    if pending:
+        text, icons, ranges = font_codepoints()
+        jobs = {}
+        for filepath, key in pending.items():
+            codepoints = icons if any(fnmatch(os.path.basename(filepath), p) for p in ICON_FONTS) else text
+            # A file only renders the codepoints its @font-face unicode-range allows
+            allowed = set()
+            for rel, target in font_map.items():
+                if target == source_path(filepath) and rel in ranges:
+                    allowed = None if allowed is None or ranges[rel] is None else allowed | ranges[rel]
+            if allowed:
+                codepoints = codepoints & allowed
+            jobs[filepath] = (codepoints, cache.key(cache.file_hash(filepath), sorted(codepoints), FONTTOOLS_VERSION, code_hash(cache)))
 
-def minify_js():
+        with ProcessPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+            futures = {}
+            for filepath, (codepoints, glyph_key) in jobs.items():
+                out_path = os.path.join(BUILD_DIR, source_path(filepath))
+                # Edits that leave this font's glyph set alone reuse the last subset
+                if cache.fresh(f"{filepath}:glyphs", glyph_key):
+                    kept = cache.data(f"{filepath}:glyphs")
+                    cache.record(filepath, pending[filepath], [out_path] if kept else [], data=kept)
+                    if not kept:
+                        font_map[source_path(filepath)] = None
+                    continue
+                futures[pool.submit(subset_font, filepath, out_path, codepoints)] = filepath
+            for future in as_completed(futures):
+                filepath = futures[future]
+                out_path = os.path.join(BUILD_DIR, source_path(filepath))
+                try:
+                    kept = future.result()
+                except Exception as e:
+                    print(f"Failed to subset {os.path.basename(filepath)}: {e}")
+                    continue
+                outputs = [out_path] if kept else []
+                cache.record(filepath, pending[filepath], outputs, data=kept)
+                cache.record(f"{filepath}:glyphs", jobs[filepath][1], outputs, data=kept)
+                if not kept:
+                    font_map[source_path(filepath)] = None
+
+    # Duplicates follow their canonical file, including when it was dropped
+    for rel, target in font_map.items():
+        if target is not None and target != rel:
+            font_map[rel] = font_map[target]
+
+    unique = sum(1 for rel, target in font_map.items() if target == rel)
+    print(f"Fonts: {len(font_paths)} source file(s), {unique} emitted")
+    return font_map
+
+def minify_css(cache, font_map):
+    print("Minifying CSS...")
+    os.makedirs(BUILD_CSS_DIR, exist_ok=True)
+    content_hashes = [cache.file_hash(p) for p in content_sources()]
+    for filepath in glob.glob(os.path.join(CSS_DIR, "*.css")):
+        filename = os.path.basename(filepath)
+        out_path = os.path.join(BUILD_CSS_DIR, filename)
+        purge = filename in PURGE_STYLESHEETS
+        key = cache.key(cache.file_hash(filepath), FONT_DISPLAY, code_hash(cache),
+                        font_map, purge and (content_hashes, PURGE_SAFELIST))
+        if cache.fresh(out_path, key):
+            continue
+        with span(filename, "css"):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    content = f.read()
+
+                if "@font-face" in content:
+                    content = rewrite_font_urls(content, font_map, source_path(CSS_DIR))
+
+                if purge:
+                    before = len(content)
+                    content = purge_css(content, used_index())
+                    print(f"Purged {filename}: {before} -> {len(content)} bytes")
+
+                # Also adds font-display to every @font-face that lacks one
+                minified = optimize_css(content, FONT_DISPLAY)
+
+                with open(out_path, "w", encoding="utf-8") as f:
+                    f.write(minified)
+                cache.record(out_path, key, [out_path])
+                print(f"Minified {os.path.basename(filepath)}")
+            except Exception as e:
+                print(f"Failed to minify {filepath}: {e}")
+
+def minify_js_source(content):
+    if TERSER:
+        result = subprocess.run(
+            [TERSER, "--compress", "passes=2", "--mangle", "--comments", "/^!/"],
+            input=content, capture_output=True, text=True, encoding="utf-8", check=True,
+        )
+        return result.stdout
+    return jsmin(content)
+
+def minify_js(cache):
     print("Minifying JS...")
+    os.makedirs(BUILD_JS_DIR, exist_ok=True)
     for filepath in glob.glob(os.path.join(JS_DIR, "*.js")):
+        out_path = os.path.join(BUILD_JS_DIR, os.path.basename(filepath))
+        key = cache.key(cache.file_hash(filepath), TERSER or "jsmin", jsmin_module.__version__, code_hash(cache))
+        if cache.fresh(out_path, key):
+            continue
+        with span(os.path.basename(filepath), "js"):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    content = f.read()
+                
+                minified = minify_js_source(content)
+                
+                with open(out_path, "w", encoding="utf-8") as f:
+                    f.write(minified)
+                cache.record(out_path, key, [out_path])
+                print(f"Minified {os.path.basename(filepath)}")
+            except Exception as e:
+                print(f"Failed to minify {filepath}: {e}")
+
+def copy_static(cache):
+    # Everything the minifiers and font stage don't produce is copied verbatim; raster
+    # originals are kept as the <img> fallback inside <picture>
+    print("Copying static assets...")
+    for src_dir in [CSS_DIR, JS_DIR, IMG_DIR]:
+        for filepath in glob.glob(os.path.join(src_dir, "*")):
+            lower = filepath.lower()
+            if not os.path.isfile(filepath):
+                continue
+            if src_dir == CSS_DIR and lower.endswith(".css"):
+                continue
+            if src_dir == JS_DIR and lower.endswith(".js"):
+                continue
+            if src_dir == IMG_DIR and lower.endswith(".svg"):
+                continue
+
+            out_path = os.path.join(BUILD_DIR, source_path(filepath))
+            key = cache.key(cache.file_hash(filepath), "copy")
+            if cache.fresh(out_path, key):
+                continue
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            shutil.copyfile(filepath, out_path)
+            cache.record(out_path, key, [out_path])
+
+def srcset(variants, ext):
+    return ", ".join(f"images/{v['file']} {v['width']}w" for v in variants if v["format"] == ext)
+
+def add_picture_sources(soup, img, info):
+    sizes = img.get("sizes") or IMAGE_SIZES
+    picture = img.parent if img.parent and img.parent.name == "picture" else None
+    if picture is None:
+        picture = soup.new_tag("picture")
+        img.wrap(picture)
+    else:
+        for source in picture.find_all("source"):
+            source.decompose()
+
+    # Browsers pick the first <source> they support, so best compression goes first
+    for ext in ["avif", "webp"]:
+        candidates = srcset(info["variants"], ext)
+        if candidates:
+            img.insert_before(soup.new_tag("source", type=MIME_TYPES[ext], srcset=candidates, sizes=sizes))
+
+    if not img.has_attr("width") and not img.has_attr("height"):
+        img["width"] = str(info["width"])
+        img["height"] = str(info["height"])
+
+def image_info(cache, path, lqip):
+    # Header probe (and placeholder) per content hash, so unchanged images are never reopened
+    digest = cache.file_hash(path)
+    name = f"probe:{os.path.abspath(path)}"
+    info = cache.data(name)
+    if info and info["hash"] == digest and (not lqip or "lqip" in info):
+        return info
+    size = probe_size(path)
+    info = {"hash": digest, "size": list(size) if size else None}
+    if lqip and path.lower().endswith(LQIP_EXTENSIONS):
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            minified = jsmin(content)
-            
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(minified)
-            print(f"Minified {os.path.basename(filepath)}")
+            info["lqip"] = lqip_data_uri(path)
         except Exception as e:
-            print(f"Failed to minify {filepath}: {e}")
+            print(f"Failed to make a placeholder for {path}: {e}")
+            info["lqip"] = None
+    cache.record(name, digest, [], data=info)
+    return info
 
-def update_html(image_map):
-    print("Updating HTML...")
-    html_path = os.path.join(OUTPUT_DIR, "index.html")
-    
-    try:
-        with open(html_path, "r", encoding="utf-8") as f:
-            soup = BeautifulSoup(f, "html.parser")
-    except UnicodeDecodeError:
-        with open(html_path, "r", encoding="latin-1") as f:
-            soup = BeautifulSoup(f, "html.parser")
+def add_style(tag, prop, value):
+    # Unless the tag already sets ``prop`` itself; values may hold ";" (data: URIs)
+    declarations = split_top_level(tag.get("style", ""), ";")
+    if prop not in [d.partition(":")[0].strip().lower() for d in declarations]:
+        tag["style"] = ";".join(declarations + [f"{prop}:{value}"])
+
+pipeline = Pipeline()
+
+@pipeline.register(5)
+def image_dimensions(soup, context):
+    # Intrinsic sizes from the file headers stop layout shift; loading priority follows the fold
+    cache = context["cache"]
+    fold = {id(el) for el in fold_elements(soup, FOLD_ELEMENTS)}
+    above_fold = []
+    for img in soup.find_all("img", src=True):
+        path = os.path.join(ASSETS_DIR, img["src"])
+        if re.match(r'^(?:[a-z]+:|/)', img["src"], re.I) or not os.path.isfile(path):
+            continue
+        in_fold = id(img) in fold
+        info = image_info(cache, path, LQIP_PLACEHOLDERS and not in_fold)
+        area = 0
+        if info["size"]:
+            width, height = info["size"]
+            area = width * height
+            given = (img.get("width"), img.get("height"))
+            if given == (None, None) or given == PLACEHOLDER_SIZE:
+                img["width"], img["height"] = str(width), str(height)
+            elif given[1] is None and given[0].isdigit():
+                img["height"] = str(round(int(given[0]) * height / width))
+            elif given[0] is None and given[1].isdigit():
+                img["width"] = str(round(int(given[1]) * width / height))
+            add_style(img, "aspect-ratio", f"{width}/{height}")
+
+        if in_fold:
+            if img.has_attr("loading"):
+                del img["loading"]
+            above_fold.append((area, img))
+        else:
+            img["loading"] = "lazy"
+            img["decoding"] = "async"
+            if info.get("lqip"):
+                # Longhands, so an author background-color still applies
+                add_style(img, "background-image", f"url({info['lqip']})")
+                add_style(img, "background-size", "cover")
+                add_style(img, "background-position", "center")
 
-    # Update Images to WebP
+    # The largest image above the fold is the likely LCP element
+    if above_fold:
+        lcp = max(above_fold, key=lambda entry: entry[0])[1]
+        for _, img in above_fold:
+            if img is not lcp and img.get("fetchpriority") == "high":
+                del img["fetchpriority"]
+        lcp["fetchpriority"] = "high"
+
+@pipeline.register(10)
+def picture_sources(soup, context):
+    # Serve responsive AVIF/WebP through <picture>, keeping the original as fallback
+    image_map = context["image_map"]
     for img in soup.find_all("img"):
         src = img.get("src")
         if src and src.startswith("images/"):
             filename = os.path.basename(src)
             if filename in image_map:
-                img["src"] = f"images/{image_map[filename]}"
-                
+                add_picture_sources(soup, img, image_map[filename])
+
+def svg_tag(soup, el):
+    # new_tag keeps the case of viewBox, linearGradient, ...
+    tag = soup.new_tag(local_name(el.tag), attrs={local_name(k): v for k, v in el.attrib.items()})
+    if el.text:
+        tag.string = el.text
+    for child in el:
+        tag.append(svg_tag(soup, child))
+    return tag
+
+def embeddable_svg(src):
+    # Parsed, with styles turned into attributes and ids namespaced, or None
+    # when the file is missing, too big or can't be made collision-free
+    path = os.path.join(BUILD_DIR, src)
+    if not os.path.isfile(path) or os.path.getsize(path) > SVG_INLINE_MAX_BYTES:
+        return None
+    root = ET.parse(path).getroot()
+    if not inline_class_styles(root):
+        return None
+    prefix_ids(root, f"{svg_id(src)}-")
+    return root
+
+def img_rules_for_svgs(soup, imgs):
+    """The page's CSS rules that style any of ``imgs`` through an img
+    selector, retargeted at the <svg data-img> that replaces them. :where()
+    keeps each copy at the specificity the img rule had."""
+    def keep(selector):
+        try:
+            compiled = soupsieve.compile(selector)
+        except Exception:
+            return True
+        return any(compiled.match(img) for img in imgs)
+
+    sources = []
+    for css_file in page_stylesheets(soup):
+        with open(os.path.join(CSS_DIR, css_file), "r", encoding="utf-8") as f:
+            sources.append(f.read())
+    sources.extend(style.string or "" for style in soup.find_all("style"))
+    return "".join(retarget_rules(css, "img", "svg:where([data-img])", keep) for css in sources)
+
+def svg_id(src):
+    return "svg-" + re.sub(r'[^\w-]', '-', os.path.splitext(os.path.basename(src))[0])
+
+@pipeline.register(15)
+def inline_svg_images(soup, context):
+    # Small SVGs cost more as requests than as markup
+    imgs = [img for img in soup.find_all("img", src=True)
+            if img["src"].startswith("images/") and img["src"].lower().endswith(".svg") and not img.has_attr("srcset")]
+    roots = {src: embeddable_svg(src) for src in {img["src"] for img in imgs}}
+    imgs = [img for img in imgs if roots[img["src"]] is not None]
+    if not imgs:
+        return
+    uses = {}
+    for img in imgs:
+        uses[img["src"]] = uses.get(img["src"], 0) + 1
+
+    # Rules written for the <img>s have to follow them onto the <svg>s
+    img_css = img_rules_for_svgs(soup, imgs)
+    if img_css:
+        style = soup.new_tag("style", attrs={"data-img-rules": ""})
+        style.string = img_css
+        soup.head.append(style)
+
+    sprite = soup.find("svg", attrs={"data-sprite": True})
+    for img in imgs:
+        root = roots[img["src"]]
+        svg = soup.new_tag("svg")
+        if img_css:
+            svg["data-img"] = ""
+        for attr in ["id", "class", "style"]:
+            if img.has_attr(attr):
+                svg[attr] = img[attr]
+        for attr in ["width", "height"]:
+            if img.get(attr) or root.get(attr):
+                svg[attr] = img.get(attr) or root.get(attr)
+        if img.get("alt"):
+            svg["role"] = "img"
+            svg["aria-label"] = img["alt"]
+        else:
+            svg["aria-hidden"] = "true"
+
+        if uses[img["src"]] > 1:
+            symbol_id = svg_id(img["src"])
+            if sprite is None:
+                # Not display:none, which stops gradients and clip paths inside it from rendering
+                sprite = soup.new_tag("svg", attrs={"data-sprite": "", "aria-hidden": "true",
+                                                    "style": "position:absolute;width:0;height:0;overflow:hidden"})
+                soup.body.insert(0, sprite)
+            if not sprite.find("symbol", id=symbol_id):
+                symbol = svg_tag(soup, root)
+                symbol.name = "symbol"
+                symbol.attrs = {"id": symbol_id, "viewBox": root.get("viewBox", f"0 0 {root.get('width')} {root.get('height')}")}
+                sprite.append(symbol)
+            svg["viewBox"] = sprite.find("symbol", id=symbol_id)["viewBox"]
+            svg.append(soup.new_tag("use", href=f"#{symbol_id}"))
+        else:
+            inline = svg_tag(soup, root)
+            svg["viewBox"] = inline.get("viewBox", f"0 0 {root.get('width')} {root.get('height')}")
+            for child in list(inline.children):
+                svg.append(child.extract())
+        img.replace_with(svg)
+        print(f"Inlined {img['src']}" + (" as a sprite symbol" if uses[img["src"]] > 1 else ""))
+
+@pipeline.register(20)
+def social_images(soup, context):
+    image_map = context["image_map"]
+
     # Update meta og:image
     meta_image = soup.find("meta", property="og:image")
     if meta_image:
@@ -115,7 +651,7 @@ def update_html(image_map):
         if content and content.startswith("images/"):
             filename = os.path.basename(content)
             if filename in image_map:
-                meta_image["content"] = f"images/{image_map[filename]}"
+                meta_image["content"] = f"images/{image_map[filename]['src']}"
 
     # Update link rel="image_src"
     link_image = soup.find("link", rel="image_src")
@@ -124,75 +660,155 @@ def update_html(image_map):
         if href and href.startswith("images/"):
             filename = os.path.basename(href)
             if filename in image_map:
-                link_image["href"] = f"images/{image_map[filename]}"
+                link_image["href"] = f"images/{image_map[filename]['src']}"
+
+@pipeline.register(30)
+def external_config_script(soup, context):
+    # Replace the inline script block with deferred js/config.js
+    # Look for the script containing FGJSRAND
+    for script in soup.find_all("script"):
+        if script.string and "FGJSRAND=" in script.string:
+            print("Found inline config script. Replacing with deferred js/config.js")
+            new_script = soup.new_tag("script", src="js/config.js", defer="")
+            script.replace_with(new_script)
 
-    # Ensure all JS is deferred or async
+@pipeline.register(40)
+def schedule_scripts(soup, context):
+    # Every script gets a loading policy; held-back ones are started by the loader runtime
+    for script in soup.find_all("script", attrs={"data-loader": True}):
+        script.decompose()
+    held = 0
     for script in soup.find_all("script"):
-        if script.get("src"):
-            # If it's not already async or defer, make it defer
-            if not script.get("async") and not script.get("defer"):
+        policy, target = script_policy(script, SCRIPT_POLICIES, DEFAULT_SCRIPT_POLICY)
+        if policy in SCHEDULED_POLICIES:
+            hold(script, policy, target)
+            held += 1
+        elif policy == "defer" and script.get("src"):
+            # Inline scripts can't be deferred; they run in place like critical ones
+            if not script.has_attr("async") and not script.has_attr("defer"):
                 script["defer"] = ""
+    if held:
+        runtime = soup.new_tag("script", attrs={"data-loader": ""})
+        runtime.string = loader_runtime()
+        soup.body.append(runtime)
+        print(f"Holding back {held} script(s) for the loader runtime")
 
-    # --- CSS OPTIMIZATION STRATEGY ---
-    # 1. Inline bootstrap-grid.min.css (Layout Structure)
-    # 2. Inline Critical CSS (Header/Layout)
-    # 3. Preload site.css and others
-    
-    print("Optimizing CSS Delivery...")
-    
-    # Inline bootstrap-grid.min.css FIRST (to establish layout)
-    # Check if already inlined to avoid duplicates
-    grid_already_inlined = False
-    for style in soup.find_all("style"):
-        if style.string and "Bootstrap Grid" in style.string:
-            grid_already_inlined = True
-            break
-            
-    if not grid_already_inlined:
-        grid_css_path = os.path.join(CSS_DIR, "bootstrap-grid.min.css")
-        if os.path.exists(grid_css_path):
-            with open(grid_css_path, "r", encoding="utf-8") as f:
-                grid_css_content = f.read()
-            
-            grid_style_tag = soup.new_tag("style")
-            grid_style_tag.string = grid_css_content
-            soup.head.insert(0, grid_style_tag) # Insert at the very top of head
-            print("Inlined bootstrap-grid.min.css")
-    else:
-        print("Bootstrap Grid already inlined, skipping.")
+def bundleable(script):
+    # Only plain local deferred scripts; anything carrying extra attributes
+    # (data-*, id, nonce) may read document.currentScript and stays separate.
+    # Held-back scripts have no src and never get here
+    return (script.get("src", "").startswith("js/")
+            and script.has_attr("defer") and not script.has_attr("async")
+            and script.get("type", "").strip().lower() in CLASSIC_TYPES
+            and script.get("data-load", "defer") == "defer"
+            and set(script.attrs) <= {"src", "defer", "type", "data-load"}
+            and os.path.exists(os.path.join(BUILD_DIR, script["src"])))
 
-    # Inline Critical CSS
-    # Check if already inlined
-    critical_already_inlined = False
-    for style in soup.find_all("style"):
-        if style.string and "#headerCntr" in style.string and "Bootstrap Grid" not in style.string:
-            critical_already_inlined = True
-            break
-            
-    if not critical_already_inlined:
-        critical_style_tag = soup.new_tag("style")
-        critical_style_tag.string = compress(CRITICAL_CSS)
-        soup.head.append(critical_style_tag)
-        print("Inlined Critical CSS")
-    else:
-        print("Critical CSS already inlined, skipping.")
-
-    # Preload site.css and others
-    # Ensure site.css is linked (if it was removed in previous runs, we need to add it back)
-    # But since we are running on the source file (or a copy), we assume the link might be there or we add it.
-    # The previous script removed it. Let's check if it exists, if not add it.
-    
-    css_files_to_preload = ["site.css", "bootstrap.min.css", "bootstrap-formhelpers.min.css", "roboto.css", "all.min.css"]
-    
-    # First, remove existing links to these files to avoid duplicates/conflicts
-    for css_file in css_files_to_preload:
-        link_tag = soup.find("link", href=f"css/{css_file}")
-        if link_tag:
-            link_tag.decompose()
-            
-    # Now add them back as preload
-    for css_file in css_files_to_preload:
-        link_tag = soup.new_tag("link", rel="preload", href=f"css/{css_file}", as_="style")
+@pipeline.register(45)
+def bundle_scripts(soup, context):
+    # Deferred scripts run in document order after parsing, so each run of
+    # consecutive bundleable ones can be concatenated without reordering anything
+    runs = [[]]
+    for script in soup.find_all("script", src=True):
+        if bundleable(script):
+            runs[-1].append(script)
+        elif script.has_attr("defer") and not script.has_attr("async"):
+            runs.append([])
+
+    for index, run in enumerate(r for r in runs if len(r) > 1):
+        parts = []
+        for script in run:
+            with open(os.path.join(BUILD_DIR, script["src"]), "r", encoding="utf-8") as f:
+                parts.append(f.read().strip())
+        bundle_name = f"js/bundle-{index}.js"
+        bundle_path = os.path.join(BUILD_DIR, bundle_name)
+        # A leading semicolon guards against files that end without one
+        with open(bundle_path, "w", encoding="utf-8") as f:
+            f.write("\n;".join(parts))
+        context["outputs"].append(bundle_path)
+
+        run[0]["src"] = bundle_name
+        for script in run[1:]:
+            script.decompose()
+        print(f"Bundled {len(run)} scripts into {bundle_name}")
+
+def stylesheet_name(href):
+    # "css/site.css?v=2" -> "site.css"; None for anything outside css/
+    path = re.sub(r'[?#].*', '', href or "")
+    return path[len("css/"):] if path.startswith("css/") else None
+
+def page_stylesheets(soup):
+    """Names in CSS_DIR of the stylesheets the page links, as a render-blocking
+    <link>, a style preload, its <noscript> fallback or an inline @import."""
+    found = []
+
+    def add(href):
+        name = stylesheet_name(href)
+        if name and name not in found and os.path.isfile(os.path.join(CSS_DIR, name)):
+            found.append(name)
+
+    for tag in soup.find_all(["link", "style"]):
+        if tag.name == "style":
+            for match in CSS_IMPORT_RE.finditer(tag.string or ""):
+                add(match.group(1))
+            continue
+        rel = set(tag.get("rel", []))
+        # media="print" links are the async-loading trick and never block rendering
+        if ("stylesheet" in rel and tag.get("media", "all") in ("all", "screen", "")) or \
+                ("preload" in rel and tag.get("as") == "style"):
+            add(tag.get("href"))
+    return [name for name in STYLESHEETS if name in found] + [name for name in found if name not in STYLESHEETS]
+
+@pipeline.register(50)
+def inline_critical_css(soup, context):
+    # Replace critical CSS from earlier runs; every other <style> is the author's
+    for style in soup.find_all("style", attrs={"data-critical": True}):
+        style.decompose()
+
+    # Each sheet's critical rules are cached against the page, so editing one
+    # stylesheet only re-extracts that sheet
+    cache = context["cache"]
+    page_key = cache.key(str(soup.body), FOLD_ELEMENTS, code_hash(cache))
+    matcher = None
+    sheet_css = []
+    for css_file in page_stylesheets(soup):
+        css_path = os.path.join(CSS_DIR, css_file)
+        key = cache.key(page_key, cache.file_hash(css_path))
+        if cache.fresh(f"critical:{css_path}", key):
+            sheet_css.append(cache.data(f"critical:{css_path}"))
+            continue
+        if matcher is None:
+            matcher = CriticalMatcher(fold_elements(soup, FOLD_ELEMENTS))
+        with open(css_path, "r", encoding="utf-8") as f:
+            chunk = critical_css_for(f.read(), matcher)
+        cache.record(f"critical:{css_path}", key, [], data=chunk)
+        sheet_css.append(chunk)
+
+    critical_css = "".join(sheet_css)
+    if not critical_css.strip():
+        return
+    critical_style_tag = soup.new_tag("style", attrs={"data-critical": ""})
+    # extract_rules leaves @font-face to the full sheets, so this only minifies
+    critical_style_tag.string = optimize_css(critical_css, FONT_DISPLAY)
+    soup.head.append(critical_style_tag)
+    print(f"Inlined {len(critical_style_tag.string)} bytes of critical CSS")
+
+@pipeline.register(60)
+def preload_stylesheets(soup, context):
+    # Drop every existing reference to the page's sheets (links, preloads and
+    # their <noscript> fallbacks) before adding exactly one preload per sheet
+    stylesheets = page_stylesheets(soup)
+    for css_file in stylesheets:
+        for link in soup.find_all("link", href=f"css/{css_file}"):
+            if link.decomposed:
+                continue
+            if link.parent and link.parent.name == "noscript":
+                link.parent.decompose()
+            else:
+                link.decompose()
+
+    for css_file in stylesheets:
+        link_tag = soup.new_tag("link", rel="preload", href=f"css/{css_file}", attrs={"as": "style"})
         link_tag["onload"] = "this.onload=null;this.rel='stylesheet'"
         soup.head.append(link_tag)
         
@@ -202,56 +818,262 @@ def update_html(image_map):
         noscript.append(link_fallback)
         soup.head.append(noscript)
 
-    # Remove @import for site.css if it exists in any style tag
+    # The preloads replace inline @imports of the same sheets
+    def drop_import(match):
+        return "" if stylesheet_name(match.group(1)) in stylesheets else match.group()
+
     for style in soup.find_all("style"):
-        if style.string and 'css/site.css' in style.string:
-            if style.string.strip() == '@import url("css/site.css");':
+        if style.string and "@import" in style.string:
+            css = CSS_IMPORT_RE.sub(drop_import, style.string)
+            if not css.strip():
                 style.decompose()
-            else:
-                style.string = style.string.replace('@import url("css/site.css");', "")
-
-    # --- JS OPTIMIZATION ---
-    # Replace the inline script block with deferred js/config.js
-    # Look for the script containing FGJSRAND
-    for script in soup.find_all("script"):
-        if script.string and "FGJSRAND=" in script.string:
-            print("Found inline config script. Replacing with deferred js/config.js")
-            new_script = soup.new_tag("script", src="js/config.js", defer="")
-            script.replace_with(new_script)
+            elif css != style.string:
+                style.string = css
 
-    # --- LCP OPTIMIZATION ---
-    print("Optimizing LCP...")
-    logo_img = soup.find("img", src=re.compile(r"chimney|logo", re.I))
+@pipeline.register(70)
+def preload_lcp_image(soup, context):
+    logo_img = soup.find("img", fetchpriority="high")
     if logo_img:
         if "loading" in logo_img.attrs:
             del logo_img["loading"]
-        # Add preload link
-        preload_link = soup.new_tag("link", rel="preload", href=logo_img["src"], as_="image")
+
+        for link in soup.find_all("link", rel="preload", href=logo_img["src"]):
+            link.decompose()
+
+        preload_link = soup.new_tag("link", rel="preload", href=logo_img["src"], attrs={"as": "image"})
+        # Preload the same responsive candidate the <picture> will pick
+        source = logo_img.parent.find("source") if logo_img.parent.name == "picture" else None
+        if source:
+            preload_link["imagesrcset"] = source["srcset"]
+            preload_link["imagesizes"] = source["sizes"]
+            preload_link["type"] = source["type"]
         soup.head.insert(0, preload_link)
         print(f"Preloaded LCP image: {logo_img['src']}")
 
-    # Also remove the Google Fonts link if it exists (we are using local roboto.css)
-    google_fonts_link = soup.find("link", href=re.compile(r"fonts\.googleapis\.com"))
-    if google_fonts_link:
-        google_fonts_link.decompose()
-
-    # Minify HTML
-    html_content = str(soup)
-    # Remove comments
-    html_content = re.sub(r'<!--.*?-->', '', html_content, flags=re.DOTALL)
-    # Remove whitespace between tags
-    html_content = re.sub(r'>\s+<', '><', html_content)
-    
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(html_content)
+@pipeline.register(80)
+def drop_google_fonts(soup, context):
+    # We are using local roboto.css
+    for link in soup.find_all("link", href=re.compile(r"fonts\.googleapis\.com")):
+        link.decompose()
+
+@pipeline.register(90)
+def drop_empty_noscript(soup, context):
+    for noscript in soup.find_all("noscript"):
+        if not noscript.get_text(strip=True) and not noscript.find(True):
+            noscript.decompose()
+
+@pipeline.register(100)
+def fingerprint_assets(soup, context):
+    # Content-hashed names let every asset be served with a year-long immutable cache
+    fingerprinter = Fingerprinter(BUILD_DIR)
+    for tag in soup.find_all(["script", "img", "source", "link", "meta"]):
+        for attr in ["src", "href", "data-src"]:
+            if tag.get(attr) and (tag.name != "link" or set(tag.get("rel", [])) & {"stylesheet", "preload", "icon", "image_src", "modulepreload"}):
+                tag[attr] = fingerprinter.url(tag[attr])
+        for attr in ["srcset", "imagesrcset"]:
+            if tag.get(attr):
+                tag[attr] = fingerprinter.srcset(tag[attr])
+        if tag.name == "meta" and tag.get("property") == "og:image" and tag.get("content"):
+            tag["content"] = fingerprinter.url(tag["content"])
+    for style in soup.find_all("style"):
+        if style.string and "url(" in style.string:
+            style.string = fingerprinter.rewrite_css(style.string)
+    context["outputs"].extend(fingerprinter.outputs)
+    context["fingerprints"] = fingerprinter.names
+
+def minify_inline_css(css):
+    return optimize_css(css, FONT_DISPLAY)
+
+def write_minified_html(path, html_content):
+    # Streams straight into the file, so no second full copy of the page is built
+    with open(path, "w", encoding="utf-8") as f:
+        minify_stream(chunks(html_content), f.write, minify_inline_css, minify_js_source)
+
+def update_html(image_map, cache):
+    html_path = os.path.join(OUTPUT_DIR, "index.html")
+    out_path = os.path.join(BUILD_DIR, "index.html")
+    # Bundles and hashed names depend on every built asset, so every source counts
+    asset_hashes = [cache.file_hash(p) for d in [CSS_DIR, JS_DIR, IMG_DIR, FONTS_DIR, WEBFONTS_DIR]
+                    for p in sorted(glob.glob(os.path.join(d, "*"))) if os.path.isfile(p)]
+    key = cache.key(cache.file_hash(html_path), asset_hashes, FOLD_ELEMENTS, image_map, TERSER, code_hash(cache))
+    if cache.fresh(out_path, key):
+        print("HTML unchanged, skipping.")
+        return
+
+    print("Updating HTML...")
+    context = {"image_map": image_map, "cache": cache, "outputs": []}
+    soup = pipeline.run(parse(read_html(html_path)), context)
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    with span("serialize", "html"):
+        write_minified_html(out_path, str(soup))
+    manifest = context.get("fingerprints", {})
+    # The manifest tells precompression which originals are only served by hash
+    cache.record(out_path, key, [out_path] + context["outputs"], data=manifest)
+    prune_fingerprints(manifest)
     print("HTML updated and minified.")
 
+def prune_fingerprints(manifest):
+    """Delete hashed files from earlier builds that the page no longer
+    references, and the precompressed siblings of originals it references
+    by their hashed name instead. ``manifest`` maps original to hashed name."""
+    current = set(manifest.values())
+    for path in list(built_files()):
+        rel = build_rel(path)
+        stem, suffix = os.path.splitext(rel)
+        if suffix in ENCODINGS:
+            stale = stem in manifest or (is_hashed(stem) and stem not in current)
+        else:
+            stale = is_hashed(rel) and rel not in current
+        if stale:
+            os.remove(path)
+            print(f"Removed stale {rel}")
+
+def built_files():
+    for root, _, files in os.walk(BUILD_DIR):
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+def write_atomic(path, data):
+    # Replace rather than rewrite, so a file hard-linked from a shared tree is never edited in place
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def same_bytes(path, data):
+    try:
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+def precompress_assets(cache):
+    # Static .br/.gz/.zst siblings let the server pick an encoding without compressing per request
+    print("Precompressing assets...")
+    suffixes = available_suffixes()
+    # The page and the hashed files it references are all that's served. A
+    # tree without a built page (a batch's shared assets) is encoded whole
+    page = os.path.join(BUILD_DIR, "index.html")
+    fingerprinted = cache.data(page)
+    served = None
+    originals = {}
+    if fingerprinted is not None:
+        served = {page} | {os.path.join(BUILD_DIR, hashed) for hashed in fingerprinted.values()}
+        # A hashed copy can reuse the encodings linked in alongside its original
+        originals = {os.path.join(BUILD_DIR, hashed): os.path.join(BUILD_DIR, rel) for rel, hashed in fingerprinted.items()}
+    groups = {}
+    unserved = []
+    for path in built_files():
+        if not is_compressible(path):
+            continue
+        if served is not None and path not in served:
+            unserved.append(path)
+            continue
+        digest = cache.file_hash(path)
+        key = cache.key(digest, suffixes, encoder_versions(), code_hash(cache))
+        if not cache.fresh(f"precompress:{path}", key):
+            groups.setdefault(digest, []).append((path, key))
+    if groups:
+        encode_groups(groups, suffixes, originals, cache)
+    # Siblings of files the page doesn't serve go, once hashed copies had the chance to reuse them
+    for path in unserved:
+        for suffix in suffixes:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def encode_groups(groups, suffixes, originals, cache):
+    """Write the encodings of each {digest: [(path, cache key)]} group.
+    ``originals`` maps a hashed copy to the file it was hashed from."""
+    # Identical files (hashed copies, pages sharing an asset) are encoded once; siblings
+    # already on disk are reused when they decode to the same bytes
+    encoded = {}
+    jobs = {}
+    for digest, members in groups.items():
+        with open(members[0][0], "rb") as f:
+            data = f.read()
+        encoded[digest] = {}
+        for suffix in suffixes:
+            candidates = [path for path, _ in members] + [originals[path] for path, _ in members if path in originals]
+            reusable = next((path for path in candidates if sibling_matches(path, suffix, data)), None)
+            if reusable:
+                with open(reusable + suffix, "rb") as f:
+                    encoded[digest][suffix] = f.read()
+        for suffix in suffixes:
+            if suffix not in encoded[digest]:
+                jobs[(digest, suffix)] = members[0][0]
+
+    # One job per encoding, so the slowest file's brotli and zopfli runs overlap
+    with ProcessPoolExecutor(max_workers=PRECOMPRESS_WORKERS) as pool:
+        futures = {pool.submit(compress_file, path, [suffix]): (digest, suffix) for (digest, suffix), path in jobs.items()}
+        for future in as_completed(futures):
+            digest, suffix = futures[future]
+            try:
+                encoded[digest].update(future.result())
+            except Exception as e:
+                print(f"Failed to precompress {jobs[(digest, suffix)]} as {suffix}: {e}")
+                groups.pop(digest, None)
+
+    for digest, members in groups.items():
+        for path, key in members:
+            outputs = []
+            for suffix in suffixes:
+                sibling = path + suffix
+                if suffix in encoded[digest]:
+                    if not same_bytes(sibling, encoded[digest][suffix]):
+                        write_atomic(sibling, encoded[digest][suffix])
+                    outputs.append(sibling)
+                elif os.path.exists(sibling):
+                    # Not smaller than the file itself: serve it identity-encoded
+                    os.remove(sibling)
+            cache.record(f"precompress:{path}", key, outputs)
+        sizes = ", ".join(f"{suffix[1:]} {len(data)}" for suffix, data in encoded[digest].items())
+        print(f"Precompressed {members[0][0]} ({os.path.getsize(members[0][0])} -> {sizes or 'skipped'})")
+
+def image_sources(image_map):
+    # Every variant's "before" is the raster it was encoded from
+    return {os.path.join("images", v["file"]): os.path.join(IMG_DIR, filename)
+            for filename, info in image_map.items() for v in info["variants"]}
+
+def build_report(report, image_map):
+    report.measure(os.path.join(OUTPUT_DIR, "index.html"), ASSETS_DIR,
+                   os.path.join(BUILD_DIR, "index.html"), BUILD_DIR, image_sources(image_map))
+    failures = report.check_budgets(load_budgets(BUDGETS_FILE))
+    report.write(REPORT_FILE)
+    return failures
+
 if __name__ == "__main__":
-    # We assume images are already optimized or we run it again
-    # image_map = optimize_images() 
-    # For speed in this iteration, let's just get the map without re-converting if possible
-    # But optimize_images is fast if files exist.
-    image_map = optimize_images()
-    minify_css()
-    minify_js()
-    update_html(image_map)
+    parser = argparse.ArgumentParser(description="Optimize index.html and its assets into dist/.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_instrument(args)
+
+    start = time.perf_counter()
+    cache = BuildCache(CACHE_FILE)
+    report = BuildReport(cache)
+    with report.stage("images"):
+        image_map = optimize_images(cache)
+    with report.stage("svgs"):
+        optimize_svgs(cache)
+    with report.stage("fonts"):
+        font_map = optimize_fonts(cache)
+    with report.stage("css"):
+        minify_css(cache, font_map)
+    with report.stage("js"):
+        minify_js(cache)
+    with report.stage("static"):
+        copy_static(cache)
+    with report.stage("html"):
+        update_html(image_map, cache)
+    with report.stage("precompress"):
+        precompress_assets(cache)
+    with report.stage("report"):
+        failures = build_report(report, image_map)
+    cache.save()
+    print(report.table())
+    print(cache.summary())
+    print(f"Build finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+    instrument.finish(args.trace)
+    if failures:
+        print(f"{len(failures)} performance budget(s) exceeded, see {REPORT_FILE}")
+        sys.exit(1)
@@ -0,0 +1,97 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zopfli.gzip as zopfli_gzip
+except ImportError:
+    zopfli_gzip = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Text-like formats worth storing pre-encoded; images and woff/woff2 are compressed already
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".mjs", ".svg", ".json", ".xml", ".txt",
+                           ".map", ".webmanifest", ".ico", ".ttf", ".otf", ".eot")
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Largest brotli window; decoders allocate it up front, so it must stay <= 24
+BROTLI_WINDOW = 24
+ZOPFLI_ITERATIONS = 15
+ZSTD_LEVEL = 19
+
+# File suffix -> Content-Encoding
+ENCODINGS = {".br": "br", ".gz": "gzip", ".zst": "zstd"}
+
+
+def available_suffixes():
+    suffixes = [".gz"]
+    if brotli:
+        suffixes.insert(0, ".br")
+    if zstandard:
+        suffixes.append(".zst")
+    return suffixes
+
+
+def encoder_versions():
+    # Part of the cache key: a new encoder may produce different bytes
+    return {
+        "brotli": getattr(brotli, "__version__", None),
+        "zopfli": bool(zopfli_gzip),
+        "zstandard": getattr(zstandard, "__version__", None),
+    }
+
+
+def is_compressible(path):
+    return path.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def compress(data, suffix):
+    if suffix == ".br":
+        return brotli.compress(data, quality=BROTLI_QUALITY, lgwin=BROTLI_WINDOW)
+    if suffix == ".gz":
+        if zopfli_gzip:
+            return zopfli_gzip.compress(data, numiterations=ZOPFLI_ITERATIONS)
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if suffix == ".zst":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unknown encoding {suffix}")
+
+
+def decompress(data, suffix):
+    if suffix == ".br":
+        return brotli.decompress(data)
+    if suffix == ".gz":
+        return gzip.decompress(data)
+    if suffix == ".zst":
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown encoding {suffix}")
+
+
+def compress_file(path, suffixes):
+    """Encode ``path`` once per suffix in a worker process. Returns
+    {suffix: bytes} for the encodings that come out smaller than the file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    encoded = {}
+    for suffix in suffixes:
+        compressed = compress(data, suffix)
+        if len(compressed) < len(data):
+            encoded[suffix] = compressed
+    return encoded
+
+
+def sibling_matches(path, suffix, data):
+    # An existing sibling (say, hard-linked from a shared tree) is reused when it decodes to the file
+    try:
+        with open(path + suffix, "rb") as f:
+            return decompress(f.read(), suffix) == data
+    except Exception:
+        return False
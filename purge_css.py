@@ -0,0 +1,88 @@
+import re
+from fnmatch import translate
+
+from bs4 import BeautifulSoup
+
+from cssparse import AtRule, Rule, parse, selector_tokens, serialize
+
+# Identifier-like words inside JS string literals; any of them may end up as a
+# class, id or tag name at runtime
+JS_STRING_RE = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'|`((?:[^`\\]|\\.)*)`')
+JS_WORD_RE = re.compile(r'-?[A-Za-z_][\w-]*')
+
+# At-rules whose nested rules are purged; the rest are kept untouched
+CONDITIONAL_AT_RULES = {"media", "supports"}
+
+
+class UsedIndex:
+    """Every class, id and tag name a page can use, plus a safelist.
+
+    Safelist entries are exact names or shell-style patterns (``modal-*``)
+    for names only added at runtime.
+    """
+
+    def __init__(self, safelist=()):
+        self.classes = set()
+        self.ids = set()
+        self.tags = {"html", "body"}
+        exact = {name for name in safelist if not any(c in name for c in "*?[")}
+        patterns = [translate(name) for name in safelist if name not in exact]
+        self.safelist = exact
+        self.safelist_re = re.compile("|".join(patterns)) if patterns else None
+        self.memo = {}
+
+    def add_html(self, html):
+        soup = BeautifulSoup(html, "html.parser")
+        for el in soup.find_all(True):
+            self.tags.add(el.name)
+            self.classes.update(el.get("class", []))
+            if el.get("id"):
+                self.ids.add(el["id"])
+        # Inline scripts and handlers can add names too
+        for script in soup.find_all("script"):
+            if script.string:
+                self.add_js(script.string)
+
+    def add_js(self, js):
+        for match in JS_STRING_RE.finditer(js):
+            literal = next(group for group in match.groups() if group is not None)
+            words = JS_WORD_RE.findall(literal)
+            self.classes.update(words)
+            self.ids.update(words)
+            self.tags.update(word.lower() for word in words)
+
+    def safelisted(self, name):
+        return name in self.safelist or bool(self.safelist_re and self.safelist_re.fullmatch(name))
+
+    def selector_used(self, selector):
+        if selector not in self.memo:
+            classes, ids, tags = selector_tokens(selector)
+            self.memo[selector] = (
+                all(c in self.classes or self.safelisted(c) for c in classes)
+                and all(i in self.ids or self.safelisted(i) for i in ids)
+                and all(t in self.tags or self.safelisted(t) for t in tags)
+            )
+        return self.memo[selector]
+
+
+def purge_rules(nodes, used):
+    kept = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            selectors = [s for s in node.selectors if used.selector_used(s)]
+            if selectors:
+                kept.append(Rule(",".join(selectors), node.declarations))
+        elif isinstance(node, AtRule) and node.name in CONDITIONAL_AT_RULES and node.rules is not None:
+            rules = purge_rules(node.rules, used)
+            if rules:
+                kept.append(AtRule(node.name, node.prelude, rules=rules))
+        else:
+            kept.append(node)
+    return kept
+
+
+def purge_css(css, used):
+    """Drop every selector that references a class, id or tag ``used`` has
+    never seen. Each selector is checked once against hash sets, so the cost
+    is linear in the size of the stylesheet."""
+    return serialize(purge_rules(parse(css), used))
@@ -0,0 +1,283 @@
+import gzip
+import json
+import os
+import posixpath
+import re
+import time
+from contextlib import contextmanager
+
+from fingerprint import CSS_URL_RE, HASH_LENGTH
+from html_pipeline import parse, read_html
+from instrument import span
+from precompress import sibling_matches
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Formats that are already compressed; servers send them as-is
+PRECOMPRESSED_EXTENSIONS = (".woff2", ".woff", ".webp", ".avif", ".png", ".jpg", ".jpeg", ".gif", ".ico")
+
+ASSET_TYPES = {
+    ".html": "html", ".css": "css", ".js": "js",
+    ".woff2": "font", ".woff": "font", ".ttf": "font", ".otf": "font", ".eot": "font",
+    ".webp": "image", ".avif": "image", ".png": "image", ".jpg": "image", ".jpeg": "image",
+    ".gif": "image", ".svg": "image", ".ico": "image",
+}
+
+UNHASHED_RE = re.compile(r'\.[0-9a-f]{%d}(\.[^./]+)$' % HASH_LENGTH)
+
+
+def asset_type(path):
+    return ASSET_TYPES.get(os.path.splitext(path)[1].lower(), "other")
+
+
+def is_local(url):
+    return bool(url) and not re.match(r'^(?:[a-z][a-z0-9+.-]*:|//|#|/)', url, re.I)
+
+
+def page_assets(html_path, root):
+    """Local files a browser fetches to render the page at ``html_path``,
+    with assets resolved against ``root``, as (path, render_blocking) pairs
+    in discovery order."""
+    soup = parse(read_html(html_path))
+    assets = {html_path: True}
+
+    def add(url, blocking, base=""):
+        if not is_local(url):
+            return None
+        rel = posixpath.normpath(posixpath.join(base, re.sub(r'[?#].*', '', url)))
+        path = os.path.join(root, rel)
+        if not os.path.isfile(path):
+            return None
+        assets[path] = assets.get(path, False) or blocking
+        return rel
+
+    def add_css(css, base, blocking):
+        for match in CSS_URL_RE.finditer(css):
+            url = match.group(2)
+            # Only @import blocks rendering; fonts and images load on demand
+            statement = css[max(0, match.start() - 8):match.start()]
+            rel = add(url, blocking and "@import" in statement, base)
+            if rel and rel.endswith(".css"):
+                with open(os.path.join(root, rel), "r", encoding="utf-8", errors="replace") as f:
+                    add_css(f.read(), posixpath.dirname(rel), blocking and "@import" in statement)
+
+    for tag in soup.find_all(["link", "script", "img", "picture", "style"]):
+        # <noscript> content only loads when scripting is off
+        if tag.find_parent("noscript"):
+            continue
+        if tag.name == "link":
+            rel = set(tag.get("rel", []))
+            href = tag.get("href")
+            if "stylesheet" in rel or tag.get("as") == "style":
+                blocking = "stylesheet" in rel and tag.get("media", "all") in ("all", "screen", "")
+                local = add(href, blocking)
+                if local:
+                    with open(os.path.join(root, local), "r", encoding="utf-8", errors="replace") as f:
+                        add_css(f.read(), posixpath.dirname(local), blocking)
+            elif rel & {"preload", "modulepreload", "icon"}:
+                add(href, False)
+        elif tag.name == "script" and tag.get("src"):
+            blocking = (tag.find_parent("head") is not None and tag.get("type") != "module"
+                        and not tag.has_attr("async") and not tag.has_attr("defer"))
+            add(tag["src"], blocking)
+        elif tag.name == "script" and tag.get("data-src"):
+            # Held back for the loader runtime: still downloaded, never blocking
+            add(tag["data-src"], False)
+        elif tag.name == "picture":
+            # A modern browser takes the first source it supports: count that one
+            source = tag.find("source", srcset=True)
+            if source:
+                add(largest_candidate(source["srcset"]), False)
+        elif tag.name == "img" and not tag.find_parent("picture"):
+            add(largest_candidate(tag["srcset"]) if tag.get("srcset") else tag.get("src"), False)
+        elif tag.name == "style" and tag.string:
+            add_css(tag.string, "", True)
+    return list(assets.items())
+
+
+def largest_candidate(srcset):
+    candidates = []
+    for candidate in srcset.split(","):
+        parts = candidate.strip().split()
+        if parts:
+            width = parts[1][:-1] if len(parts) > 1 and parts[1].endswith("w") else "0"
+            candidates.append((int(width) if width.isdigit() else 0, parts[0]))
+    return max(candidates)[1] if candidates else None
+
+
+class BuildReport:
+    """Per-stage timings and the byte weight of the built page.
+
+    Every asset is measured raw, gzipped and brotli'd (compressed sizes are
+    cached by content hash in the build cache) and compared with the source
+    it was built from. Budgets cap the transfer size of the page per asset
+    type, in total and along the render-blocking critical path.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.stages = {}
+        self.assets = []
+        self.totals = {}
+        self.critical_path = {}
+        self.budgets = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            with span(name, "stage"):
+                yield
+        finally:
+            self.stages[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def sizes(self, path):
+        digest = self.cache.file_hash(path)
+        name = f"sizes:{os.path.abspath(path)}"
+        cached = self.cache.data(name)
+        if cached and cached.get("hash") == digest:
+            return cached
+
+        with open(path, "rb") as f:
+            data = f.read()
+        sizes = {"hash": digest, "raw": len(data), "gzip": None, "brotli": None}
+        if not path.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+            # The precompress stage already encoded built files; only
+            # sources and files without a current sibling are compressed here
+            if sibling_matches(path, ".gz", data):
+                sizes["gzip"] = os.path.getsize(path + ".gz")
+            else:
+                sizes["gzip"] = len(gzip.compress(data, GZIP_LEVEL, mtime=0))
+            if sibling_matches(path, ".br", data):
+                sizes["brotli"] = os.path.getsize(path + ".br")
+            elif brotli:
+                sizes["brotli"] = len(brotli.compress(data, quality=BROTLI_QUALITY))
+        self.cache.record(name, digest, [], data=sizes)
+        return sizes
+
+    def transfer(self, sizes):
+        # Bytes on the wire from a server that negotiates the best encoding
+        return min(size for size in [sizes["raw"], sizes["gzip"], sizes["brotli"]] if size is not None)
+
+    def measure(self, source_html, source_root, built_html, built_root, sources=None):
+        """Weigh the source page and the built page. ``sources`` maps a
+        built path to the source it came from when the name alone doesn't
+        say (image variants); other built files are matched to the source
+        of the same name with any content hash removed."""
+        sources = sources or {}
+        before = page_assets(source_html, source_root)
+        after = page_assets(built_html, built_root)
+
+        self.assets = []
+        for path, blocking in after:
+            sizes = self.sizes(path)
+            rel = os.path.relpath(path, built_root)
+            source = sources.get(rel)
+            if source is None:
+                unhashed = os.path.join(source_root, UNHASHED_RE.sub(r'\1', rel))
+                source = source_html if path == built_html else unhashed
+            before_raw = os.path.getsize(source) if os.path.isfile(source) else None
+            self.assets.append({
+                "path": rel.replace(os.sep, "/"),
+                "type": asset_type(path),
+                "blocking": blocking,
+                "raw": sizes["raw"],
+                "gzip": sizes["gzip"],
+                "brotli": sizes["brotli"],
+                "transfer": self.transfer(sizes),
+                "before": before_raw,
+                "delta": None if before_raw is None else sizes["raw"] - before_raw,
+            })
+
+        self.totals = {"before": self.weigh(before), "after": self.weigh(after)}
+        blocking = [path for path, is_blocking in after if is_blocking]
+        self.critical_path = {
+            "requests": len(blocking),
+            "bytes": sum(self.transfer(self.sizes(path)) for path in blocking),
+            "assets": [os.path.relpath(path, built_root).replace(os.sep, "/") for path in blocking],
+        }
+
+    def weigh(self, assets):
+        totals = {"requests": len(assets), "raw": 0, "transfer": 0}
+        for path, _ in assets:
+            sizes = self.sizes(path)
+            kind = asset_type(path)
+            totals["raw"] += sizes["raw"]
+            totals["transfer"] += self.transfer(sizes)
+            totals[kind] = totals.get(kind, 0) + self.transfer(sizes)
+        return totals
+
+    def check_budgets(self, budgets):
+        """Compare against ``{"metric": limit}``; metrics are ``total``,
+        ``critical_path_bytes``, ``critical_path_requests``, ``requests`` and
+        the asset types (``css``, ``js``, ``font``, ``image``, ``html``),
+        all in transfer bytes. Returns the exceeded budgets."""
+        after = self.totals["after"]
+        actual = {
+            "total": after["transfer"],
+            "requests": after["requests"],
+            "critical_path_bytes": self.critical_path["bytes"],
+            "critical_path_requests": self.critical_path["requests"],
+        }
+        self.budgets = []
+        for metric, limit in budgets.items():
+            value = actual.get(metric, after.get(metric, 0))
+            self.budgets.append({"metric": metric, "limit": limit, "actual": value, "ok": value <= limit})
+        return [b for b in self.budgets if not b["ok"]]
+
+    def to_dict(self):
+        return {
+            "stages_ms": self.stages,
+            "assets": self.assets,
+            "totals": self.totals,
+            "critical_path": self.critical_path,
+            "budgets": self.budgets,
+        }
+
+    def write(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
+
+    def table(self):
+        def size(value):
+            return "-" if value is None else f"{value / 1024:.1f}K"
+
+        lines = [f"{'asset':<48} {'raw':>8} {'gzip':>8} {'br':>8} {'before':>8} {'delta':>7}"]
+        for asset in self.assets:
+            delta = "-"
+            if asset["before"]:
+                delta = f"{asset['delta'] / asset['before'] * 100:+.0f}%"
+            marker = "*" if asset["blocking"] else " "
+            lines.append(f"{marker}{asset['path'][-47:]:<47} {size(asset['raw']):>8} {size(asset['gzip']):>8} "
+                         f"{size(asset['brotli']):>8} {size(asset['before']):>8} {delta:>7}")
+
+        before, after = self.totals["before"], self.totals["after"]
+        lines.append("")
+        for kind in ["html", "css", "js", "font", "image", "other"]:
+            if before.get(kind) or after.get(kind):
+                lines.append(f"{kind:<8} {size(before.get(kind, 0)):>9} -> {size(after.get(kind, 0)):>9}")
+        lines.append(f"{'total':<8} {size(before['transfer']):>9} -> {size(after['transfer']):>9} "
+                     f"({before['requests']} -> {after['requests']} requests, transfer size)")
+        lines.append(f"Critical path: {self.critical_path['requests']} request(s), "
+                     f"{size(self.critical_path['bytes'])} (* = render-blocking)")
+        lines.append("Stages: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.stages.items()))
+        for budget in self.budgets:
+            status = "ok" if budget["ok"] else "OVER"
+            lines.append(f"Budget {budget['metric']}: {budget['actual']} / {budget['limit']} {status}")
+        return "\n".join(lines)
+
+
+def load_budgets(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except OSError:
+        return {}
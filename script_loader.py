@@ -0,0 +1,125 @@
+from fnmatch import fnmatch
+
+# critical: left exactly as written; defer: run by the parser after the
+# document is parsed; the rest are held back and started by the loader
+# runtime once the page has loaded and is idle, on the first user
+# interaction, or when an element scrolls near the viewport
+POLICIES = ("critical", "defer", "idle", "interaction", "visible")
+SCHEDULED_POLICIES = ("idle", "interaction", "visible")
+
+# A type the browser doesn't run, so held-back scripts stay inert until the runtime swaps them
+HELD_TYPE = "text/plain"
+# type attributes (stripped, lowercased) that run as classic JavaScript
+CLASSIC_TYPES = ("", "text/javascript", "application/javascript")
+
+# requestIdleCallback gives up waiting for an idle period after this long
+IDLE_TIMEOUT_MS = 3000
+INTERACTION_EVENTS = ["pointerdown", "keydown", "touchstart", "scroll", "wheel", "mousemove"]
+# How close to the viewport a "visible" target gets before its scripts start
+VISIBLE_MARGIN = "200px"
+
+# Held-back scripts run one at a time in document order per policy, as the
+# parser would have run them; each copy keeps the original's attributes
+# (data-domain, id, ...) so document.currentScript still works
+LOADER_RUNTIME = """(function(w, d) {
+  var own = {"type": 1, "data-load": 1, "data-src": 1, "data-type": 1, "data-target": 1};
+  function run(list, i) {
+    var held = list[i];
+    if (!held) return;
+    var s = d.createElement("script");
+    for (var j = 0; j < held.attributes.length; j++) {
+      var a = held.attributes[j];
+      if (!own[a.name]) s.setAttribute(a.name, a.value);
+    }
+    if (held.getAttribute("data-type")) s.type = held.getAttribute("data-type");
+    var src = held.getAttribute("data-src");
+    if (src) {
+      s.async = false;
+      s.onload = s.onerror = function() { run(list, i + 1); };
+      s.src = src;
+    } else {
+      s.text = held.text;
+    }
+    held.parentNode.replaceChild(s, held);
+    if (!src) run(list, i + 1);
+  }
+  function idle(fn) {
+    function go() { w.requestIdleCallback ? w.requestIdleCallback(fn, {timeout: %(idle_timeout)d}) : setTimeout(fn, 1); }
+    d.readyState == "complete" ? go() : w.addEventListener("load", go);
+  }
+  function interaction(fn) {
+    var done = 0;
+    function go() { if (!done) { done = 1; fn(); } }
+    %(events)s.forEach(function(e) { w.addEventListener(e, go, {once: true, passive: true}); });
+  }
+  function visible(el, fn) {
+    if (!el || !w.IntersectionObserver) return idle(fn);
+    var o = new IntersectionObserver(function(entries) {
+      if (entries.some(function(e) { return e.isIntersecting; })) { o.disconnect(); fn(); }
+    }, {rootMargin: "%(margin)s"});
+    o.observe(el);
+  }
+  function start() {
+    var groups = {idle: [], interaction: []};
+    [].forEach.call(d.querySelectorAll('script[type="%(held_type)s"][data-load]'), function(s) {
+      var policy = s.getAttribute("data-load");
+      if (policy == "visible") {
+        var target = s.getAttribute("data-target");
+        var el = target ? d.querySelector(target) : s.parentNode;
+        visible(el == d.head ? null : el, function() { run([s], 0); });
+      } else if (groups[policy]) {
+        groups[policy].push(s);
+      }
+    });
+    if (groups.idle.length) idle(function() { run(groups.idle, 0); });
+    if (groups.interaction.length) interaction(function() { run(groups.interaction, 0); });
+  }
+  d.readyState == "loading" ? d.addEventListener("DOMContentLoaded", start) : start();
+})(window, document);"""
+
+
+def script_policy(script, policies, default):
+    """(policy, visible target selector) for a <script> tag. A data-load
+    attribute wins, then the first pattern in ``policies`` matching the
+    src; inline scripts are critical unless their tag says otherwise.
+    Policies are written "visible:<selector>" to watch an element other
+    than the script's parent."""
+    policy = script.get("data-load")
+    if not policy:
+        src = script.get("src") or script.get("data-src")
+        policy = next((value for pattern, value in policies.items() if src and fnmatch(src, pattern)),
+                      default if src else "critical")
+    name, _, target = policy.partition(":")
+    if name not in POLICIES:
+        print(f"Unknown script policy {policy!r} for {script.get('src') or 'an inline script'}; treating it as critical")
+        return "critical", None
+    return name, target or script.get("data-target")
+
+
+def hold(script, policy, target=None):
+    """Rewrite ``script`` so the browser skips it and the runtime starts it
+    under ``policy``. Already held scripts are left alone."""
+    if script.get("type") == HELD_TYPE and script.has_attr("data-load"):
+        return
+    script_type = script.get("type", "").strip().lower()
+    if script_type not in CLASSIC_TYPES:
+        script["data-type"] = script["type"]
+    script["type"] = HELD_TYPE
+    if script.get("src"):
+        script["data-src"] = script["src"]
+        del script["src"]
+    for attr in ["async", "defer"]:
+        if script.has_attr(attr):
+            del script[attr]
+    script["data-load"] = policy
+    if target:
+        script["data-target"] = target
+
+
+def loader_runtime(idle_timeout=IDLE_TIMEOUT_MS, events=INTERACTION_EVENTS, margin=VISIBLE_MARGIN):
+    return LOADER_RUNTIME % {
+        "idle_timeout": idle_timeout,
+        "events": "[" + ", ".join(f'"{event}"' for event in events) + "]",
+        "margin": margin,
+        "held_type": HELD_TYPE,
+    }
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import hashlib
+import mimetypes
+import os
+import posixpath
+import time
+from email.utils import formatdate
+from urllib.parse import unquote, urljoin
+
+from fingerprint import HASHED_NAME_RE
+from html_pipeline import parse, read_html
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+ROOT_DIR = "dist"
+HOST = "127.0.0.1"
+PORT = 8000
+
+# Files at least this large go out through sendfile(); smaller ones in one write with the headers
+SENDFILE_MIN_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+KEEPALIVE_TIMEOUT = 15
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+HTML_CACHE = "no-cache"
+DEFAULT_CACHE = "public, max-age=3600"
+
+# Content-Encoding and the precompressed sibling suffix, best first for equal q-values
+ENCODINGS = [("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz")]
+
+# rel values whose <link> tags are repeated as Link headers on the HTML response
+HINT_RELS = ("preload", "modulepreload", "preconnect")
+HINT_ATTRS = ("as", "type", "crossorigin", "imagesrcset", "imagesizes", "fetchpriority")
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("image/svg+xml", ".svg")
+mimetypes.add_type("text/javascript", ".js")
+
+REASONS = {200: "OK", 103: "Early Hints", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def accepted_encodings(header):
+    """Content-codings from an Accept-Encoding header, best first."""
+    qualities = {}
+    for item in header.split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            qualities[coding] = q
+    wildcard = qualities.get("*", 0.0)
+    ranked = []
+    for rank, (coding, suffix) in enumerate(ENCODINGS):
+        q = qualities.get(coding, wildcard)
+        if q > 0:
+            ranked.append((-q, rank, coding, suffix))
+    return [(coding, suffix) for _, _, coding, suffix in sorted(ranked)]
+
+
+def file_etag(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return f'"{h.hexdigest()[:20]}"'
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def cache_control(path):
+    if HASHED_NAME_RE.search(path):
+        return IMMUTABLE_CACHE
+    if path.endswith(".html"):
+        return HTML_CACHE
+    return DEFAULT_CACHE
+
+
+class StaticServer:
+    """Serves a build tree over HTTP/1.1 with keep-alive.
+
+    Precompressed .br/.zst/.gz siblings are picked by Accept-Encoding,
+    large bodies go through sendfile(), content-hashed names are cached
+    forever, and HTML responses carry the page's own preloads as Link
+    headers (optionally sent ahead as 103 Early Hints). Files are read in
+    a worker thread, and ETags, hints and small bodies are kept until the
+    file changes, so the event loop never waits on the disk.
+    """
+
+    def __init__(self, root, early_hints=False, access_log=False):
+        self.root = os.path.realpath(root)
+        self.early_hints = early_hints
+        self.access_log = access_log
+        # Keyed by path, valid while (size, mtime) match
+        self.etags = {}
+        self.hints = {}
+        self.bodies = {}
+
+    def resolve(self, target):
+        path = unquote(target.split("?", 1)[0].split("#", 1)[0])
+        if not path.startswith("/"):
+            return None, None
+        url_path = posixpath.normpath(path)
+        if path.endswith("/"):
+            url_path = posixpath.join(url_path, "index.html")
+        fs_path = os.path.realpath(os.path.join(self.root, url_path.lstrip("/")))
+        if fs_path != self.root and not fs_path.startswith(self.root + os.sep):
+            return None, None
+        if os.path.isdir(fs_path):
+            url_path = posixpath.join(url_path, "index.html")
+            fs_path = os.path.join(fs_path, "index.html")
+        return url_path, fs_path
+
+    async def cached(self, cache, path, st, load, *args):
+        stamp = (st.st_size, st.st_mtime_ns)
+        entry = cache.get(path)
+        if entry and entry[0] == stamp:
+            return entry[1]
+        value = await asyncio.get_running_loop().run_in_executor(None, load, path, *args)
+        cache[path] = (stamp, value)
+        return value
+
+    def link_hints(self, fs_path, url_path):
+        links = []
+        for link in parse(read_html(fs_path)).find_all("link", href=True):
+            rels = [rel for rel in link.get("rel", []) if rel in HINT_RELS]
+            if not rels or link.find_parent("noscript"):
+                continue
+            href = link["href"]
+            if not href.startswith(("http:", "https:", "//")):
+                href = urljoin(url_path, href)
+            params = [f"<{href}>", f"rel={rels[0]}"]
+            for attr in HINT_ATTRS:
+                if link.has_attr(attr):
+                    value = link[attr]
+                    params.append(attr if value == "" else f'{attr}="{value}"')
+            links.append("; ".join(params))
+        return links
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_error(writer, 400)
+                    break
+                keep_alive = await self.respond(head, reader, writer)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, head, reader, writer):
+        start = time.perf_counter()
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            await self.send_error(writer, 400)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = "close" not in connection if version == "HTTP/1.1" else "keep-alive" in connection
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self.send_error(writer, 400)
+            return False
+        if length:
+            await reader.readexactly(length)
+
+        if method not in ("GET", "HEAD"):
+            status = await self.send_error(writer, 405, {"Allow": "GET, HEAD"}, keep_alive)
+        else:
+            # HTTP/1.0 clients don't expect an informational response before the real one
+            early_hints = self.early_hints and method == "GET" and version == "HTTP/1.1"
+            status = await self.send_file(method, target, headers, writer, keep_alive, early_hints)
+        if self.access_log:
+            print(f'{method} {target} {status} {(time.perf_counter() - start) * 1000:.2f} ms')
+        return keep_alive
+
+    async def send_file(self, method, target, headers, writer, keep_alive, early_hints=False):
+        url_path, fs_path = self.resolve(target)
+        if not fs_path or not os.path.isfile(fs_path):
+            return await self.send_error(writer, 404, keep_alive=keep_alive)
+
+        st = os.stat(fs_path)
+        content_type = mimetypes.guess_type(fs_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/json", "image/svg+xml"):
+            content_type += "; charset=utf-8"
+        response = {"Content-Type": content_type, "Cache-Control": cache_control(url_path)}
+
+        body_path, body_st = fs_path, st
+        if any(os.path.isfile(fs_path + suffix) for _, suffix in ENCODINGS):
+            response["Vary"] = "Accept-Encoding"
+            for coding, suffix in accepted_encodings(headers.get("accept-encoding", "")):
+                if os.path.isfile(fs_path + suffix):
+                    body_path = fs_path + suffix
+                    body_st = os.stat(body_path)
+                    response["Content-Encoding"] = coding
+                    break
+        # Each encoding is its own representation, so each gets its own strong ETag
+        etag = await self.cached(self.etags, body_path, body_st, file_etag)
+        response["ETag"] = etag
+        response["Last-Modified"] = formatdate(st.st_mtime, usegmt=True)
+
+        if url_path.endswith(".html"):
+            links = await self.cached(self.hints, fs_path, st, self.link_hints, url_path)
+            if links:
+                if early_hints:
+                    writer.write(self.status_block(103, {"Link": links}))
+                response["Link"] = links
+
+        if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            writer.write(self.status_block(304, response, keep_alive))
+            await writer.drain()
+            return 304
+
+        response["Content-Length"] = str(body_st.st_size)
+        block = self.status_block(200, response, keep_alive)
+        if method == "HEAD":
+            writer.write(block)
+            await writer.drain()
+        elif body_st.st_size < SENDFILE_MIN_SIZE:
+            writer.write(block + await self.cached(self.bodies, body_path, body_st, read_bytes))
+            await writer.drain()
+        else:
+            writer.write(block)
+            await writer.drain()
+            with open(body_path, "rb") as f:
+                await asyncio.get_running_loop().sendfile(writer.transport, f, 0, body_st.st_size)
+        return 200
+
+    async def send_error(self, writer, status, extra=None, keep_alive=False):
+        body = f"{status} {REASONS[status]}\n".encode("ascii")
+        response = {"Content-Type": "text/plain; charset=utf-8", "Content-Length": str(len(body))}
+        response.update(extra or {})
+        writer.write(self.status_block(status, response, keep_alive) + body)
+        await writer.drain()
+        return status
+
+    def status_block(self, status, headers, keep_alive=True):
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}"]
+        if status >= 200:
+            lines.append(f"Date: {formatdate(usegmt=True)}")
+            lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        for name, value in headers.items():
+            for item in value if isinstance(value, list) else [value]:
+                lines.append(f"{name}: {item}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def serve(root=ROOT_DIR, host=HOST, port=PORT, early_hints=False, access_log=False):
+    server = StaticServer(root, early_hints, access_log)
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_SIZE, backlog=1024)
+    port = listener.sockets[0].getsockname()[1]
+    print(f"Serving {server.root} on http://{host}:{port}/", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the optimized build.")
+    parser.add_argument("root", nargs="?", default=ROOT_DIR, help="directory to serve")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port")
+    parser.add_argument("--early-hints", action="store_true", help="send 103 Early Hints before HTML responses")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    if uvloop:
+        uvloop.install()
+    try:
+        asyncio.run(serve(args.root, args.host, args.port, args.early_hints, args.access_log))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,435 @@
+import argparse
+import gzip
+import os
+import posixpath
+import re
+from urllib.parse import urlparse
+
+from build_cache import BuildCache
+from fingerprint import CSS_URL_RE
+from html_pipeline import parse, read_html
+from report import BuildReport, asset_type, is_local
+
+# Lighthouse's throttling presets: round trip (ms), downlink (Kbps), CPU
+# slowdown, and the viewport (CSS px wide, device pixel ratio)
+PROFILES = {
+    "3g": {"rtt": 300, "kbps": 700, "cpu": 4, "viewport": (412, 1.75)},
+    "slow-4g": {"rtt": 150, "kbps": 1638.4, "cpu": 4, "viewport": (412, 1.75)},
+    "cable": {"rtt": 40, "kbps": 10240, "cpu": 1, "viewport": (1350, 1)},
+}
+DEFAULT_PROFILE = "slow-4g"
+
+# Main-thread cost per uncompressed KB on an unthrottled CPU
+MS_PER_KB = {"html": 0.05, "css": 0.05, "js": 0.25}
+# Style, layout and paint of the first frame on an unthrottled CPU
+LAYOUT_MS = 10
+# Text in a font-display: auto/block face stays invisible for at most this long
+FONT_BLOCK_MS = 3000
+# Round trips to open a connection: DNS, TCP, TLS
+CONNECTION_RTTS = 3
+# Sizes assumed for third-party files, which can't be measured offline
+THIRD_PARTY_BYTES = {"css": 20000, "js": 50000, "font": 30000, "image": 30000, "other": 10000}
+
+# Bandwidth shares of concurrent transfers
+HIGH = 2
+LOW = 1
+STEP_MS = 5
+MAX_MS = 120000
+
+FONT_FACE_RE = re.compile(r'@font-face\s*\{([^}]*)\}', re.I)
+IMPORT_RE = re.compile(r'@import\s+(?:url\(\s*)?[\'"]?([^\'")\s;]+)', re.I)
+UNICODE_RANGE_RE = re.compile(r'U\+([0-9a-f?]+)(?:-([0-9a-f]+))?', re.I)
+# Faces are only downloaded for text they cover; the page is assumed to be Latin text
+LATIN_LETTERS = (0x41, 0x7A)
+
+
+class Resource:
+    def __init__(self, url, kind, size, raw, weight, local=True):
+        self.url = url
+        self.kind = kind
+        # Bytes on the wire, and bytes the main thread has to process
+        self.size = size
+        self.raw = raw
+        self.weight = weight
+        self.local = local
+        # Found by the preload scanner once this much of the HTML has arrived
+        self.offset = 0
+        # Otherwise requested once this resource has finished (a stylesheet for its fonts)
+        self.parent = None
+        # ...and, for fonts and lazy images, once the first layout has happened
+        self.after_layout = False
+        self.render_blocking = False
+        self.sync = False
+        self.deferred = False
+        self.lazy = False
+        self.start = None
+        self.first_byte = None
+        self.end = None
+        self.executed = None
+        self.received = 0
+
+    def to_dict(self):
+        return {"url": self.url, "kind": self.kind, "bytes": self.size, "start": self.start, "end": self.end,
+                "priority": "high" if self.weight == HIGH else "low", "render_blocking": self.render_blocking}
+
+
+def covers_latin(unicode_range):
+    for start, end in UNICODE_RANGE_RE.findall(unicode_range):
+        low = int(start.replace("?", "0"), 16)
+        high = int(end or start.replace("?", "F"), 16)
+        if low <= LATIN_LETTERS[1] and high >= LATIN_LETTERS[0]:
+            return True
+    return False
+
+
+def pick_candidate(srcset, sizes, viewport):
+    """The srcset URL a browser with ``viewport`` would download."""
+    width, dpr = viewport
+    slot = width
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)(vw|px)\s*', (sizes or "").split(",")[-1])
+    if match:
+        slot = float(match.group(1)) * (width / 100 if match.group(2) == "vw" else 1)
+    needed = slot * dpr
+    candidates = []
+    for candidate in srcset.split(","):
+        parts = candidate.strip().split()
+        if parts:
+            w = parts[1][:-1] if len(parts) > 1 and parts[1].endswith("w") else "0"
+            candidates.append((int(w) if w.isdigit() else 0, parts[0]))
+    if not candidates:
+        return None
+    fitting = [c for c in candidates if c[0] >= needed]
+    return min(fitting)[1] if fitting else max(candidates)[1]
+
+
+class Page:
+    """The requests a browser makes for one HTML document, in discovery order."""
+
+    def __init__(self, html, root, measure, viewport, fallback_root=None):
+        self.html_text = html
+        self.root = root
+        self.fallback_root = fallback_root
+        self.measure = measure
+        self.viewport = viewport
+        self.resources = {}
+        self.lcp = None
+        self.blocking_fonts = []
+        self.missing = []
+        self.scanned = set()
+
+        data = html.encode("utf-8")
+        self.html = Resource("(document)", "html", len(gzip.compress(data, 6, mtime=0)), len(data), HIGH)
+        self.html.render_blocking = True
+        self.cursor = 0
+        self.scan(parse(html))
+
+    def path(self, rel):
+        for root in [self.root, self.fallback_root]:
+            if root and os.path.isfile(os.path.join(root, rel)):
+                return os.path.join(root, rel)
+        return None
+
+    def add(self, url, weight, base="", offset=None):
+        if not url or url.startswith("data:"):
+            return None
+        if is_local(url):
+            rel = posixpath.normpath(posixpath.join(base, re.sub(r'[?#].*', '', url)))
+            if rel in self.resources:
+                return self.seen_again(self.resources[rel], url, weight, offset)
+            path = self.path(rel)
+            if not path:
+                self.missing.append(rel)
+                return None
+            size, raw = self.measure(path)
+            resource = Resource(rel, asset_type(path), size, raw, weight)
+            resource.path = path
+        elif re.match(r'^(?:https?:)?//', url):
+            if url in self.resources:
+                return self.seen_again(self.resources[url], url, weight, offset)
+            kind = asset_type(urlparse(url).path)
+            resource = Resource(url, kind, THIRD_PARTY_BYTES.get(kind, THIRD_PARTY_BYTES["other"]),
+                                THIRD_PARTY_BYTES.get(kind, THIRD_PARTY_BYTES["other"]), weight, local=False)
+            resource.path = None
+        else:
+            return None
+        resource.offset = self.html_offset(url) if offset is None else offset
+        self.resources[resource.url] = resource
+        return resource
+
+    def html_offset(self, url):
+        found = self.html_text.find(url, self.cursor)
+        if found >= 0:
+            self.cursor = found
+        return self.cursor
+
+    def seen_again(self, resource, url, weight, offset):
+        resource.weight = max(resource.weight, weight)
+        if offset is None and resource.parent is not None:
+            # Referenced from the HTML too (a preload): the scanner finds it there
+            resource.parent = None
+            resource.after_layout = False
+            resource.offset = self.html_offset(url)
+        return resource
+
+    def scan(self, soup):
+        for tag in soup.find_all(["link", "script", "img", "picture", "style"]):
+            if tag.find_parent("noscript"):
+                continue
+            if tag.name == "link":
+                rels = set(tag.get("rel", []))
+                href = tag.get("href")
+                if "stylesheet" in rels:
+                    blocking = tag.get("media", "all") in ("all", "screen", "")
+                    sheet = self.add(href, HIGH if blocking else LOW)
+                    if sheet:
+                        sheet.render_blocking = sheet.render_blocking or blocking
+                        self.scan_css(sheet)
+                elif "preload" in rels or "modulepreload" in rels:
+                    preloaded = self.add(href, HIGH)
+                    if preloaded and preloaded.kind == "css":
+                        self.scan_css(preloaded)
+            # Scripts held back for the loader runtime (data-src) start after load, outside the simulation
+            elif tag.name == "script" and tag.get("src"):
+                module = tag.get("type") == "module"
+                deferred = module or tag.has_attr("defer")
+                sync = not deferred and not tag.has_attr("async")
+                script = self.add(tag["src"], HIGH if sync else LOW)
+                if script:
+                    script.sync = script.sync or sync
+                    script.deferred = script.deferred or (deferred and not tag.has_attr("async"))
+                    script.render_blocking = script.render_blocking or (sync and tag.find_parent("head") is not None)
+            elif tag.name == "picture" or (tag.name == "img" and not tag.find_parent("picture")):
+                self.scan_image(tag)
+            elif tag.name == "style" and tag.string:
+                self.scan_css(self.html, tag.string, "")
+
+    def scan_image(self, tag):
+        img = tag if tag.name == "img" else tag.find("img")
+        if img is None:
+            return
+        source = tag.find("source", srcset=True) if tag.name == "picture" else None
+        srcset_tag = source or (img if img.get("srcset") else None)
+        url = img.get("src")
+        if srcset_tag:
+            url = pick_candidate(srcset_tag["srcset"], srcset_tag.get("sizes") or img.get("sizes"), self.viewport)
+        high = img.get("fetchpriority") == "high"
+        image = self.add(url, HIGH if high else LOW)
+        if not image:
+            return
+        image.lazy = img.get("loading") == "lazy"
+        area = 0
+        if str(img.get("width", "")).isdigit() and str(img.get("height", "")).isdigit():
+            area = int(img["width"]) * int(img["height"])
+        # fetchpriority=high marks the LCP element; otherwise the largest image is assumed to be
+        rank = (high, area)
+        if self.lcp is None or rank > self.lcp[0]:
+            self.lcp = (rank, image)
+
+    def scan_css(self, sheet, css=None, base=None):
+        if css is None:
+            if not sheet.local or sheet.url in self.scanned:
+                return
+            self.scanned.add(sheet.url)
+            with open(sheet.path, "r", encoding="utf-8", errors="replace") as f:
+                css = f.read()
+            base = posixpath.dirname(sheet.url)
+        for match in IMPORT_RE.finditer(css):
+            imported = self.add(match.group(1), sheet.weight, base, sheet.offset)
+            if imported and imported is not sheet and imported.parent is None:
+                imported.parent = sheet
+                imported.render_blocking = imported.render_blocking or sheet.render_blocking
+                self.scan_css(imported)
+        faces = {}
+        for face in FONT_FACE_RE.finditer(css):
+            descriptors = {name.strip().lower(): value.strip() for name, _, value in
+                           (d.partition(":") for d in face.group(1).split(";")) if value}
+            if "unicode-range" in descriptors and not covers_latin(descriptors["unicode-range"]):
+                continue
+            # Browsers take the first source in a format they support: woff2 comes first
+            first = CSS_URL_RE.search(descriptors.get("src", ""))
+            if not first:
+                continue
+            weights = [int(w) for w in re.findall(r'\d+', descriptors.get("font-weight", "400"))] or [400]
+            family = (descriptors.get("font-family", "").strip("'\""), descriptors.get("font-style", "normal"))
+            faces.setdefault(family, []).append((min(weights), max(weights), first.group(2), descriptors))
+
+        for (family, style), candidates in faces.items():
+            if style != "normal" and (family, "normal") in faces:
+                continue
+            # Text is assumed to be set in the regular and bold weights of each family
+            used = {min(range(len(candidates)), key=lambda i: max(candidates[i][0] - target, target - candidates[i][1], 0))
+                    for target in (400, 700)}
+            for _, _, url, descriptors in [candidates[i] for i in sorted(used)]:
+                known = len(self.resources)
+                font = self.add(url, HIGH, base, sheet.offset)
+                if font and len(self.resources) > known:
+                    # Fonts are requested when a rendered element needs them
+                    font.parent = sheet
+                    font.after_layout = True
+                if font and descriptors.get("font-display", "auto").lower() in ("auto", "block"):
+                    self.blocking_fonts.append(font)
+
+
+def simulate(html, root, profile, measure, fallback_root=None):
+    """Replay loading ``html`` under ``profile`` and estimate its metrics.
+
+    The network is one shared downlink: every request costs a round trip
+    (plus connection setup for each new origin unless preconnected),
+    concurrent transfers split the bandwidth by priority, and the preload
+    scanner finds each HTML reference once the bytes before it arrive.
+    Render-blocking CSS and head scripts gate the first paint, fonts wait
+    for layout, lazy images are not fetched (unless one is the LCP image),
+    and CSS background images are ignored.
+    """
+    page = Page(html, root, measure, profile["viewport"], fallback_root)
+    rtt, cpu = profile["rtt"], profile["cpu"]
+    bytes_per_ms = profile["kbps"] * 1000 / 8 / 1000
+    lcp_image = page.lcp[1] if page.lcp else None
+
+    soup = parse(html)
+    connections = {}
+    for link in soup.find_all("link", rel=["preconnect", "dns-prefetch"]):
+        origin = urlparse(link.get("href", "")).netloc
+        if origin:
+            connections.setdefault(origin, CONNECTION_RTTS * rtt if "preconnect" in link["rel"] else rtt)
+
+    resources = [page.html] + list(page.resources.values())
+    for resource in resources[1:]:
+        # Scanner offsets are raw HTML bytes; the document arrives compressed
+        resource.offset = resource.offset * page.html.size / max(1, page.html.raw)
+
+    def cost(resource):
+        return resource.raw / 1024 * MS_PER_KB.get(resource.kind, 0) * cpu
+
+    render_ready = None
+    dom_ready = None
+    main_free = 0
+    scripts = [r for r in resources if r.kind == "js" and (r.sync or r.deferred)]
+    scripts.sort(key=lambda r: (r.deferred, r.offset))
+    t = 0
+    while t < MAX_MS:
+        for r in resources:
+            if r.start is not None:
+                continue
+            if r.lazy and r is not lcp_image:
+                continue
+            if r is page.html:
+                ready = True
+            elif r.parent is not None:
+                ready = r.parent.end is not None and (not r.after_layout or render_ready is not None)
+            else:
+                ready = page.html.received >= r.offset and (not r.lazy or render_ready is not None)
+            if ready:
+                origin = "" if r.local else urlparse(r.url).netloc
+                if origin not in connections:
+                    connections[origin] = t + CONNECTION_RTTS * rtt
+                r.start = t
+                r.first_byte = max(t, connections[origin]) + rtt
+
+        active = [r for r in resources if r.start is not None and r.end is None and r.first_byte <= t]
+        weight = sum(r.weight for r in active)
+        for r in active:
+            r.received += bytes_per_ms * STEP_MS * r.weight / weight
+            if r.received >= r.size:
+                r.received = r.size
+                r.end = t + STEP_MS
+        t += STEP_MS
+
+        # Parser-blocking scripts run in order once downloaded and once the CSS before them has applied
+        # Deferred ones follow once the document is parsed
+        for script in scripts:
+            if script.executed is not None:
+                continue
+            css_before = [r for r in resources if r.kind == "css" and r.render_blocking and r.offset <= script.offset]
+            if script.end is None or (script.deferred and dom_ready is None) or any(r.end is None for r in css_before):
+                break
+            main_free = max(main_free, t) + cost(script)
+            script.executed = main_free
+
+        if render_ready is None and page.html.end is not None:
+            blocking = [r for r in resources if r.render_blocking]
+            if all(r.end is not None and (r.kind != "js" or r.executed is not None) for r in blocking):
+                work = cost(page.html) + sum(cost(r) for r in blocking if r.kind == "css") + LAYOUT_MS * cpu
+                render_ready = main_free = max(main_free, t) + work
+        if dom_ready is None and page.html.end is not None:
+            if all(s.executed is not None for s in scripts if not s.deferred):
+                dom_ready = max(main_free, t)
+
+        pending = [r for r in resources if r.end is None and not (r.lazy and r is not lcp_image)]
+        if not pending and render_ready is not None and all(s.executed is not None for s in scripts):
+            break
+
+    fcp = render_ready
+    if fcp is not None:
+        for font in page.blocking_fonts:
+            if font.end is not None and font.start is not None:
+                fcp = max(fcp, min(font.end, font.start + FONT_BLOCK_MS))
+    lcp = fcp
+    if fcp is not None and lcp_image is not None and lcp_image.end is not None:
+        lcp = max(fcp, lcp_image.end)
+    fetched = [r for r in resources if r.end is not None]
+    load = max([r.end for r in fetched] + [s.executed for s in scripts if s.executed is not None] + [fcp or 0])
+    return {
+        "fcp": round(fcp) if fcp is not None else None,
+        "lcp": round(lcp) if lcp is not None else None,
+        "load": round(load),
+        "bytes": sum(r.size for r in fetched),
+        "requests": len(fetched),
+        "render_blocking": sum(1 for r in resources if r.render_blocking and r is not page.html),
+        "lcp_resource": lcp_image.url if lcp_image else None,
+        "resources": [r.to_dict() for r in resources],
+        "missing": page.missing,
+    }
+
+
+def report_measure(report):
+    def measure(path):
+        sizes = report.sizes(path)
+        return report.transfer(sizes), sizes["raw"]
+    return measure
+
+
+def waterfall(result, width=50):
+    lines = []
+    end = max([r["end"] or 0 for r in result["resources"]] + [result["load"], 1])
+    for r in result["resources"]:
+        if r["start"] is None:
+            lines.append(f"{'':>7} {'':>7} {r['bytes'] / 1024:>7.1f}K  {'(lazy, not fetched)':<{width}}  {r['url']}")
+            continue
+        first, last = int(r["start"] / end * width), max(int(r["start"] / end * width) + 1, int(r["end"] / end * width))
+        bar = " " * first + ("#" if r["priority"] == "high" else "=") * (last - first)
+        marker = "*" if r["render_blocking"] else " "
+        lines.append(f"{r['start']:>5}ms {r['end']:>5}ms {r['bytes'] / 1024:>7.1f}K  {bar:<{width}} {marker}{r['url']}")
+    lines.append("(# high priority, = low priority, * render-blocking)")
+    return "\n".join(lines)
+
+
+def summary(result):
+    return (f"FCP {result['fcp']} ms, LCP {result['lcp']} ms, load {result['load']} ms, "
+            f"{result['bytes'] / 1024:.1f}K in {result['requests']} request(s), "
+            f"{result['render_blocking']} render-blocking")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate page load metrics offline from the built files.")
+    parser.add_argument("html", nargs="?", default=os.path.join("dist", "index.html"))
+    parser.add_argument("--root", help="directory the page's URLs resolve against (default: the page's directory)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), action="append",
+                        help=f"throttling profile, repeatable (default: {DEFAULT_PROFILE})")
+    parser.add_argument("--compare", metavar="HTML", help="also simulate this page (e.g. the source index.html)")
+    parser.add_argument("--quiet", action="store_true", help="print the metrics without the waterfall")
+    args = parser.parse_args()
+
+    cache = BuildCache(".build-cache.json")
+    measure = report_measure(BuildReport(cache))
+    pages = [(args.html, args.root or os.path.dirname(args.html) or ".")]
+    if args.compare:
+        pages.insert(0, (args.compare, os.path.dirname(args.compare) or "."))
+    for name in args.profile or [DEFAULT_PROFILE]:
+        for html_path, root in pages:
+            result = simulate(read_html(html_path), root, PROFILES[name], measure)
+            print(f"{html_path} on {name}: {summary(result)}")
+            if not args.quiet:
+                print(waterfall(result))
+                print()
+    cache.save()
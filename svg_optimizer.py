@@ -0,0 +1,278 @@
+import re
+import xml.etree.ElementTree as ET
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+ET.register_namespace("", SVG_NS)
+ET.register_namespace("xlink", XLINK_NS)
+
+# Decimal places kept in coordinates
+PRECISION = 3
+
+# Namespaces only editors read (Illustrator, Inkscape, Sketch, Serif, XMP/RDF metadata)
+EDITOR_NAMESPACES = {
+    "http://www.inkscape.org/namespaces/inkscape",
+    "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+    "http://ns.adobe.com/AdobeIllustrator/10.0/",
+    "http://ns.adobe.com/AdobeSVGViewerExtensions/3.0/",
+    "http://ns.adobe.com/Extensibility/1.0/",
+    "http://ns.adobe.com/Flows/1.0/",
+    "http://ns.adobe.com/GenericCustomNamespace/1.0/",
+    "http://ns.adobe.com/Graphs/1.0/",
+    "http://ns.adobe.com/ImageReplacement/1.0/",
+    "http://ns.adobe.com/SaveForWeb/1.0/",
+    "http://ns.adobe.com/Variables/1.0/",
+    "http://ns.adobe.com/XPath/1.0/",
+    "http://www.bohemiancoding.com/sketch/ns",
+    "http://www.serif.com/",
+    "http://purl.org/dc/elements/1.1/",
+    "http://creativecommons.org/ns#",
+    "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "adobe:ns:meta/",
+}
+REMOVED_ELEMENTS = {"metadata", "title", "desc"}
+REMOVED_ATTRIBUTES = {"data-name", "version", "enable-background", "{http://www.w3.org/XML/1998/namespace}space"}
+
+# Elements whose text is content rather than indentation
+TEXT_ELEMENTS = {"text", "tspan", "textPath", "style"}
+
+# Group attributes that mean the same thing when moved onto a group's only child
+INHERITABLE_ATTRIBUTES = {
+    "fill", "fill-opacity", "fill-rule", "stroke", "stroke-width", "stroke-linecap", "stroke-linejoin",
+    "stroke-miterlimit", "stroke-dasharray", "stroke-dashoffset", "stroke-opacity", "opacity",
+    "color", "visibility", "font-family", "font-size", "font-weight", "font-style", "transform",
+}
+# CSS properties that exist as presentation attributes; others stay in a style attribute
+PRESENTATION_ATTRIBUTES = INHERITABLE_ATTRIBUTES - {"transform"} | {"clip-rule", "display", "stop-color", "stop-opacity"}
+
+# Not transforms: a scale or matrix() entry such as 0.0004 scales everything
+# under it, so rounding it to PRECISION can make a shape vanish
+NUMERIC_ATTRIBUTES = {
+    "x", "y", "width", "height", "cx", "cy", "r", "rx", "ry", "x1", "y1", "x2", "y2",
+    "stroke-width", "opacity", "fill-opacity", "stroke-opacity", "points", "viewBox",
+}
+NUMBER_RE = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+PATH_COMMANDS = set("MmZzLlHhVvCcSsQqTtAa")
+SIMPLE_CLASS_RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else None
+
+
+def namespace(tag):
+    return tag[1:].split("}", 1)[0] if isinstance(tag, str) and tag.startswith("{") else None
+
+
+def format_number(value, precision=PRECISION):
+    text = f"{value:.{precision}f}".rstrip("0").rstrip(".")
+    if text in ("-0", ""):
+        text = "0"
+    # Leading zeros are optional in SVG numbers
+    if text.startswith("0."):
+        text = text[1:]
+    elif text.startswith("-0."):
+        text = "-" + text[2:]
+    return text
+
+
+def needs_separator(previous, token):
+    return token[0].isdigit() or (token[0] == "." and "." not in previous)
+
+
+def optimize_path(d, precision=PRECISION):
+    """Round path data and drop every separator the grammar doesn't need.
+    Anything unexpected returns ``d`` unchanged."""
+    out = []
+    command = None
+    index = 0
+    previous = None
+    i = 0
+    while i < len(d):
+        c = d[i]
+        if c in " \t\r\n,":
+            i += 1
+            continue
+        if c.isalpha():
+            if c not in PATH_COMMANDS:
+                return d
+            command, index, previous = c, 0, None
+            out.append(c)
+            i += 1
+            continue
+        if command is None:
+            return d
+        if command in "Aa" and index % 7 in (3, 4):
+            if c not in "01":
+                return d
+            token = c
+            i += 1
+        else:
+            match = NUMBER_RE.match(d, i)
+            if not match:
+                return d
+            token = format_number(float(match.group()), precision)
+            i = match.end()
+        # Arc flags are single characters, so nothing after one needs a separator
+        after_flag = command in "Aa" and index % 7 in (4, 5)
+        if previous is not None and not after_flag and needs_separator(previous, token):
+            out.append(" ")
+        out.append(token)
+        previous = token
+        index += 1
+    return "".join(out)
+
+
+def round_numbers(value, precision=PRECISION):
+    # Separators are kept as written, so this is safe for any number list
+    return NUMBER_RE.sub(lambda m: format_number(float(m.group()), precision), value)
+
+
+def minify_style(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s*([{};:,>])\s*', r'\1', css)
+    return re.sub(r'\s+', ' ', css).replace(";}", "}").strip()
+
+
+def referenced_ids(root):
+    text = " ".join(value for el in root.iter() for value in el.attrib.values())
+    text += " ".join(el.text or "" for el in root.iter() if local_name(el.tag) == "style")
+    return set(re.findall(r'#([\w.-]+)', text))
+
+
+def clean(el, keep_ids):
+    for child in list(el):
+        tag = local_name(child.tag)
+        if (tag is None or tag in REMOVED_ELEMENTS or namespace(child.tag) in EDITOR_NAMESPACES):
+            el.remove(child)
+            continue
+        clean(child, keep_ids)
+
+    for name in list(el.attrib):
+        value = el.attrib[name]
+        if (name in REMOVED_ATTRIBUTES or namespace(name) in EDITOR_NAMESPACES
+                or (name == "id" and value not in keep_ids) or (name == "style" and not value.strip())):
+            del el.attrib[name]
+
+    if local_name(el.tag) not in TEXT_ELEMENTS:
+        el.text = None
+    el.tail = None
+
+
+def round_attributes(root, precision):
+    for el in root.iter():
+        for name, value in el.attrib.items():
+            if name == "d":
+                el.set(name, optimize_path(value, precision))
+            elif name in NUMERIC_ATTRIBUTES:
+                el.set(name, round_numbers(value, precision))
+        if local_name(el.tag) == "style" and el.text:
+            el.text = minify_style(el.text)
+
+
+def collapse_groups(el):
+    for child in list(el):
+        collapse_groups(child)
+
+    for child in list(el):
+        if local_name(child.tag) != "g":
+            continue
+        index = list(el).index(child)
+        if len(child) == 0:
+            el.remove(child)
+        elif not child.attrib:
+            # A bare <g> only nests; its children can stand in its place
+            el.remove(child)
+            for offset, grandchild in enumerate(list(child)):
+                el.insert(index + offset, grandchild)
+        elif len(child) == 1 and set(child.attrib) <= INHERITABLE_ATTRIBUTES:
+            only = child[0]
+            shared = set(child.attrib) & set(only.attrib) - {"transform"}
+            if shared:
+                continue
+            for name, value in child.attrib.items():
+                if name == "transform" and only.get("transform"):
+                    value = f"{value} {only.get('transform')}"
+                only.set(name, value)
+            el.remove(child)
+            el.insert(index, only)
+
+    for child in list(el):
+        if local_name(child.tag) == "defs" and len(child) == 0:
+            el.remove(child)
+
+
+def optimize_svg(text, precision=PRECISION):
+    """Return ``text`` (an SVG document) without editor metadata, unused
+    ids and pointless groups, with coordinates rounded to ``precision``."""
+    root = ET.fromstring(text.encode("utf-8") if isinstance(text, str) else text)
+    clean(root, referenced_ids(root))
+    round_attributes(root, precision)
+    collapse_groups(root)
+    return serialize(root)
+
+
+def serialize(root):
+    # ElementTree writes "<path />"; text content escapes ">", so this only touches tags
+    return ET.tostring(root, encoding="unicode").replace(" />", "/>")
+
+
+def inline_class_styles(root):
+    """Turn ``<style>`` rules into attributes so the SVG can share an HTML
+    page with other inlined SVGs without their class names colliding.
+    Returns False (and leaves ``root`` alone) if a rule isn't a plain
+    class selector list."""
+    styles = [el for el in root.iter() if local_name(el.tag) == "style"]
+    rules = []
+    for style in styles:
+        css = minify_style(style.text or "")
+        for selectors, body in SIMPLE_CLASS_RULE_RE.findall(css):
+            names = [s.strip() for s in selectors.split(",")]
+            if not all(re.fullmatch(r'\.[\w-]+', name) for name in names):
+                return False
+            declarations = [d.split(":", 1) for d in body.split(";") if ":" in d]
+            rules.append(({name[1:] for name in names}, declarations))
+        if SIMPLE_CLASS_RULE_RE.sub("", css).strip():
+            return False
+
+    parents = {child: parent for parent in root.iter() for child in parent}
+    for style in styles:
+        parents[style].remove(style)
+    for el in root.iter():
+        classes = set(el.get("class", "").split())
+        if not classes:
+            continue
+        inline = dict(d.split(":", 1) for d in el.get("style", "").split(";") if ":" in d)
+        extra = []
+        # Same specificity everywhere, so later rules win, as in the cascade
+        for names, declarations in rules:
+            if names & classes:
+                for prop, value in declarations:
+                    prop = prop.strip()
+                    if prop in inline:
+                        continue
+                    if prop in PRESENTATION_ATTRIBUTES:
+                        el.set(prop, value.strip())
+                    else:
+                        extra.append(f"{prop}:{value.strip()}")
+        if extra:
+            el.set("style", ";".join(filter(None, [el.get("style", "")] + extra)))
+        del el.attrib["class"]
+    for el in list(root.iter()):
+        if local_name(el.tag) == "defs" and len(el) == 0:
+            parents[el].remove(el)
+    return True
+
+
+def prefix_ids(root, prefix):
+    """Namespace every id (and reference to it) with ``prefix``."""
+    ids = {el.get("id") for el in root.iter() if el.get("id")}
+    if not ids:
+        return
+    pattern = re.compile(r'#(%s)\b' % "|".join(re.escape(i) for i in sorted(ids, key=len, reverse=True)))
+    for el in root.iter():
+        for name, value in el.attrib.items():
+            if name == "id":
+                el.set(name, f"{prefix}{value}")
+            elif "#" in value:
+                el.set(name, pattern.sub(lambda m: f"#{prefix}{m.group(1)}", value))
@@ -0,0 +1,73 @@
+import mimetypes
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The build scripts are top-level modules, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FixtureServer:
+    """Local HTTP stand-in. ``routes`` maps a path to the body to serve, or to
+    a callable taking the request handler for anything else (errors,
+    conditional requests, broken transfers). Every request is recorded."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                route = server.routes.get(self.path.split("?")[0])
+                if route is None:
+                    self.respond(404, b"not found")
+                elif callable(route):
+                    route(self)
+                else:
+                    self.respond(200, route)
+
+            def respond(self, status, body=b"", headers=None):
+                self.send_response(status)
+                content_type = mimetypes.guess_type(self.path.split("?")[0])[0] or "text/html"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def requested(self, path):
+        return [headers for requested, headers in self.requests if requested.split("?")[0] == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def fixture_server():
+    servers = []
+
+    def start(routes):
+        server = FixtureServer(routes)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,69 @@
+import os
+import re
+
+import batch
+
+PAGE = (b'<!DOCTYPE html><html><head><title>%(name)s</title><link rel="stylesheet" href="css/site.css"></head>'
+        b'<body><p class="lead">%(name)s</p><script src="js/app.js"></script></body></html>')
+
+
+PLAIN_PAGE = b'<!DOCTYPE html><html><head><title>C</title></head><body><p>C</p></body></html>'
+
+
+def fixture_site(fixture_server):
+    """/a/ and /b/ reference assets by the same relative names with different
+    contents; /c/ links no assets at all."""
+    return fixture_server({
+        "/c/": PLAIN_PAGE,
+        "/a/": PAGE % {b"name": b"A"},
+        "/b/": PAGE % {b"name": b"B"},
+        "/a/js/app.js": b'console.log("AAA");',
+        "/b/js/app.js": b'console.log("BBB");',
+        "/a/css/site.css": b'.lead{color:red}',
+        "/b/css/site.css": b'.lead{color:tan}',
+    })
+
+
+def built_page(entries, batch_dir, url):
+    entry = next(e for e in entries if e["url"] == url)
+    assert entry["status"] == "ok"
+    page_dir = os.path.join(batch_dir, "out", entry["slug"])
+    with open(os.path.join(page_dir, "index.html"), "r", encoding="utf-8") as f:
+        return page_dir, f.read()
+
+
+def read_asset(page_dir, html, pattern):
+    path = re.search(pattern, html).group(1)
+    with open(os.path.join(page_dir, path), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_same_relative_names_on_different_pages_stay_apart(fixture_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = fixture_site(fixture_server)
+    urls = [server.url + "/a/", server.url + "/b/"]
+
+    entries = batch.run_batch(urls, "batch", workers=1)
+
+    for url, marker, color in [(urls[0], "AAA", "red"), (urls[1], "BBB", "tan")]:
+        page_dir, html = built_page(entries, "batch", url)
+        assert marker in read_asset(page_dir, html, r'<script[^>]* src=([^ >]+)')
+        assert color in read_asset(page_dir, html, r'href=(css/site[^ >]*)')
+    # Each shared asset is downloaded once across the batch
+    assert len(server.requested("/a/js/app.js")) == 1
+
+
+def test_pages_only_reference_their_own_stylesheets(fixture_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = fixture_site(fixture_server)
+    urls = [server.url + "/a/", server.url + "/c/"]
+
+    entries = batch.run_batch(urls, "batch", workers=1)
+
+    _, html = built_page(entries, "batch", urls[0])
+    # One preload and its <noscript> fallback, both for the page's own sheet
+    links = re.findall(r'href=(css/[^ >]+)', html)
+    assert len(links) == 2 and len(set(links)) == 1 and links[0].startswith("css/site")
+    assert "<style data-critical>.lead{color:red}</style>" in html
+    _, html = built_page(entries, "batch", urls[1])
+    assert "css/" not in html and "<style" not in html
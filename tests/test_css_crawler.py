@@ -0,0 +1,40 @@
+from css_crawler import CssCrawler
+from fetcher import Fetcher
+
+
+def crawler_for(server, tmp_path):
+    folders = {kind: str(tmp_path / kind) for kind in ("css", "font", "image")}
+    return CssCrawler(Fetcher(str(tmp_path / ".fetch-cache.json")), folders,
+                      lambda url, folder: url.rsplit("/", 2)[-2] + "-" + url.rsplit("/", 1)[-1], server.url)
+
+
+def test_relative_reference_resolves_by_url_not_by_existing_file(fixture_server, tmp_path):
+    server = fixture_server({"/b/css/theme.css": b".b{color:tan}"})
+    crawler = crawler_for(server, tmp_path)
+    # Saved earlier for another page's stylesheet
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "theme.css").write_text(".a{color:red}")
+
+    saved = []
+    crawler.add_text('@import "theme.css";', server.url + "/b/css/site.css", str(tmp_path / "css"), saved.append)
+    crawler.run()
+
+    assert saved == ['@import "css-theme.css";']
+    assert (tmp_path / "css" / "css-theme.css").read_text() == ".b{color:tan}"
+    assert (tmp_path / "css" / "theme.css").read_text() == ".a{color:red}"
+
+
+def test_localized_sheet_keeps_its_local_references(fixture_server, tmp_path):
+    server = fixture_server({})
+    crawler = crawler_for(server, tmp_path)
+    for kind in ("css", "font"):
+        (tmp_path / kind).mkdir()
+    (tmp_path / "font" / "icons.woff2").write_bytes(b"woff2")
+
+    saved = []
+    css = '@font-face{src:url(../font/icons.woff2)}'
+    crawler.add_text(css, server.url + "/css/site.css", str(tmp_path / "css"), saved.append, localized=True)
+    crawler.run()
+
+    assert saved == []
+    assert server.requests == []
@@ -0,0 +1,15 @@
+from css_optimizer import optimize_css
+
+
+def test_minifies_numbers_and_colors():
+    assert optimize_css("a { margin : 0px 0.50em; color : #ffffff }") == "a{margin:0 .5em;color:#fff}"
+
+
+def test_custom_properties_are_verbatim():
+    css = ":root { --gap: 0px; --accent: #ffffff; --pad: 0.50em }\n.a { width: calc(100% - var(--gap)) }"
+    assert optimize_css(css) == ":root{--gap:0px;--accent:#ffffff;--pad:0.50em}.a{width:calc(100% - var(--gap))}"
+
+
+def test_strings_and_urls_keep_their_whitespace():
+    css = '.a::before { content : "a   b" }\n.b { background : url( "x  y.png" ) }\n[title="p  q"] { color : red }'
+    assert optimize_css(css) == '.a::before{content:"a   b"}.b{background:url("x  y.png")}[title="p  q"]{color:red}'
@@ -0,0 +1,10 @@
+import importlib
+import os
+
+import download_assets
+
+
+def test_import_has_no_side_effects(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    importlib.reload(download_assets)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,34 @@
+import importlib
+import os
+
+import download_fonts
+from fetcher import Fetcher
+
+
+def test_import_has_no_side_effects(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    importlib.reload(download_fonts)
+    assert os.listdir(tmp_path) == []
+
+
+def test_unchanged_stylesheet_keeps_its_local_font_references(fixture_server, tmp_path, monkeypatch):
+    def stylesheet(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            request.respond(304)
+        else:
+            request.respond(200, b"@font-face{src:url(/s/roboto/v1/abc.woff2)}", {"ETag": '"v1"'})
+
+    server = fixture_server({"/css": stylesheet, "/s/roboto/v1/abc.woff2": b"woff2"})
+    for name in ["OUTPUT_DIR", "WEBFONTS_DIR", "CSS_DIR", "FONTS_DIR", "IMG_DIR"]:
+        monkeypatch.setattr(download_fonts, name, getattr(download_fonts, name))
+    download_fonts.configure(str(tmp_path))
+
+    for _ in range(2):
+        fetcher = Fetcher(str(tmp_path / ".fetch-cache.json"))
+        download_fonts.download_stylesheet(fetcher, server.url + "/css", "roboto.css", download_fonts.FONTS_DIR)
+        fetcher.save()
+
+    assert (tmp_path / "css" / "roboto.css").read_text() == "@font-face{src:url(../fonts/abc.woff2)}"
+    assert (tmp_path / "fonts" / "abc.woff2").read_bytes() == b"woff2"
+    # The rewritten ../fonts/abc.woff2 is never looked up on the font host
+    assert [path for path, _ in server.requests] == ["/css", "/s/roboto/v1/abc.woff2", "/css"]
@@ -0,0 +1,83 @@
+import os
+
+from fetcher import DOWNLOADED, FAILED, NOT_MODIFIED, Fetcher
+
+
+def test_retries_server_errors(fixture_server, tmp_path):
+    attempts = []
+
+    def flaky(request):
+        attempts.append(request.path)
+        if len(attempts) < 3:
+            request.respond(503, b"busy")
+        else:
+            request.respond(200, b"body{}")
+
+    server = fixture_server({"/site.css": flaky})
+    fetcher = Fetcher(str(tmp_path / ".fetch-cache.json"))
+    dest = tmp_path / "css" / "site.css"
+
+    assert fetcher.fetch(server.url + "/site.css", str(dest)) == DOWNLOADED
+    assert len(attempts) == 3
+    assert dest.read_bytes() == b"body{}"
+
+
+def test_gives_up_after_max_retries(fixture_server, tmp_path):
+    server = fixture_server({"/down.js": lambda request: request.respond(500, b"error")})
+    fetcher = Fetcher(str(tmp_path / ".fetch-cache.json"))
+
+    assert fetcher.fetch(server.url + "/down.js", str(tmp_path / "down.js")) == FAILED
+    assert not (tmp_path / "down.js").exists()
+
+
+def test_conditional_get_returns_not_modified(fixture_server, tmp_path):
+    def etagged(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            request.respond(304)
+        else:
+            request.respond(200, b"var a=1;", {"ETag": '"v1"'})
+
+    server = fixture_server({"/app.js": etagged})
+    validators = str(tmp_path / ".fetch-cache.json")
+    dest = str(tmp_path / "js" / "app.js")
+
+    fetcher = Fetcher(validators)
+    assert fetcher.fetch(server.url + "/app.js", dest) == DOWNLOADED
+    fetcher.save()
+
+    # A later run loads the saved validators and revalidates instead of downloading
+    fetcher = Fetcher(validators)
+    assert fetcher.fetch(server.url + "/app.js", dest) == NOT_MODIFIED
+    assert server.requested("/app.js")[-1]["If-None-Match"] == '"v1"'
+    with open(dest, "rb") as f:
+        assert f.read() == b"var a=1;"
+
+
+def test_broken_transfer_leaves_no_partial_file(fixture_server, tmp_path):
+    def truncated(request):
+        request.send_response(200)
+        request.send_header("Content-Length", "100000")
+        request.end_headers()
+        request.wfile.write(b"x" * 1000)
+        request.close_connection = True
+
+    server = fixture_server({"/big.js": truncated})
+    fetcher = Fetcher(str(tmp_path / ".fetch-cache.json"))
+
+    assert fetcher.fetch(server.url + "/big.js", str(tmp_path / "big.js")) == FAILED
+    assert os.listdir(tmp_path) == []
+
+
+def test_fetch_many_fills_every_destination(fixture_server, tmp_path):
+    server = fixture_server({"/logo.png": b"png"})
+    fetcher = Fetcher(str(tmp_path / ".fetch-cache.json"))
+    url = server.url + "/logo.png"
+    first, second = str(tmp_path / "a" / "logo.png"), str(tmp_path / "b" / "logo.png")
+
+    results = fetcher.fetch_many([(url, first), (url, second)])
+
+    assert results == {url: DOWNLOADED}
+    assert len(server.requested("/logo.png")) == 1
+    for path in (first, second):
+        with open(path, "rb") as f:
+            assert f.read() == b"png"
@@ -0,0 +1,23 @@
+from fingerprint import Fingerprinter, is_hashed
+
+
+def test_hashed_names_are_recognized(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body{background:url(../bg.png)}")
+    (tmp_path / "bg.png").write_bytes(b"png")
+    fingerprinter = Fingerprinter(str(tmp_path))
+
+    hashed = fingerprinter.url("css/site.css")
+    assert hashed != "css/site.css" and hashed.endswith(".css") and is_hashed(hashed)
+    assert all(is_hashed(path) for path in fingerprinter.outputs)
+    assert is_hashed(fingerprinter.url("bg.png"))
+
+
+def test_extensionless_files_keep_their_name(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "css").write_text("@font-face{font-family:x}")
+    fingerprinter = Fingerprinter(str(tmp_path))
+
+    assert fingerprinter.url("css/css") == "css/css"
+    assert fingerprinter.outputs == []
+    assert sorted(p.name for p in (tmp_path / "css").iterdir()) == ["css"]
@@ -0,0 +1,10 @@
+from html_minifier import minify_html
+
+
+def test_p_end_tag_is_omitted_before_its_parents_end():
+    assert minify_html("<div><p>One</p></div>") == "<div><p>One</div>"
+
+
+def test_p_end_tag_stays_inside_custom_elements_and_keep_parents():
+    assert minify_html("<my-card><p>One</p></my-card>") == "<my-card><p>One</p></my-card>"
+    assert minify_html("<a href=x><p>One</p></a>") == "<a href=x><p>One</p></a>"
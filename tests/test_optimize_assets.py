@@ -0,0 +1,137 @@
+import gzip
+import os
+
+import pytest
+from PIL import Image
+
+import optimize_assets
+from build_cache import BuildCache
+from html_pipeline import parse
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="8" height="8" viewBox="0 0 8 8"><path d="M0 0h8v8z"/></svg>'
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """optimize_assets pointed at an empty page tree under tmp_path; the
+    module's paths are put back afterwards."""
+    for name in ["OUTPUT_DIR", "ASSETS_DIR", "CSS_DIR", "JS_DIR", "IMG_DIR", "FONTS_DIR", "WEBFONTS_DIR",
+                 "BUILD_DIR", "BUILD_CSS_DIR", "BUILD_JS_DIR", "BUILD_IMG_DIR", "CACHE_FILE", "REPORT_FILE",
+                 "USED_INDEX"]:
+        monkeypatch.setattr(optimize_assets, name, getattr(optimize_assets, name))
+    optimize_assets.configure(str(tmp_path))
+    for path in ["css", "dist/images"]:
+        os.makedirs(tmp_path / path)
+    (tmp_path / "dist" / "images" / "icon.svg").write_text(SVG)
+    return tmp_path
+
+
+def inline(html):
+    soup = parse(html)
+    optimize_assets.inline_svg_images(soup, {})
+    return soup
+
+
+def test_svg_images_are_inlined(site):
+    soup = inline('<html><head></head><body><img src="images/icon.svg" alt="Icon"></body></html>')
+    assert soup.find("img") is None
+    assert soup.find("svg")["aria-label"] == "Icon"
+
+
+def test_img_rules_follow_inlined_svgs(site):
+    (site / "css" / "site.css").write_text(
+        "img{border:0;max-width:100%}.list li span img{display:block}.gallery img{opacity:.5}")
+    soup = inline('<html><head><link rel="stylesheet" href="css/site.css"></head><body>'
+                  '<ul class="list"><li><span><img src="images/icon.svg"></span></li></ul>'
+                  '<p><img src="images/icon.svg" class="other"></p></body></html>')
+    assert soup.find("img") is None
+    assert [svg.has_attr("data-img") for svg in soup.body.find_all("svg", recursive=True)
+            if not svg.has_attr("data-sprite")] == [True, True]
+    # The .gallery rule matches none of the images, so it isn't copied
+    assert soup.find("style", attrs={"data-img-rules": True}).string == (
+        "svg:where([data-img]){border:0;max-width:100%}.list li span svg:where([data-img]){display:block}")
+
+
+def build_files(site):
+    dist = site / "dist"
+    return sorted(str(p.relative_to(dist)).replace(os.sep, "/") for p in dist.rglob("*") if p.is_file())
+
+
+def test_stale_fingerprints_are_pruned(site):
+    css = site / "dist" / "css"
+    os.makedirs(css)
+    for name in ["site.css", "site.css.gz", "site.0123456789.css", "site.0123456789.css.gz", "site.abcdefabcd.css"]:
+        (css / name).write_text("body{color:red}")
+
+    optimize_assets.prune_fingerprints({"css/site.css": "css/site.abcdefabcd.css"})
+    assert build_files(site) == ["css/site.abcdefabcd.css", "css/site.css", "images/icon.svg"]
+
+
+def test_only_served_files_are_precompressed(site):
+    dist = site / "dist"
+    css = dist / "css"
+    os.makedirs(css)
+    text = "body{color:red}\n" * 100
+    for name in ["site.css", "site.abcdefabcd.css", "grid.css"]:
+        (css / name).write_text(text)
+    (dist / "index.html").write_text("<html>" + text + "</html>")
+    # Linked in next to the original, as batch page trees are; the hashed copy reuses it
+    linked = gzip.compress(text.encode(), 1, mtime=0)
+    (css / "site.css.gz").write_bytes(linked)
+    (css / "grid.css.gz").write_bytes(linked)
+    cache = BuildCache(str(site / ".build-cache.json"))
+    cache.record(os.path.join(optimize_assets.BUILD_DIR, "index.html"), "key", [],
+                 data={"css/site.css": "css/site.abcdefabcd.css"})
+
+    optimize_assets.precompress_assets(cache)
+    files = build_files(site)
+    assert "index.html.gz" in files
+    assert (css / "site.abcdefabcd.css.gz").read_bytes() == linked
+    assert "css/site.css.gz" not in files and "css/grid.css.gz" not in files
+
+
+def test_add_style_compares_property_names_exactly():
+    soup = parse('<img style="background-color:red;background-image:url(data:image/png;base64,AA==)">'
+                 '<img style="Aspect-Ratio: 1/1;">')
+    first, second = soup.find_all("img")
+    optimize_assets.add_style(first, "background-image", "none")
+    optimize_assets.add_style(first, "background-size", "cover")
+    optimize_assets.add_style(second, "aspect-ratio", "4/3")
+    assert first["style"] == "background-color:red;background-image:url(data:image/png;base64,AA==);background-size:cover"
+    assert second["style"] == "Aspect-Ratio: 1/1;"
+
+
+def test_image_dimensions_only_fill_in_what_is_missing(site, monkeypatch):
+    os.makedirs(site / "images")
+    Image.new("RGB", (40, 20), "red").save(site / "images" / "photo.png")
+    # Only the <p> is above the fold, so the images get placeholders
+    monkeypatch.setattr(optimize_assets, "FOLD_ELEMENTS", 1)
+    soup = parse('<html><body><p>Hi</p><img src="images/photo.png" width="100" height="100">'
+                 '<img src="images/photo.png" width="80"><img src="images/photo.png" style="background-color:tan">'
+                 '</body></html>')
+    optimize_assets.image_dimensions(soup, {"cache": BuildCache(str(site / ".build-cache.json"))})
+
+    sized, scaled, plain = soup.find_all("img")
+    assert (sized["width"], sized["height"]) == ("100", "100")
+    assert (scaled["width"], scaled["height"]) == ("80", "40")
+    assert (plain["width"], plain["height"]) == ("40", "20")
+    # Longhands after the author's background-color, which a shorthand would reset
+    assert plain["style"].startswith("background-color:tan;aspect-ratio:40/20;background-image:url(data:image/")
+    assert plain["style"].endswith(";background-size:cover;background-position:center")
+
+
+def test_critical_css_replaces_only_its_own_style(site):
+    (site / "css" / "site.css").write_text(".lead{color:red}.other{color:blue}")
+    soup = parse('<html><head><style>/* Bootstrap Grid */#headerCntr{margin:0}</style>'
+                 '<style data-critical>.stale{color:tan}</style><link rel="stylesheet" href="css/site.css">'
+                 '</head><body><p class="lead">Hi</p></body></html>')
+    optimize_assets.inline_critical_css(soup, {"cache": BuildCache(str(site / ".build-cache.json"))})
+    assert [style.string for style in soup.find_all("style")] == [
+        "/* Bootstrap Grid */#headerCntr{margin:0}", ".lead{color:red}"]
+
+
+def test_font_codepoints_decode_the_page_like_the_pipeline(site):
+    (site / "index.html").write_bytes("<html><body><p>Café</p></body></html>".encode("latin-1"))
+    text, icons, ranges = optimize_assets.font_codepoints()
+    assert ord("é") in text
+    assert 0xFFFD not in text
@@ -0,0 +1,27 @@
+import gzip
+
+from build_cache import BuildCache
+from report import GZIP_LEVEL, BuildReport
+
+DATA = b"body{color:red}\n" * 200
+
+
+def test_sizes_read_precompressed_siblings(tmp_path):
+    path = tmp_path / "site.css"
+    path.write_bytes(DATA)
+    # Level 1 comes out larger than the report's own level 9
+    sibling = gzip.compress(DATA, 1, mtime=0)
+    (tmp_path / "site.css.gz").write_bytes(sibling)
+
+    sizes = BuildReport(BuildCache(str(tmp_path / "cache.json"))).sizes(str(path))
+    assert sizes["raw"] == len(DATA)
+    assert sizes["gzip"] == len(sibling) != len(gzip.compress(DATA, GZIP_LEVEL, mtime=0))
+
+
+def test_stale_siblings_are_ignored(tmp_path):
+    path = tmp_path / "site.css"
+    path.write_bytes(DATA)
+    (tmp_path / "site.css.gz").write_bytes(gzip.compress(b"old", 1, mtime=0))
+
+    sizes = BuildReport(BuildCache(str(tmp_path / "cache.json"))).sizes(str(path))
+    assert sizes["gzip"] == len(gzip.compress(DATA, GZIP_LEVEL, mtime=0))
@@ -0,0 +1,51 @@
+import asyncio
+
+from serve import StaticServer
+
+PAGE = b'<!DOCTYPE html><html><head><link rel="preload" href="css/site.css" as="style"></head><body></body></html>'
+
+
+def exchange(root, *requests, early_hints=True):
+    """Send each raw request to one server on its own connection; returns the
+    raw responses. Callables in ``requests`` are run in between instead."""
+    async def run():
+        server = StaticServer(str(root), early_hints=early_hints)
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        responses = []
+        async with listener:
+            for request in requests:
+                if callable(request):
+                    request()
+                    continue
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(request)
+                await writer.drain()
+                responses.append(await asyncio.wait_for(reader.read(), 5))
+                writer.close()
+        return responses
+    return asyncio.run(run())
+
+
+def test_early_hints_only_for_http_11(tmp_path):
+    (tmp_path / "index.html").write_bytes(PAGE)
+    http11, http10 = exchange(tmp_path, b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n", b"GET / HTTP/1.0\r\n\r\n")
+    assert http11.startswith(b"HTTP/1.1 103 Early Hints\r\nLink: </css/site.css>; rel=preload")
+    assert http10.startswith(b"HTTP/1.1 200 OK")
+    assert b"\r\nLink: </css/site.css>" in http10
+
+
+def test_invalid_content_length_is_a_bad_request(tmp_path):
+    (tmp_path / "index.html").write_bytes(PAGE)
+    for value in [b"abc", b"-5"]:
+        response, = exchange(tmp_path, b"GET / HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n")
+        assert response.startswith(b"HTTP/1.1 400 Bad Request")
+
+
+def test_changed_files_are_served_fresh(tmp_path):
+    path = tmp_path / "app.js"
+    request = b"GET /app.js HTTP/1.1\r\nConnection: close\r\n\r\n"
+    path.write_bytes(b"one();")
+    first, second = exchange(tmp_path, request, lambda: path.write_bytes(b"two(); "), request)
+    assert first.endswith(b"\r\n\r\none();")
+    assert second.endswith(b"\r\n\r\ntwo(); ")
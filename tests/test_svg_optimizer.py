@@ -0,0 +1,15 @@
+from svg_optimizer import optimize_svg
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10.12345 10">%s</svg>'
+
+
+def test_coordinates_are_rounded():
+    out = optimize_svg(SVG % '<rect x="1.23456" y="0.5" width="2" height="2"/>')
+    assert 'viewBox="0 0 10.123 10"' in out
+    assert 'x="1.235" y=".5"' in out
+
+
+def test_transforms_keep_their_precision():
+    transform = "matrix(0.0004,0,0,0.0004,1.23456,2) scale(0.00025)"
+    out = optimize_svg(SVG % f'<g transform="{transform}"><path d="M0 0h10000v10000z" fill="red"/></g>')
+    assert f'transform="{transform}"' in out
@@ -0,0 +1,15 @@
+import os
+
+import optimize_assets
+import watch
+
+
+def test_outdated_siblings_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(optimize_assets, "BUILD_DIR", str(tmp_path))
+    for name in ["index.html", "index.html.br", "index.html.gz", "app.js", "app.js.gz"]:
+        (tmp_path / name).write_text(name)
+    # index.html was rewritten after its siblings; app.js wasn't
+    os.utime(tmp_path / "index.html", ns=(2_000_000_000_000_000_000, 2_000_000_000_000_000_000))
+
+    assert watch.drop_stale_siblings() == 2
+    assert sorted(os.listdir(tmp_path)) == ["app.js", "app.js.gz", "index.html"]
@@ -0,0 +1,191 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from fnmatch import fnmatch
+
+import optimize_assets
+from build_cache import BuildCache
+from precompress import ENCODINGS
+from report import BuildReport
+
+POLL_INTERVAL = 0.2
+
+# Stage -> (sources it reads, stages whose results it reads). Sources are
+# relative to the page (index.html, budgets.json) or the asset root.
+STAGES = {
+    "images": (["images/*"], []),
+    "svgs": (["images/*.svg"], []),
+    "fonts": (["fonts/*", "webfonts/*", "css/*.css", "index.html", "js/*.js"], []),
+    "css": (["css/*.css", "index.html", "js/*.js"], ["fonts"]),
+    "js": (["js/*.js"], []),
+    "static": (["css/*", "js/*", "images/*"], []),
+    "html": (["index.html"], ["images", "svgs", "css", "js", "static"]),
+    "precompress": ([], ["svgs", "css", "js", "static", "html"]),
+    "report": (["budgets.json"], ["precompress"]),
+}
+# Stages in an order where every stage runs after the ones it reads
+STAGE_ORDER = ["images", "svgs", "fonts", "css", "js", "static", "html", "precompress", "report"]
+# Left out of the edit loop unless asked for: zopfli and brotli-11 take seconds on large files
+SLOW_STAGES = ["precompress", "report"]
+
+PAGE_FILES = ["index.html", "budgets.json"]
+# Sources of the used-selector index shared by the font and CSS stages
+SELECTOR_SOURCES = ["index.html", "js/*.js"]
+ASSET_DIRS = ["css", "js", "images", "fonts", "webfonts"]
+
+
+def snapshot():
+    """{source name: (size, mtime)} for everything a stage reads, plus the build scripts."""
+    paths = {name: os.path.join(optimize_assets.OUTPUT_DIR, name) for name in PAGE_FILES}
+    for d in ASSET_DIRS:
+        for path in glob.glob(os.path.join(optimize_assets.ASSETS_DIR, d, "*")):
+            paths[f"{d}/{os.path.basename(path)}"] = path
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in glob.glob(os.path.join(script_dir, "*.py")):
+        paths[f"code:{os.path.basename(path)}"] = path
+
+    state = {}
+    for name, path in paths.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isdir(path):
+            state[name] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+def drop_stale_siblings():
+    """Delete .br/.gz/.zst siblings older than the file they encode, left by
+    the last full build, so the server falls back to the rewritten file.
+    Returns the number removed."""
+    removed = 0
+    for path in optimize_assets.built_files():
+        if path.endswith(tuple(ENCODINGS)):
+            continue
+        mtime = os.stat(path).st_mtime_ns
+        for suffix in ENCODINGS:
+            try:
+                if os.stat(path + suffix).st_mtime_ns < mtime:
+                    os.remove(path + suffix)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def changed_names(before, after):
+    return sorted(name for name in before.keys() | after.keys() if before.get(name) != after.get(name))
+
+
+def affected_stages(names, stages=STAGE_ORDER):
+    """Stages reading any of ``names``, plus everything downstream of them."""
+    dirty = set()
+    for stage in STAGE_ORDER:
+        patterns, upstream = STAGES[stage]
+        if dirty.intersection(upstream) or any(fnmatch(name, p) for name in names for p in patterns):
+            dirty.add(stage)
+    return [stage for stage in stages if stage in dirty]
+
+
+class Watcher:
+    """Keeps one build warm in memory and reruns only the stages a change reaches.
+
+    Stage results (the image and font maps) and the build cache stay
+    loaded between rebuilds, and each stage's own cache skips the files
+    that did not change, so editing site.css re-minifies it and re-inlines
+    the critical CSS without touching a single image.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.cache = BuildCache(optimize_assets.CACHE_FILE)
+        self.report = BuildReport(self.cache)
+        self.image_map = {}
+        self.font_map = {}
+
+    def run(self, stages):
+        start = time.perf_counter()
+        for stage in stages:
+            with self.report.stage(stage):
+                self.run_stage(stage)
+        if "precompress" not in self.stages:
+            removed = drop_stale_siblings()
+            if removed:
+                print(f"Removed {removed} outdated precompressed file(s)")
+        self.cache.save()
+        print(f"Rebuilt {', '.join(stages)} in {(time.perf_counter() - start) * 1000:.0f} ms", flush=True)
+
+    def run_stage(self, stage):
+        cache = self.cache
+        if stage == "images":
+            self.image_map = optimize_assets.optimize_images(cache)
+        elif stage == "svgs":
+            optimize_assets.optimize_svgs(cache)
+        elif stage == "fonts":
+            self.font_map = optimize_assets.optimize_fonts(cache)
+        elif stage == "css":
+            optimize_assets.minify_css(cache, self.font_map)
+        elif stage == "js":
+            optimize_assets.minify_js(cache)
+        elif stage == "static":
+            optimize_assets.copy_static(cache)
+        elif stage == "html":
+            optimize_assets.update_html(self.image_map, cache)
+        elif stage == "precompress":
+            optimize_assets.precompress_assets(cache)
+        elif stage == "report":
+            failures = optimize_assets.build_report(self.report, self.image_map)
+            for budget in failures:
+                print(f"Budget {budget['metric']} exceeded: {budget['actual']} / {budget['limit']}")
+
+    def watch(self, interval=POLL_INTERVAL):
+        state = snapshot()
+        self.run(self.stages)
+        print(f"Watching for changes every {interval * 1000:.0f} ms (Ctrl+C to stop)", flush=True)
+        while True:
+            time.sleep(interval)
+            current = snapshot()
+            names = changed_names(state, current)
+            if not names:
+                continue
+            # Let editors and the download script finish writing before building
+            while True:
+                time.sleep(interval)
+                settled = snapshot()
+                if settled == current:
+                    break
+                names = sorted(set(names) | set(changed_names(current, settled)))
+                current = settled
+            state = current
+
+            if any(name.startswith("code:") for name in names):
+                print("Build scripts changed, restarting...", flush=True)
+                self.cache.save()
+                os.execv(sys.executable, [sys.executable] + sys.argv)
+
+            if any(fnmatch(name, p) for name in names for p in SELECTOR_SOURCES):
+                # The page or its scripts may have changed which selectors are used
+                optimize_assets.USED_INDEX = None
+            stages = affected_stages(names, self.stages)
+            print(f"Changed: {', '.join(names)}", flush=True)
+            if stages:
+                try:
+                    self.run(stages)
+                except Exception as e:
+                    print(f"Rebuild failed: {e}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild affected outputs whenever a source changes.")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="poll interval in seconds")
+    parser.add_argument("--full", action="store_true", help="also precompress and write the build report")
+    args = parser.parse_args()
+
+    stages = STAGE_ORDER if args.full else [s for s in STAGE_ORDER if s not in SLOW_STAGES]
+    try:
+        Watcher(stages).watch(args.interval)
+    except KeyboardInterrupt:
+        pass